@@ -0,0 +1,319 @@
+"""
+Headless JSON/Arrow analytics API over the same caches and engines as the
+Streamlit app:
+
+    python api.py --port 8502
+    curl 'http://127.0.0.1:8502/v1/prices/AAPL?period=6mo&interval=1d'
+
+Endpoints (all GET):
+    /health
+    /v1/prices/<symbol>?period=6mo&interval=1d
+    /v1/info/<symbol>
+    /v1/risk/<symbol>?period=1y&interval=1d&beta=0   (annualized per interval; beta for 1d only)
+    /v1/indicators/<symbol>?period=6mo&ema=20,50,200&rsi=14
+    /v1/scores/<symbol>
+
+Add format=arrow (or Accept: application/vnd.apache.arrow.stream) for an
+Arrow IPC stream instead of JSON; /v1/info is JSON only. Responses carry
+an ETag derived from the data version and honour If-None-Match, and are
+gzip-compressed when the client accepts it.
+"""
+import argparse
+import gzip
+import hashlib
+import io
+import json
+import re
+import sys
+import threading
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Optional, Tuple
+from urllib.parse import parse_qs, unquote, urlsplit
+
+import numpy as np
+import pandas as pd
+
+from utils.analysis import RiskAnalyzer
+from utils.database import init_db
+from utils.intraday import TIMEFRAMES, get_bars, periods_per_year
+from utils.stock_data import get_company_info, get_data_version
+from utils.technical_analysis import calculate_ichimoku_cloud, ema_frame, macd_frame, rsi_frame
+from utils.visualizations import calculate_composite_scores
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8502
+PERIODS = ['1mo', '3mo', '6mo', '1y', '2y', '5y', 'max']
+JSON_MIME = 'application/json'
+ARROW_MIME = 'application/vnd.apache.arrow.stream'
+GZIP_MIN_BYTES = 1024
+RESPONSE_CACHE_SIZE = 256
+
+ROUTE = re.compile(r'^/v1/(?P<endpoint>[a-z]+)/(?P<symbol>[^/]+)$')
+
+class ApiError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+def _param(query: Dict[str, str], name: str, default: str, choices=None) -> str:
+    value = query.get(name, default)
+    if choices is not None and value not in choices:
+        raise ApiError(400, f"{name} must be one of {', '.join(choices)}")
+    return value
+
+def _int_params(query: Dict[str, str], name: str, default: str) -> Tuple[int, ...]:
+    try:
+        values = tuple(int(v) for v in query.get(name, default).split(',') if v)
+    except ValueError:
+        raise ApiError(400, f"{name} must be a comma-separated list of integers")
+    if not values or min(values) < 1:
+        raise ApiError(400, f"{name} must be positive")
+    return values
+
+def _content_version(value) -> str:
+    return hashlib.sha1(json.dumps(value, sort_keys=True, default=str).encode()).hexdigest()
+
+# Each endpoint is a loader, which fetches the source data and names its
+# version cheaply, and a renderer, which only runs when the version is new
+
+def _load_prices(symbol: str, query: Dict[str, str]):
+    period = _param(query, 'period', '6mo', PERIODS)
+    interval = _param(query, 'interval', '1d', TIMEFRAMES)
+    df = get_bars(symbol, interval, period)
+    if df is None or df.empty:
+        raise ApiError(404, f"No price data for {symbol}")
+    return df, get_data_version(df)
+
+def _render_prices(df: pd.DataFrame, query: Dict[str, str]) -> pd.DataFrame:
+    return df[['Open', 'High', 'Low', 'Close', 'Volume']]
+
+def _render_indicators(df: pd.DataFrame, query: Dict[str, str]) -> pd.DataFrame:
+    close = df[['Close']]
+    result = {'Close': df['Close']}
+    for window in _int_params(query, 'ema', '20,50,200'):
+        result[f'ema_{window}'] = ema_frame(close, window)['Close']
+    for window in _int_params(query, 'rsi', '14'):
+        result[f'rsi_{window}'] = rsi_frame(close, window)['Close']
+    macd, signal = macd_frame(close)
+    result.update({'macd': macd['Close'], 'macd_signal': signal['Close'], 'macd_hist': (macd - signal)['Close']})
+    conversion, base, span_a, span_b = calculate_ichimoku_cloud(df)
+    result.update({'ichimoku_conversion': conversion, 'ichimoku_base': base,
+                   'ichimoku_span_a': span_a, 'ichimoku_span_b': span_b})
+    return pd.DataFrame(result)
+
+def _render_risk(df: pd.DataFrame, query: Dict[str, str]) -> Dict:
+    include_beta = _param(query, 'beta', '0', ['0', '1']) == '1'
+    interval = _param(query, 'interval', '1d', TIMEFRAMES)
+    if interval == '1d':
+        metrics = RiskAnalyzer().calculate_risk_metrics(df, include_beta=include_beta)
+    else:
+        # Beta is measured against daily S&P 500 returns
+        if include_beta:
+            raise ApiError(400, "beta is only available for interval=1d")
+        metrics = RiskAnalyzer().calculate_risk_metrics_frame(
+            df[['Close']], periods_per_year=periods_per_year(interval)).iloc[0].to_dict()
+        metrics['beta'] = np.nan
+    return {name: float(value) for name, value in metrics.items()}
+
+def _load_info(symbol: str, query: Dict[str, str]):
+    try:
+        info = get_company_info(symbol)
+    except Exception as e:
+        raise ApiError(502, str(e))
+    if not info:
+        raise ApiError(404, f"No company information for {symbol}")
+    return info, _content_version(info)
+
+def _render_info(info: Dict, query: Dict[str, str]) -> Dict:
+    return info
+
+def _render_scores(info: Dict, query: Dict[str, str]) -> Dict:
+    return {category: float(score) for category, score in calculate_composite_scores(info).items()}
+
+ENDPOINTS: Dict[str, Tuple[Callable, Callable, bool]] = {
+    # name: (loader, renderer, Arrow allowed)
+    'prices': (_load_prices, _render_prices, True),
+    'indicators': (_load_prices, _render_indicators, True),
+    'risk': (_load_prices, _render_risk, True),
+    'info': (_load_info, _render_info, False),
+    'scores': (_load_info, _render_scores, True),
+}
+
+def _json_default(value):
+    if isinstance(value, (np.integer, np.floating)):
+        return value.item()
+    if isinstance(value, (pd.Timestamp, np.datetime64)):
+        return pd.Timestamp(value).isoformat()
+    return str(value)
+
+def _finite(value):
+    return None if isinstance(value, float) and not np.isfinite(value) else value
+
+def to_json(payload, symbol: str, version: str) -> bytes:
+    if isinstance(payload, pd.DataFrame):
+        index = pd.DatetimeIndex(payload.index)
+        body = {
+            'symbol': symbol, 'version': version,
+            'columns': list(payload.columns),
+            'index': [ts.isoformat() for ts in index],
+            # to_json writes NaN as null
+            'data': json.loads(payload.to_json(orient='values', double_precision=10)),
+        }
+    else:
+        body = {'symbol': symbol, 'version': version,
+                'data': {key: _finite(value) for key, value in payload.items()}}
+    return json.dumps(body, default=_json_default, allow_nan=False).encode()
+
+def to_arrow(payload, symbol: str, version: str) -> bytes:
+    try:
+        import pyarrow as pa
+    except ImportError:
+        raise ApiError(406, 'Arrow output requires pyarrow')
+    if isinstance(payload, pd.DataFrame):
+        frame = payload.reset_index()
+        frame = frame.rename(columns={frame.columns[0]: 'timestamp'})
+    else:
+        frame = pd.DataFrame([payload])
+    table = pa.Table.from_pandas(frame, preserve_index=False)
+    table = table.replace_schema_metadata({**(table.schema.metadata or {}),
+                                           b'symbol': symbol.encode(), b'version': version.encode()})
+    sink = io.BytesIO()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue()
+
+class AnalyticsApi:
+    """
+    Request handling independent of the HTTP server: routing, ETags and a
+    response cache keyed by ETag, so unchanged data is neither recomputed
+    nor re-serialized (or re-compressed)
+    """
+    def __init__(self, cache_size: int = RESPONSE_CACHE_SIZE):
+        self.cache_size = cache_size
+        self._responses = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _cached(self, etag: str) -> Optional[Dict[str, bytes]]:
+        with self._lock:
+            entry = self._responses.get(etag)
+            if entry is not None:
+                self._responses.move_to_end(etag)
+            return entry
+
+    def _store(self, etag: str, entry: Dict[str, bytes]):
+        with self._lock:
+            self._responses[etag] = entry
+            while len(self._responses) > self.cache_size:
+                self._responses.popitem(last=False)
+
+    def handle(self, path: str, query: Dict[str, str], headers) -> Tuple[int, Dict[str, str], bytes]:
+        """
+        (status, headers, body) for a GET request
+        """
+        accept_gzip = 'gzip' in (headers.get('Accept-Encoding') or '')
+        try:
+            if path == '/health':
+                return self._respond(200, JSON_MIME, b'{"status": "ok"}', accept_gzip)
+
+            match = ROUTE.match(path)
+            if not match or match['endpoint'] not in ENDPOINTS:
+                raise ApiError(404, f"Unknown endpoint: {path}")
+            loader, renderer, arrow_allowed = ENDPOINTS[match['endpoint']]
+            symbol = unquote(match['symbol']).upper()
+
+            wants_arrow = query.get('format') == 'arrow' or \
+                (ARROW_MIME in (headers.get('Accept') or '') and query.get('format') != 'json')
+            if wants_arrow and not arrow_allowed:
+                raise ApiError(406, f"/v1/{match['endpoint']} is only available as JSON")
+            mime = ARROW_MIME if wants_arrow else JSON_MIME
+
+            source, version = loader(symbol, query)
+            key = json.dumps([path, sorted(query.items()), version, mime])
+            etag = '"' + hashlib.sha1(key.encode()).hexdigest()[:32] + '"'
+            extra = {'ETag': etag, 'Cache-Control': 'no-cache', 'X-Data-Version': version}
+
+            if etag in [tag.strip() for tag in (headers.get('If-None-Match') or '').split(',')]:
+                return 304, extra, b''
+
+            entry = self._cached(etag)
+            if entry is None:
+                payload = renderer(source, query)
+                body = (to_arrow if wants_arrow else to_json)(payload, symbol, version)
+                entry = {'identity': body}
+                self._store(etag, entry)
+            return self._respond(200, mime, entry, accept_gzip, extra)
+        except ApiError as e:
+            body = json.dumps({'error': str(e)}).encode()
+            return self._respond(e.status, JSON_MIME, body, accept_gzip)
+        except Exception as e:
+            body = json.dumps({'error': f"Failed to handle request: {str(e)}"}).encode()
+            return self._respond(500, JSON_MIME, body, accept_gzip)
+
+    def _respond(self, status: int, mime: str, body, accept_gzip: bool,
+                 extra: Optional[Dict[str, str]] = None) -> Tuple[int, Dict[str, str], bytes]:
+        entry = body if isinstance(body, dict) else {'identity': body}
+        headers = {'Content-Type': mime, 'Vary': 'Accept, Accept-Encoding', **(extra or {})}
+        if accept_gzip and len(entry['identity']) >= GZIP_MIN_BYTES:
+            if 'gzip' not in entry:
+                # Benign race: two threads may compress the same body once each
+                entry['gzip'] = gzip.compress(entry['identity'], compresslevel=5)
+            headers['Content-Encoding'] = 'gzip'
+            return status, headers, entry['gzip']
+        return status, headers, entry['identity']
+
+class ApiHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    server_version = 'StockSentryAPI/1.0'
+    # Headers and body go out in separate writes; don't let them wait on delayed ACKs
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        parts = urlsplit(self.path)
+        query = {name: values[-1] for name, values in parse_qs(parts.query).items()}
+        status, headers, body = self.server.api.handle(parts.path, query, self.headers)
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+def create_server(host: str = DEFAULT_HOST, port: int = DEFAULT_PORT, verbose: bool = False) -> ThreadingHTTPServer:
+    init_db()
+    server = ThreadingHTTPServer((host, port), ApiHandler)
+    server.daemon_threads = True
+    server.api = AnalyticsApi()
+    server.verbose = verbose
+    return server
+
+def start_api_server(port: int = 0, host: str = DEFAULT_HOST) -> Tuple[ThreadingHTTPServer, str]:
+    """
+    Serve in a background thread; returns (server, base URL)
+    """
+    server = create_server(host, port)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f'http://{host}:{server.server_address[1]}'
+
+def main():
+    parser = argparse.ArgumentParser(description='StockSentry analytics API')
+    parser.add_argument('--host', default=DEFAULT_HOST)
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--verbose', action='store_true', help='log every request')
+    args = parser.parse_args()
+    server = create_server(args.host, args.port, args.verbose)
+    print(f'Serving analytics API on http://{args.host}:{args.port}')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,145 @@
+"""
+Load test for the analytics API. Keeps one keep-alive connection per
+client thread and reports throughput and latency percentiles:
+
+    python -m benchmarks.api_load_test --clients 8 --requests 2000
+    python -m benchmarks.api_load_test --url http://127.0.0.1:8502 --paths /v1/prices/AAPL
+
+Without --url an in-process server on synthetic data and a scratch
+database is started, so no network access is needed.
+"""
+import argparse
+import http.client
+import json
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from urllib.parse import urlsplit
+
+DEFAULT_SYMBOLS = ['SYN0', 'SYN1', 'SYN2', 'SYN3']
+DEFAULT_PATHS = [
+    '/v1/prices/{symbol}?period=1y',
+    '/v1/indicators/{symbol}?period=1y',
+    '/v1/risk/{symbol}?period=1y',
+    '/v1/scores/{symbol}',
+]
+
+def _client(base_url: str, paths, n_requests: int, headers: dict, conditional: bool, results: list):
+    parts = urlsplit(base_url)
+    conn = http.client.HTTPConnection(parts.hostname, parts.port, timeout=30)
+    etags = {}
+    latencies, statuses, received = [], {}, 0
+    for i in range(n_requests):
+        path = paths[i % len(paths)]
+        request_headers = dict(headers)
+        if conditional and path in etags:
+            request_headers['If-None-Match'] = etags[path]
+        start = time.perf_counter()
+        try:
+            conn.request('GET', path, headers=request_headers)
+            response = conn.getresponse()
+            body = response.read()
+        except (OSError, http.client.HTTPException):
+            conn.close()
+            conn = http.client.HTTPConnection(parts.hostname, parts.port, timeout=30)
+            statuses['error'] = statuses.get('error', 0) + 1
+            continue
+        latencies.append(time.perf_counter() - start)
+        statuses[response.status] = statuses.get(response.status, 0) + 1
+        received += len(body)
+        if response.getheader('ETag'):
+            etags[path] = response.getheader('ETag')
+    conn.close()
+    results.append((latencies, statuses, received))
+
+def run_load_test(base_url: str, paths, clients: int, requests_per_client: int,
+                  gzip: bool = True, conditional: bool = False, arrow: bool = False) -> dict:
+    """
+    Drive base_url from `clients` threads; returns a summary dict
+    """
+    headers = {'Accept-Encoding': 'gzip'} if gzip else {}
+    if arrow:
+        headers['Accept'] = 'application/vnd.apache.arrow.stream'
+    results = []
+    threads = [threading.Thread(target=_client, args=(base_url, paths, requests_per_client, headers,
+                                                      conditional, results))
+               for _ in range(clients)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    latencies = sorted(l for result in results for l in result[0])
+    statuses = {}
+    for _, result_statuses, _ in results:
+        for status, n in result_statuses.items():
+            statuses[str(status)] = statuses.get(str(status), 0) + n
+
+    def percentile(q):
+        return latencies[min(len(latencies) - 1, int(q * len(latencies)))] * 1000 if latencies else float('nan')
+
+    return {
+        'clients': clients,
+        'requests': len(latencies),
+        'elapsed_s': elapsed,
+        'rps': len(latencies) / elapsed if elapsed else 0.0,
+        'p50_ms': percentile(0.50),
+        'p95_ms': percentile(0.95),
+        'p99_ms': percentile(0.99),
+        'mean_ms': statistics.mean(latencies) * 1000 if latencies else float('nan'),
+        'bytes_received': sum(result[2] for result in results),
+        'statuses': statuses,
+    }
+
+def _local_server():
+    # The scratch database must be configured before utils is imported
+    scratch_dir = tempfile.mkdtemp(prefix='stocksentry-api-')
+    os.environ.setdefault('STOCKSENTRY_DB_URL', f"sqlite:///{os.path.join(scratch_dir, 'api.db')}")
+    from utils.providers import set_provider
+    from benchmarks.synthetic import SyntheticProvider
+    from api import start_api_server
+    set_provider(SyntheticProvider())
+    return start_api_server()
+
+def main():
+    parser = argparse.ArgumentParser(description='Load test the analytics API')
+    parser.add_argument('--url', help='base URL of a running API; default starts a local synthetic one')
+    parser.add_argument('--clients', type=int, default=8)
+    parser.add_argument('--requests', type=int, default=2000, help='total requests across all clients')
+    parser.add_argument('--symbols', nargs='+', default=DEFAULT_SYMBOLS)
+    parser.add_argument('--paths', nargs='+', default=DEFAULT_PATHS, help='paths; {symbol} is expanded')
+    parser.add_argument('--no-gzip', action='store_true')
+    parser.add_argument('--conditional', action='store_true', help='revalidate with If-None-Match')
+    parser.add_argument('--arrow', action='store_true', help='request Arrow instead of JSON')
+    parser.add_argument('--output', help='write the summary as JSON')
+    args = parser.parse_args()
+
+    server = None
+    base_url = args.url
+    if not base_url:
+        server, base_url = _local_server()
+    paths = [path.format(symbol=symbol) for path in args.paths for symbol in args.symbols]
+
+    # Warm the caches so the run measures steady state
+    run_load_test(base_url, paths, 1, len(paths), not args.no_gzip, arrow=args.arrow)
+    summary = run_load_test(base_url, paths, args.clients, max(1, args.requests // args.clients),
+                            not args.no_gzip, args.conditional, args.arrow)
+    if server is not None:
+        server.shutdown()
+
+    print(f"{summary['requests']} requests from {summary['clients']} clients in {summary['elapsed_s']:.2f} s")
+    print(f"{summary['rps']:.1f} req/s  p50 {summary['p50_ms']:.2f} ms  p95 {summary['p95_ms']:.2f} ms  "
+          f"p99 {summary['p99_ms']:.2f} ms")
+    print(f"statuses {summary['statuses']}  {summary['bytes_received'] / 2 ** 20:.1f} MiB received")
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(summary, f, indent=2)
+    return 0 if 'error' not in summary['statuses'] else 1
+
+if __name__ == '__main__':
+    sys.exit(main())
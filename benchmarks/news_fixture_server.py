@@ -0,0 +1,91 @@
+"""
+Local RSS server with deterministic headlines, for running the news
+pipeline without network access:
+
+    python -m benchmarks.news_fixture_server --port 8765
+    STOCKSENTRY_NEWS_URL=http://127.0.0.1:8765/rss streamlit run main.py
+"""
+import argparse
+import threading
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+from xml.sax.saxutils import escape
+
+import numpy as np
+
+HEADLINES = [
+    '{symbol} beats earnings expectations with strong revenue growth',
+    '{symbol} shares surge after excellent product launch',
+    '{symbol} announces record buyback and higher dividend',
+    '{symbol} faces lawsuit over data privacy failures',
+    '{symbol} shares fall after weak guidance and poor margins',
+    '{symbol} hit by regulatory probe into accounting',
+    '{symbol} to present at industry conference',
+    '{symbol} schedules quarterly results call',
+]
+
+def make_rss(symbol: str, items: int = 20, now: datetime = None) -> bytes:
+    """
+    RSS 2.0 feed for symbol; stable for a given day, and repeats one
+    story so deduplication is exercised
+    """
+    now = now or datetime.now(timezone.utc)
+    rng = np.random.default_rng(sum(ord(c) * 31 ** i for i, c in enumerate(symbol)) % 2 ** 32)
+    entries = []
+    for i in range(items - 1):
+        template = HEADLINES[int(rng.integers(len(HEADLINES)))]
+        published = (now - timedelta(hours=int(rng.integers(1, 24 * 14)))).replace(minute=0, second=0, microsecond=0)
+        title = template.format(symbol=symbol) + f' ({i})'
+        entries.append(
+            '<item>'
+            f'<title>{escape(title)}</title>'
+            f'<link>https://example.com/{symbol}/{i}</link>'
+            f'<description>{escape("<p>" + title + "</p>")}</description>'
+            f'<pubDate>{format_datetime(published)}</pubDate>'
+            '</item>'
+        )
+    entries.append(entries[0])
+    return ('<?xml version="1.0" encoding="UTF-8"?><rss version="2.0"><channel>'
+            f'<title>{escape(symbol)} headlines</title>' + ''.join(entries) +
+            '</channel></rss>').encode()
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        query = parse_qs(urlsplit(self.path).query)
+        self.server.requests.append(self.path)
+        symbol = query.get('s', ['UNKNOWN'])[0].upper()
+        body = make_rss(symbol)
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/rss+xml')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+def _make_server(port: int) -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer(('127.0.0.1', port), _Handler)
+    server.requests = []  # paths served, for assertions in tests
+    return server
+
+def start_news_server(port: int = 0):
+    """
+    Serve in a background thread; returns (server, feed URL)
+    """
+    server = _make_server(port)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f'http://127.0.0.1:{server.server_address[1]}/rss'
+
+def main():
+    parser = argparse.ArgumentParser(description='Fixture RSS server for the news pipeline')
+    parser.add_argument('--port', type=int, default=8765)
+    args = parser.parse_args()
+    server = _make_server(args.port)
+    print(f'Serving fixture news on http://127.0.0.1:{args.port}/rss')
+    server.serve_forever()
+
+if __name__ == '__main__':
+    main()
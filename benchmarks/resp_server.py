@@ -0,0 +1,128 @@
+"""
+Minimal Redis-protocol server for running the shared cache tier without
+Redis. Supports PING, GET, SET (EX/PX/NX/XX), DEL, EXISTS, DBSIZE,
+FLUSHDB, SELECT and QUIT; keys expire lazily.
+
+    python -m benchmarks.resp_server --port 6380
+    STOCKSENTRY_CACHE_URL=redis://127.0.0.1:6380/0 streamlit run main.py
+"""
+import argparse
+import socketserver
+import threading
+import time
+
+class _Store:
+    def __init__(self):
+        self.entries = {}
+        self.lock = threading.Lock()
+
+    def live(self, key):
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        if entry[1] is not None and entry[1] < time.monotonic():
+            del self.entries[key]
+            return None
+        return entry
+
+def _encode(value) -> bytes:
+    if value is None:
+        return b'$-1\r\n'
+    if isinstance(value, int):
+        return b':%d\r\n' % value
+    if isinstance(value, str):
+        return f'+{value}\r\n'.encode()
+    if isinstance(value, Exception):
+        return f'-ERR {value}\r\n'.encode()
+    return b'$%d\r\n%s\r\n' % (len(value), value)
+
+class _Handler(socketserver.StreamRequestHandler):
+    disable_nagle_algorithm = True
+
+    def _read_command(self):
+        line = self.rfile.readline()
+        if not line:
+            return None
+        if not line.startswith(b'*'):
+            return line.split()
+        args = []
+        for _ in range(int(line[1:])):
+            length = int(self.rfile.readline()[1:])
+            args.append(self.rfile.read(length + 2)[:-2])
+        return args
+
+    def handle(self):
+        store = self.server.store
+        while True:
+            try:
+                args = self._read_command()
+            except (ConnectionError, ValueError):
+                return
+            if not args:
+                return
+            name = args[0].upper()
+            try:
+                reply = self._execute(store, name, args[1:])
+            except Exception as e:
+                reply = e
+            self.wfile.write(_encode(reply))
+            if name == b'QUIT':
+                return
+
+    def _execute(self, store, name, args):
+        if name == b'PING':
+            return args[0] if args else 'PONG'
+        if name in (b'SELECT', b'QUIT'):
+            return 'OK'
+        with store.lock:
+            if name == b'GET':
+                entry = store.live(args[0])
+                return entry[0] if entry else None
+            if name == b'SET':
+                key, value, options = args[0], args[1], [a.upper() for a in args[2:]]
+                expires = None
+                for unit, scale in ((b'EX', 1.0), (b'PX', 0.001)):
+                    if unit in options:
+                        expires = time.monotonic() + float(options[options.index(unit) + 1]) * scale
+                exists = store.live(key) is not None
+                if (b'NX' in options and exists) or (b'XX' in options and not exists):
+                    return None
+                store.entries[key] = (value, expires)
+                return 'OK'
+            if name == b'DEL':
+                return sum(store.entries.pop(key, None) is not None for key in args)
+            if name == b'EXISTS':
+                return sum(store.live(key) is not None for key in args)
+            if name == b'DBSIZE':
+                return sum(store.live(key) is not None for key in list(store.entries))
+            if name == b'FLUSHDB':
+                store.entries.clear()
+                return 'OK'
+        raise ValueError(f"unknown command '{name.decode()}'")
+
+class RespServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address):
+        super().__init__(address, _Handler)
+        self.store = _Store()
+
+def start_resp_server(port: int = 0):
+    """
+    Serve in a background thread; returns (server, cache URL)
+    """
+    server = RespServer(('127.0.0.1', port))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f'redis://127.0.0.1:{server.server_address[1]}/0'
+
+def main():
+    parser = argparse.ArgumentParser(description='Redis-protocol stand-in for the shared cache')
+    parser.add_argument('--port', type=int, default=6380)
+    args = parser.parse_args()
+    server = RespServer(('127.0.0.1', args.port))
+    print(f'Serving RESP cache on redis://127.0.0.1:{args.port}/0')
+    server.serve_forever()
+
+if __name__ == '__main__':
+    main()
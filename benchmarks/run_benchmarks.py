@@ -0,0 +1,284 @@
+"""
+Benchmark harness for the data, cache, analytics and chart hot paths.
+
+Runs entirely on synthetic OHLCV data against a scratch SQLite database, and
+writes one JSON record per (benchmark, size) so runs from different commits
+can be diffed:
+
+    python -m benchmarks.run_benchmarks --output bench_results.json
+    python -m benchmarks.run_benchmarks --quick
+    python -m benchmarks.run_benchmarks --compare base.json head.json
+"""
+import argparse
+import itertools
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+# The scratch database must be configured before utils is imported
+_scratch_dir = tempfile.mkdtemp(prefix='stocksentry-bench-')
+os.environ.setdefault('STOCKSENTRY_DB_URL', f"sqlite:///{os.path.join(_scratch_dir, 'bench.db')}")
+
+import pandas as pd
+import plotly.graph_objects as go
+
+from utils.database import init_db
+from utils.providers import set_provider
+from utils.stock_data import get_stock_data, get_company_info
+from utils.analysis import RiskAnalyzer, PriceForecaster
+from utils.technical_analysis import calculate_ichimoku_cloud
+from utils.visualizations import (create_technical_chart, calculate_composite_scores,
+                                  calculate_composite_scores_batch, build_fundamentals_table)
+from utils.data_export import export_to_excel
+from utils.panel import build_price_panel
+from utils.backtest import Backtester, momentum
+from utils.indicator_sweep import IndicatorSweep
+from utils.intraday import resample_ohlcv
+from utils.ohlcv import OHLCVStore
+from benchmarks.synthetic import SyntheticProvider, make_ohlcv, make_info, make_intraday, PERIOD_DAYS
+
+# History lengths, named by the period string used to request them
+SIZES = ['1mo', '1y', '5y', '30y']
+SYMBOL_COUNTS = [1, 10, 100, 1000]
+QUICK_SIZES = ['1mo', '1y']
+QUICK_SYMBOL_COUNTS = [1, 10]
+
+REGRESSION_THRESHOLD = 1.10
+
+_benchmarks = []
+_symbol_counter = itertools.count()
+
+def benchmark(name: str, axis: str):
+    """
+    Register a benchmark. The decorated function receives the size parameter
+    and returns (setup, run); setup() runs untimed before every repeat and its
+    result is passed to run().
+    """
+    def decorator(func):
+        _benchmarks.append((name, axis, func))
+        return func
+    return decorator
+
+def _fresh_symbol() -> str:
+    return f'SYN{next(_symbol_counter):06d}'
+
+@benchmark('get_stock_data.cache_miss', 'period')
+def bench_cache_miss(period):
+    return (lambda: _fresh_symbol()), (lambda symbol: get_stock_data(symbol, period))
+
+@benchmark('get_stock_data.cache_hit', 'period')
+def bench_cache_hit(period):
+    symbol = _fresh_symbol()
+    get_stock_data(symbol, period)
+    return (lambda: symbol), (lambda symbol: get_stock_data(symbol, period))
+
+@benchmark('RiskAnalyzer.calculate_risk_metrics', 'period')
+def bench_risk_metrics(period):
+    df = make_ohlcv(PERIOD_DAYS[period])
+    analyzer = RiskAnalyzer()
+    return (lambda: df), analyzer.calculate_risk_metrics
+
+@benchmark('calculate_ichimoku_cloud', 'period')
+def bench_ichimoku(period):
+    df = make_ohlcv(PERIOD_DAYS[period])
+    return (lambda: df), calculate_ichimoku_cloud
+
+@benchmark('create_technical_chart', 'period')
+def bench_technical_chart(period):
+    df = make_ohlcv(PERIOD_DAYS[period])
+    # Include JSON serialization, which is what Streamlit pays for per chart
+    return (lambda: df.copy()), (lambda frame: create_technical_chart(frame, 'SYN').to_json())
+
+@benchmark('resample_ohlcv', 'period')
+def bench_resample(period):
+    # 5-minute bars for every trading day of the period, rolled up to hourly
+    df = make_intraday(PERIOD_DAYS[period], '5m', 0)
+    return (lambda: df), (lambda d: resample_ohlcv(d, '1h'))
+
+@benchmark('export_to_excel', 'period')
+def bench_export(period):
+    df = make_ohlcv(PERIOD_DAYS[period])
+    info = make_info('SYN')
+    return (lambda: df), (lambda frame: export_to_excel('SYN', frame, info, []))
+
+@benchmark('calculate_composite_scores', 'symbols')
+def bench_composite_scores(n_symbols):
+    infos = [make_info(f'S{i}', i) for i in range(n_symbols)]
+    return (lambda: infos), (lambda items: [calculate_composite_scores(info) for info in items])
+
+@benchmark('calculate_composite_scores_batch', 'symbols')
+def bench_composite_scores_batch(n_symbols):
+    infos = {f'S{i}': make_info(f'S{i}', i) for i in range(n_symbols)}
+    return (lambda: infos), (lambda items: calculate_composite_scores_batch(build_fundamentals_table(items)))
+
+def compare_flow(symbols, period):
+    """
+    What the Compare tab does on each rerun
+    """
+    panel = build_price_panel(symbols, period)
+    info = {}
+    for sym in symbols:
+        info[sym] = get_company_info(sym)
+
+    normalized_prices = panel.normalized_returns()
+    fig = go.Figure()
+    for sym in normalized_prices.columns:
+        fig.add_trace(go.Scatter(x=normalized_prices.index, y=normalized_prices[sym], name=sym, mode='lines'))
+    return fig.to_json()
+
+@benchmark('compare_tab_flow', 'symbols')
+def bench_compare_flow(n_symbols):
+    symbols = [_fresh_symbol() for _ in range(n_symbols)]
+    for sym in symbols:
+        get_stock_data(sym, '1y')
+    return (lambda: symbols), (lambda syms: compare_flow(syms, '1y'))
+
+@benchmark('Backtester.run', 'symbols')
+def bench_backtest(n_symbols):
+    # 20 years of daily bars, monthly rebalanced momentum portfolio
+    prices = pd.DataFrame({f'S{i}': make_ohlcv(PERIOD_DAYS['30y'] * 2 // 3, i)['Close'] for i in range(n_symbols)})
+    backtester = Backtester(prices)
+    weights = momentum(prices, 126, max(1, n_symbols // 10))
+    return (lambda: weights), (lambda w: backtester.run(w, 'M').metrics())
+
+@benchmark('IndicatorSweep.run', 'symbols')
+def bench_indicator_sweep(n_symbols):
+    sweep = IndicatorSweep({f'S{i}': make_ohlcv(PERIOD_DAYS['5y'], i) for i in range(n_symbols)})
+    grid = {'fast': [10, 20, 50], 'slow': [100, 200]}
+    return (lambda: grid), (lambda g: sweep.run('ema_crossover', g))
+
+@benchmark('OHLCVStore.add_frames', 'symbols')
+def bench_ohlcv_store(n_symbols):
+    # 20 years of daily bars per symbol packed into float32 buffers
+    frames = {f'S{i}': make_ohlcv(PERIOD_DAYS['30y'] * 2 // 3, i) for i in range(n_symbols)}
+
+    def run(items):
+        store = OHLCVStore()
+        store.add_frames(items)
+        return store.memory_report()
+    return (lambda: frames), run
+
+@benchmark('PriceForecaster.predict', 'symbols')
+def bench_forecast_predict(n_symbols):
+    # Models are trained once up front; the timed part is feature lookup + inference
+    frames = {f'S{i}': make_ohlcv(PERIOD_DAYS['2y'], i) for i in range(n_symbols)}
+    forecaster = PriceForecaster(model_dir=os.path.join(_scratch_dir, 'models'), n_estimators=50)
+    forecaster.fit(frames)
+    return (lambda: frames), forecaster.predict
+
+def _measure(setup, run, repeats: int) -> dict:
+    timings = []
+    for _ in range(repeats):
+        arg = setup()
+        start = time.perf_counter_ns()
+        run(arg)
+        timings.append(time.perf_counter_ns() - start)
+
+    # Separate pass for memory so tracing overhead doesn't skew timings
+    arg = setup()
+    tracemalloc.start()
+    try:
+        run(arg)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'repeats': repeats,
+        'median_s': statistics.median(timings) / 1e9,
+        'min_s': min(timings) / 1e9,
+        'max_s': max(timings) / 1e9,
+        'peak_memory_bytes': peak,
+    }
+
+def _git_commit() -> str:
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], stderr=subprocess.DEVNULL).decode().strip()
+    except Exception:
+        return 'unknown'
+
+def run_all(sizes, symbol_counts, repeats: int, only=None) -> dict:
+    init_db()
+    set_provider(SyntheticProvider())
+
+    results = []
+    for name, axis, factory in _benchmarks:
+        if only and not any(pattern in name for pattern in only):
+            continue
+        for param in (sizes if axis == 'period' else symbol_counts):
+            record = {'name': name, 'params': {axis: param}}
+            try:
+                setup, run = factory(param)
+                record.update(_measure(setup, run, repeats))
+                record['status'] = 'ok'
+                print(f"{name:40s} {axis}={param!s:6s} {record['median_s'] * 1000:10.2f} ms "
+                      f"{record['peak_memory_bytes'] / 2 ** 20:8.1f} MiB")
+            except Exception as e:
+                record['status'] = f'error: {e}'
+                print(f"{name:40s} {axis}={param!s:6s} ERROR {e}")
+            results.append(record)
+
+    return {
+        'meta': {
+            'commit': _git_commit(),
+            'timestamp': datetime.utcnow().isoformat(),
+            'python': sys.version.split()[0],
+            'platform': platform.platform(),
+            'pandas': pd.__version__,
+        },
+        'results': results,
+    }
+
+def compare(base_path: str, head_path: str) -> int:
+    """
+    Print per-benchmark time ratios; returns the number of regressions
+    """
+    with open(base_path) as f:
+        base = json.load(f)
+    with open(head_path) as f:
+        head = json.load(f)
+
+    def index(run):
+        return {(r['name'], json.dumps(r['params'], sort_keys=True)): r
+                for r in run['results'] if r.get('status') == 'ok'}
+
+    base_results, head_results = index(base), index(head)
+    regressions = 0
+    print(f"{'benchmark':40s} {'params':18s} {'base ms':>10s} {'head ms':>10s} {'ratio':>7s}")
+    for key in sorted(base_results.keys() & head_results.keys()):
+        before = base_results[key]['median_s']
+        after = head_results[key]['median_s']
+        ratio = after / before if before else float('inf')
+        flag = ' REGRESSION' if ratio > REGRESSION_THRESHOLD else ''
+        regressions += bool(flag)
+        print(f"{key[0]:40s} {key[1]:18s} {before * 1000:10.2f} {after * 1000:10.2f} {ratio:7.2f}{flag}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description='StockSentry benchmark suite')
+    parser.add_argument('--output', default='bench_results.json', help='JSON results file')
+    parser.add_argument('--repeats', type=int, default=5)
+    parser.add_argument('--quick', action='store_true', help='Small sizes only')
+    parser.add_argument('--only', nargs='*', help='Run benchmarks whose name contains any of these')
+    parser.add_argument('--compare', nargs=2, metavar=('BASE', 'HEAD'), help='Diff two result files')
+    args = parser.parse_args()
+
+    if args.compare:
+        sys.exit(1 if compare(*args.compare) else 0)
+
+    sizes = QUICK_SIZES if args.quick else SIZES
+    symbol_counts = QUICK_SYMBOL_COUNTS if args.quick else SYMBOL_COUNTS
+    report = run_all(sizes, symbol_counts, args.repeats, args.only)
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f'Results written to {args.output}')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,141 @@
+import numpy as np
+import pandas as pd
+
+from utils.providers import DataProvider
+
+# Trading days per period string understood by SyntheticProvider
+PERIOD_DAYS = {
+    '1mo': 21, '3mo': 63, '6mo': 126, '1y': 252, '2y': 504,
+    '5y': 1260, '10y': 2520, '30y': 7560, 'max': 7560
+}
+
+def make_ohlcv(n_days: int, seed: int = 0, end: pd.Timestamp = None) -> pd.DataFrame:
+    """
+    Geometric random walk OHLCV frame on business days
+    """
+    rng = np.random.default_rng(seed)
+    end = end or pd.Timestamp('2024-12-31')
+    index = pd.bdate_range(end=end, periods=n_days, name='Date')
+
+    returns = rng.normal(0.0003, 0.015, n_days)
+    close = 100 * np.exp(np.cumsum(returns))
+    open_ = close * (1 + rng.normal(0, 0.003, n_days))
+    high = np.maximum(open_, close) * (1 + np.abs(rng.normal(0, 0.006, n_days)))
+    low = np.minimum(open_, close) * (1 - np.abs(rng.normal(0, 0.006, n_days)))
+    volume = rng.integers(1_000_000, 50_000_000, n_days)
+
+    return pd.DataFrame({
+        'Open': open_, 'High': high, 'Low': low, 'Close': close, 'Volume': volume
+    }, index=index)
+
+# Regular US session in minutes after midnight, New York time
+SESSION_OPEN, SESSION_CLOSE = 9 * 60 + 30, 16 * 60
+INTERVAL_MINUTES = {'1m': 1, '2m': 2, '5m': 5, '15m': 15, '30m': 30, '60m': 60, '90m': 90, '1h': 60}
+
+def make_intraday(n_days: int, interval: str = '5m', seed: int = 0, end: pd.Timestamp = None) -> pd.DataFrame:
+    """
+    Random walk OHLCV bars over regular sessions, indexed like yfinance's
+    intraday history (tz-aware, bars labelled by their start)
+    """
+    rng = np.random.default_rng(seed)
+    minutes = INTERVAL_MINUTES[interval]
+    end = end or pd.Timestamp.today().normalize()
+    days = pd.bdate_range(end=end, periods=n_days)
+    offsets = pd.to_timedelta(np.arange(SESSION_OPEN, SESSION_CLOSE, minutes), unit='m')
+    index = pd.DatetimeIndex((days.values[:, None] + offsets.values[None, :]).ravel())\
+        .tz_localize('America/New_York').rename('Datetime')
+
+    n = len(index)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.0015 * np.sqrt(minutes), n)))
+    open_ = np.r_[close[0], close[:-1]]
+    high = np.maximum(open_, close) * (1 + np.abs(rng.normal(0, 0.0005, n)))
+    low = np.minimum(open_, close) * (1 - np.abs(rng.normal(0, 0.0005, n)))
+    volume = rng.integers(1_000, 500_000, n) * minutes
+
+    return pd.DataFrame({
+        'Open': open_, 'High': high, 'Low': low, 'Close': close, 'Volume': volume
+    }, index=index)
+
+SECTOR_INDUSTRIES = [
+    ('Technology', 'Software'), ('Technology', 'Semiconductors'),
+    ('Healthcare', 'Biotechnology'), ('Financial Services', 'Banks'),
+    ('Energy', 'Oil & Gas'), ('Consumer Cyclical', 'Auto Manufacturers')
+]
+
+def make_info(symbol: str, seed: int = 0) -> dict:
+    """
+    Plausible fundamentals dict shaped like yfinance's Ticker.info
+    """
+    rng = np.random.default_rng(seed)
+    return {
+        'symbol': symbol,
+        'longName': f'{symbol} Corp',
+        'sector': 'Technology',
+        'industry': 'Software',
+        'currentPrice': float(rng.uniform(10, 500)),
+        'marketCap': float(rng.uniform(1e9, 2e12)),
+        'enterpriseValue': float(rng.uniform(1e9, 2e12)),
+        'volume': int(rng.integers(1e5, 1e8)),
+        'trailingPE': float(rng.uniform(5, 60)),
+        'forwardPE': float(rng.uniform(5, 40)),
+        'pegRatio': float(rng.uniform(0.2, 4)),
+        'priceToBook': float(rng.uniform(0.5, 8)),
+        'enterpriseToEbitda': float(rng.uniform(4, 30)),
+        'enterpriseToRevenue': float(rng.uniform(1, 15)),
+        'revenueGrowth': float(rng.uniform(-0.2, 0.5)),
+        'earningsGrowth': float(rng.uniform(-0.3, 1.0)),
+        'operatingMargins': float(rng.uniform(0, 0.4)),
+        'profitMargins': float(rng.uniform(0, 0.3)),
+        'returnOnEquity': float(rng.uniform(0, 0.3)),
+        'returnOnAssets': float(rng.uniform(0, 0.15)),
+        'currentRatio': float(rng.uniform(0.5, 3)),
+        'quickRatio': float(rng.uniform(0.5, 2)),
+        'debtToEquity': float(rng.uniform(0, 250)),
+        'dividendYield': float(rng.uniform(0, 0.05)),
+        'beta': float(rng.uniform(0.5, 1.8)),
+    } | dict(zip(('sector', 'industry'), SECTOR_INDUSTRIES[int(rng.integers(len(SECTOR_INDUSTRIES)))]))
+
+def make_sustainability(seed: int = 0) -> pd.DataFrame:
+    """
+    ESG frame shaped like yfinance's Ticker.sustainability
+    """
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({'esgScores': {
+        'totalEsg': float(rng.uniform(10, 45)),
+        'environmentScore': float(rng.uniform(0, 20)),
+        'socialScore': float(rng.uniform(0, 20)),
+        'governanceScore': float(rng.uniform(0, 15)),
+        'highestControversy': float(rng.integers(0, 6)),
+    }})
+
+class SyntheticProvider(DataProvider):
+    """
+    Deterministic, network-free provider; each symbol gets its own seed
+    """
+    def _seed(self, symbol: str) -> int:
+        return sum(ord(c) * 31 ** i for i, c in enumerate(symbol)) % 2 ** 32
+
+    def history(self, symbol: str, **kwargs) -> pd.DataFrame:
+        interval = kwargs.get('interval', '1d')
+        if interval in INTERVAL_MINUTES:
+            period = kwargs.get('period', '1mo')
+            days = int(period[:-1]) * 5 // 7 if period.endswith('d') else PERIOD_DAYS.get(period, 21)
+            return make_intraday(max(days, 1), interval, self._seed(symbol))
+        if 'start' in kwargs and kwargs['start'] is not None:
+            # end is exclusive, as in yfinance
+            index = pd.bdate_range(kwargs['start'], kwargs.get('end') or pd.Timestamp('2024-12-31'), inclusive='left')
+            if index.empty:
+                # e.g. a weekend-only top-up; yfinance returns no rows too
+                return make_ohlcv(0, self._seed(symbol))
+            return make_ohlcv(len(index), self._seed(symbol), end=index[-1])
+        return make_ohlcv(PERIOD_DAYS.get(kwargs.get('period', '1mo'), 21), self._seed(symbol))
+
+    def info(self, symbol: str) -> dict:
+        return make_info(symbol, self._seed(symbol))
+
+    def download(self, tickers, **kwargs) -> pd.DataFrame:
+        symbol = tickers if isinstance(tickers, str) else tickers[0]
+        return self.history(symbol, **kwargs)
+
+    def sustainability(self, symbol: str):
+        return make_sustainability(self._seed(symbol))
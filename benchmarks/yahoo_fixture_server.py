@@ -0,0 +1,135 @@
+"""
+Local stand-in for the Yahoo Finance endpoints yfinance uses, serving the
+deterministic synthetic data, for exercising FetchGateway without network
+access:
+
+    python -m benchmarks.yahoo_fixture_server --port 8766
+    STOCKSENTRY_YAHOO_URL=http://127.0.0.1:8766 streamlit run main.py
+"""
+import argparse
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlsplit
+
+import pandas as pd
+
+from .synthetic import PERIOD_DAYS, SyntheticProvider, make_ohlcv
+
+# Field -> quoteSummary module, as Yahoo splits them; anything else goes in summaryDetail
+INFO_MODULES = {
+    'longName': 'quoteType', 'symbol': 'quoteType',
+    'sector': 'assetProfile', 'industry': 'assetProfile',
+    'currentPrice': 'financialData', 'revenueGrowth': 'financialData', 'earningsGrowth': 'financialData',
+    'operatingMargins': 'financialData', 'profitMargins': 'financialData',
+    'returnOnEquity': 'financialData', 'returnOnAssets': 'financialData',
+    'currentRatio': 'financialData', 'quickRatio': 'financialData', 'debtToEquity': 'financialData',
+    'enterpriseValue': 'defaultKeyStatistics', 'pegRatio': 'defaultKeyStatistics',
+    'priceToBook': 'defaultKeyStatistics', 'enterpriseToEbitda': 'defaultKeyStatistics',
+    'enterpriseToRevenue': 'defaultKeyStatistics', 'forwardPE': 'defaultKeyStatistics',
+}
+
+_provider = SyntheticProvider()
+
+def make_chart(symbol: str, query: dict) -> dict:
+    """
+    v8 chart response for daily bars over the requested range or period1/period2
+    """
+    if 'period1' in query:
+        start = pd.Timestamp(int(query['period1']), unit='s')
+        end = pd.Timestamp(int(query.get('period2', pd.Timestamp.now().timestamp())), unit='s')
+        index = pd.bdate_range(start.normalize(), end.normalize(), inclusive='left')
+        df = make_ohlcv(max(len(index), 1), _provider._seed(symbol), end=index[-1] if len(index) else end)
+    else:
+        df = make_ohlcv(PERIOD_DAYS.get(query.get('range', '1mo'), 21), _provider._seed(symbol))
+    # Daily bars are stamped at the 09:30 New York open, as Yahoo does
+    stamps = (df.index.tz_localize('America/New_York') + pd.Timedelta(hours=9, minutes=30)).asi8 // 10 ** 9
+    return {'chart': {'result': [{
+        'meta': {
+            'currency': 'USD', 'symbol': symbol, 'exchangeName': 'NMS', 'instrumentType': 'EQUITY',
+            'regularMarketPrice': float(df['Close'].iloc[-1]), 'chartPreviousClose': float(df['Close'].iloc[0]),
+            'gmtoffset': -18000, 'timezone': 'EST', 'exchangeTimezoneName': 'America/New_York',
+            'priceHint': 2, 'dataGranularity': query.get('interval', '1d'), 'range': query.get('range', ''),
+            'firstTradeDate': int(stamps[0]), 'regularMarketTime': int(stamps[-1]),
+            'validRanges': ['1d', '5d', '1mo', '3mo', '6mo', '1y', '2y', '5y', '10y', 'ytd', 'max'],
+        },
+        'timestamp': [int(t) for t in stamps],
+        'indicators': {
+            'quote': [{column.lower(): df[column].tolist() for column in ['Open', 'High', 'Low', 'Close', 'Volume']}],
+            'adjclose': [{'adjclose': df['Close'].tolist()}],
+        },
+    }], 'error': None}}
+
+def make_quote_summary(symbol: str, modules: list) -> dict:
+    """
+    v10 quoteSummary response built from the synthetic info and ESG frame
+    """
+    result = {}
+    if 'esgScores' in modules:
+        result['esgScores'] = _provider.sustainability(symbol)['esgScores'].to_dict()
+    info = _provider.info(symbol)
+    for field, value in info.items():
+        module = INFO_MODULES.get(field, 'summaryDetail')
+        if module in modules:
+            result.setdefault(module, {})[field] = value
+    return {'quoteSummary': {'result': [result], 'error': None}}
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        parts = urlsplit(self.path)
+        query = {k: v[0] for k, v in parse_qs(parts.query).items()}
+        path = unquote(parts.path)
+        self.server.requests.append(path)
+        if path.startswith('/v8/finance/chart/'):
+            self._json(make_chart(path.rsplit('/', 1)[-1], query))
+        elif path.startswith('/v10/finance/quoteSummary/'):
+            self._json(make_quote_summary(path.rsplit('/', 1)[-1], query.get('modules', '').split(',')))
+        elif path.startswith('/v7/finance/quote'):
+            self._json({'quoteResponse': {'result': [], 'error': None}})
+        elif path.startswith('/v1/test/getcrumb'):
+            self._send(200, b'fixture-crumb', 'text/plain')
+        elif path.startswith('/ws/fundamentals-timeseries/'):
+            self._json({'timeseries': {'result': [], 'error': None}})
+        elif path in ('', '/'):
+            self._send(200, b'', 'text/plain', {'Set-Cookie': 'A3=fixture; Path=/'})
+        else:
+            self._send(404, b'{"error": "not found"}', 'application/json')
+
+    def _json(self, payload: dict):
+        self._send(200, json.dumps(payload).encode(), 'application/json')
+
+    def _send(self, status: int, body: bytes, content_type: str, headers: dict = None):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+def _make_server(port: int) -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer(('127.0.0.1', port), _Handler)
+    server.requests = []  # paths served, for assertions in tests
+    return server
+
+def start_yahoo_server(port: int = 0):
+    """
+    Serve in a background thread; returns (server, base URL)
+    """
+    server = _make_server(port)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f'http://127.0.0.1:{server.server_address[1]}'
+
+def main():
+    parser = argparse.ArgumentParser(description='Fixture Yahoo Finance server')
+    parser.add_argument('--port', type=int, default=8766)
+    args = parser.parse_args()
+    server = _make_server(args.port)
+    print(f'Serving fixture Yahoo Finance on http://127.0.0.1:{args.port}')
+    server.serve_forever()
+
+if __name__ == '__main__':
+    main()
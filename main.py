@@ -1,35 +1,110 @@
 import streamlit as st
 import yfinance as yf
-from utils.stock_data import get_stock_data, get_company_info, save_user_preference, format_number
-from utils.visualizations import create_price_chart, create_volume_chart, create_metrics_chart
+from utils.stock_data import get_stock_data, get_company_info, save_user_preference, format_number, get_data_version
+from utils.visualizations import create_price_chart, create_volume_chart, create_metrics_chart, create_trace_waterfall, \
+    calculate_composite_scores, downsample_series, create_sparkline, create_correlation_heatmap
+from utils.tracing import start_trace, end_trace, span, trace_to_jsonl
 from utils.database import init_db
+from utils.screener import Screener, ScreenFilterError
+from utils.correlation import CorrelationService
+from utils.panel import build_price_panel, PERIOD_DAYS
+from utils.intraday import get_bars, INTRADAY_MAX_DAYS, TIMEFRAMES
+from utils.async_data import fetch_company_info_many
+from utils.news import get_news_service
+from utils.streaming import QuoteStream, create_quote_source
 import plotly.io as pio
-from utils.data_export import export_to_excel, get_historical_data, get_peer_comparison
+from utils.data_export import export_to_excel, cached_export_to_excel, get_historical_data, get_peer_comparison
 import datetime
 import io
 import pandas as pd
 import plotly.graph_objects as go
 
-def main():
-    # Initialize database
-    init_db()
-
-    # Set default plotly theme
-    pio.templates.default = "plotly_dark"
-
-    # Page config
-    st.set_page_config(
-        page_title="StockSentry Pro",
-        page_icon="🚀",
-        layout="wide",
-        initial_sidebar_state="expanded",
-        menu_items={
-            'Get Help': 'https://stocksentry.pro/docs',
-            'Report a bug': 'https://stocksentry.pro/issues',
-            'About': '# Institutional-Grade Analytics'
-        }
-    )
-
+def render_chart(fig):
+    """
+    Render a Plotly figure full-width; serialization is timed as its own span
+    """
+    with span('plotly.render', title=fig.layout.title.text):
+        st.plotly_chart(fig, use_container_width=True, config={'responsive': True, 'displayModeBar': True})  # Force responsive charts
+
+@st.cache_data(max_entries=256, show_spinner=False)
+def composite_card(symbol, data_version, _info, _df):
+    """
+    Composite score and sparkline for the summary card, memoized per
+    (symbol, data version); underscored arguments are not hashed
+    """
+    scores = calculate_composite_scores(_info)
+    valid = [v for v in scores.values() if pd.notna(v)]
+    overall = sum(valid) / len(valid) if valid else None
+    
+    closes = _df['Close'].dropna()
+    change = (closes.iloc[-1] / closes.iloc[0] - 1) * 100 if len(closes) > 1 else None
+    sparkline = create_sparkline(downsample_series(closes))
+    return overall, scores, change, sparkline
+
+@st.cache_resource
+def get_screener():
+    """
+    One screener table per server process, refreshed incrementally
+    """
+    return Screener()
+
+@st.cache_resource
+def get_correlation_service(period: str):
+    """
+    Returns panel and co-moment sums shared across reruns, one per period
+    so sessions comparing different periods never overwrite each other's rows
+    """
+    return CorrelationService()
+
+@st.cache_resource
+def get_live_quotes():
+    """
+    Process-wide quote buffers and the feed writing into them
+    """
+    stream = QuoteStream()
+    return stream, create_quote_source(stream).start()
+
+@st.fragment(run_every=2)
+def render_live_quotes(symbol):
+    """
+    Live 1-minute bars and risk metrics, redrawn from the in-memory buffers
+    """
+    stream, quote_source = get_live_quotes()
+    if quote_source.simulated:
+        st.warning('SIMULATED feed: a random walk from the last close, not market data')
+    bars = stream.bars(symbol, 60)
+    if bars.empty:
+        st.info('Waiting for the first ticks...')
+        return
+    metrics = stream.risk_metrics(symbol, 60)
+    l1, l2, l3 = st.columns(3)
+    with l1:
+        st.metric('Last', format_number(stream.last_price(symbol), symbol))
+    with l2:
+        st.metric('Volatility (ann.)', f"{metrics['volatility'] * 100:.1f}%" if metrics else 'N/A')
+    with l3:
+        st.metric('Max Drawdown', f"{metrics['max_drawdown'] * 100:.2f}%" if metrics else 'N/A')
+    label = 'SIMULATED' if quote_source.simulated else 'live'
+    render_chart(create_price_chart(bars, f'{symbol} ({label}, 1m)'))
+
+def render_debug_panel(trace):
+    """
+    Per-rerun timing waterfall and counters
+    """
+    with st.expander('⏱️ Debug timings', expanded=True):
+        if not trace.spans:
+            st.info('No spans recorded in this rerun.')
+            return
+        st.plotly_chart(create_trace_waterfall(trace), use_container_width=True)
+        if trace.counters:
+            st.write(trace.counters)
+        st.download_button('Download trace (JSON lines)', trace_to_jsonl(trace),
+                           file_name=f'trace-{trace.id}.jsonl', mime='application/json')
+
+def render_pages():
+    """
+    Tabs and page content for one rerun
+    """
     # Custom CSS
     with open('styles/custom.css') as f:
         st.markdown(f'<style>{f.read()}</style>', unsafe_allow_html=True)
@@ -47,7 +122,7 @@ def main():
 
     # Replace the sidebar navigation with tabs
     st.sidebar.title('StockSentry Pro 🚀')
-    tabs = st.tabs(['📊 Analysis', '🔄 Compare', '🏢 Peers'])
+    tabs = st.tabs(['📊 Analysis', '🔄 Compare', '🏢 Peers', '🔎 Screener'])
 
     # Compliance disclaimer
     st.warning('This platform is for informational purposes only and does not constitute investment advice.')
@@ -63,7 +138,7 @@ def main():
             st.title('Stock Analysis 📊')
             
             # Make input section more compact
-            col1, col2 = st.columns([3, 1])
+            col1, col2, col3 = st.columns([3, 1, 1])
             with col1:
                 symbol = st.text_input('Stock Symbol:', 
                                         value='AAPL',
@@ -72,11 +147,16 @@ def main():
                 period = st.selectbox('Period:', 
                                     ['1mo', '3mo', '6mo', '1y', '2y', '5y', 'max'],
                                     index=2)
+            with col3:
+                interval = st.selectbox('Interval:', TIMEFRAMES, index=TIMEFRAMES.index('1d'),
+                                        help='Intraday bars are stored once at the finest interval fetched; '
+                                             'coarser intervals are resampled from it')
 
             # Create metric cards for key statistics
             if symbol:
                 try:
                     info = get_company_info(symbol)
+                    save_user_preference(symbol, period)
                     
                     # Key metrics in a grid
                     m1, m2, m3, m4 = st.columns(4)
@@ -96,22 +176,38 @@ def main():
 
                     # Rest of the analysis content...
                     # (Keep existing analysis sections but reorganize them into tabs)
-                    analysis_tabs = st.tabs(['📈 Charts', '📊 Metrics', '💰 Financials'])
+                    analysis_tabs = st.tabs(['📈 Charts', '📊 Metrics', '💰 Financials', '📰 News'])
                     
                     with analysis_tabs[0]:
                         # Charts section
                         df = get_stock_data(symbol, period)
-                        price_chart = create_price_chart(df, symbol)
-                        st.plotly_chart(price_chart, use_container_width=True, config={'responsive': True, 'displayModeBar': True})  # Force responsive charts
+                        chart_df = df if interval == '1d' else get_bars(symbol, interval, period)
+                        if interval in INTRADAY_MAX_DAYS and PERIOD_DAYS.get(period, float('inf')) > INTRADAY_MAX_DAYS[interval]:
+                            st.caption(f"{interval} bars are only available for the last {INTRADAY_MAX_DAYS[interval]} days")
+                        if st.toggle('🔴 Live quotes', key='live_mode'):
+                            _, quote_source = get_live_quotes()
+                            quote_source.subscribe([symbol], {symbol: float(df['Close'].iloc[-1])})
+                            render_live_quotes(symbol)
+                        price_chart = create_price_chart(chart_df, symbol)
+                        render_chart(price_chart)
                         
-                        volume_chart = create_volume_chart(df)
-                        st.plotly_chart(volume_chart, use_container_width=True, config={'responsive': True, 'displayModeBar': True})  # Force responsive charts
+                        volume_chart = create_volume_chart(chart_df)
+                        render_chart(volume_chart)
+
+                        if st.button('📥 Prepare Excel export', key='prepare_export'):
+                            try:
+                                excel_bytes = cached_export_to_excel(symbol, chart_df, info, [price_chart, volume_chart])
+                                st.download_button('Download Excel', excel_bytes,
+                                                   file_name=f'{symbol}_analysis.xlsx',
+                                                   mime='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
+                            except Exception as e:
+                                st.error(f"Export failed: {str(e)}")
 
                     with analysis_tabs[1]:
                         # Metrics section
                         # (Existing metrics content)
                         metrics_chart = create_metrics_chart(info)
-                        st.plotly_chart(metrics_chart, use_container_width=True, config={'responsive': True, 'displayModeBar': True})  # Force responsive charts
+                        render_chart(metrics_chart)
 
                     with analysis_tabs[2]:
                         # Financials section
@@ -184,13 +280,42 @@ def main():
                             st.write(f"Forward EPS: {format_number(info.get('forwardEps'), symbol)}")
                             st.write(f"Book Value/Share: {format_number(info.get('bookValue'), symbol)}")
 
+                    with analysis_tabs[3]:
+                        # Headlines and sentiment, refreshed at most once per cache TTL
+                        news_service = get_news_service()
+                        try:
+                            news_service.refresh([symbol])
+                        except Exception as e:
+                            st.warning(f"Could not refresh news: {str(e)}")
+                        daily_sentiment = news_service.get_daily_sentiment(symbol, refresh=False)
+                        if daily_sentiment.empty:
+                            st.info('No recent headlines for this symbol.')
+                        else:
+                            sentiment_fig = go.Figure(go.Bar(
+                                x=daily_sentiment.index,
+                                y=daily_sentiment['mean_polarity'],
+                                marker_color=['green' if value >= 0 else 'red' for value in daily_sentiment['mean_polarity']],
+                                customdata=daily_sentiment['articles'],
+                                hovertemplate='%{x|%Y-%m-%d}: %{y:.2f} (%{customdata} articles)<extra></extra>'
+                            ))
+                            sentiment_fig.update_layout(title='Daily News Sentiment', template='plotly_dark',
+                                                        yaxis_title='Mean polarity', height=300)
+                            render_chart(sentiment_fig)
+                            st.dataframe(news_service.get_articles(symbol, refresh=False),
+                                         hide_index=True, use_container_width=True,
+                                         column_config={'link': st.column_config.LinkColumn('link')})
+
                     # Modern card layout
                     with st.container():
                         col1, col2 = st.columns([2,3])
+                        overall, scores, change, sparkline = composite_card(symbol, get_data_version(df), info, df)
                         with col1:
-                            st.metric('Composite Score', '82/100', '+4.2%', help='Combined technical/fundamental score')
+                            st.metric('Composite Score',
+                                      f"{overall:.0f}/100" if overall is not None else 'N/A',
+                                      f"{change:+.1f}% ({period})" if change is not None else None,
+                                      help=' | '.join(f"{name}: {value:.0f}" for name, value in scores.items() if pd.notna(value)) or 'Combined fundamental score')
                         with col2:
-                            st.altair_chart(create_sparkline(df))
+                            st.plotly_chart(sparkline, use_container_width=True, config={'displayModeBar': False})
 
                 except Exception as e:
                     st.error(f"Error: {str(e)}")
@@ -223,25 +348,26 @@ def main():
         if len(symbols) > 1:
             try:
                 # Fetch data for all symbols
-                data = {}
+                panel = build_price_panel(symbols, comparison_period)
+                missing = [sym for sym in symbols if sym not in panel]
+                if missing:
+                    st.warning(f"No price data for: {', '.join(missing)}")
                 info = {}
                 for sym in symbols:
-                    data[sym] = get_stock_data(sym, comparison_period)
                     info[sym] = get_company_info(sym)
                 
                 # Create comparison tabs
-                comparison_tabs = st.tabs(['📈 Performance', '📊 Metrics', '💰 Fundamentals'])
+                comparison_tabs = st.tabs(['📈 Performance', '📊 Metrics', '💰 Fundamentals', '🔗 Correlation'])
                 
                 with comparison_tabs[0]:
                     # Performance comparison chart
+                    normalized_prices = panel.normalized_returns()
                     fig = go.Figure()
-                    for sym in symbols:
-                        prices = data[sym]['Close']
-                        normalized_prices = (prices / prices.iloc[0] - 1) * 100
+                    for sym in normalized_prices.columns:
                         fig.add_trace(
                             go.Scatter(
                                 x=normalized_prices.index,
-                                y=normalized_prices,
+                                y=normalized_prices[sym],
                                 name=sym,
                                 mode='lines'
                             )
@@ -253,7 +379,7 @@ def main():
                         template='plotly_dark',
                         height=500
                     )
-                    st.plotly_chart(fig, use_container_width=True, config={'responsive': True, 'displayModeBar': True})  # Force responsive charts
+                    render_chart(fig)
                 
                 with comparison_tabs[1]:
                     # Key metrics comparison
@@ -283,7 +409,7 @@ def main():
                                 height=300,
                                 showlegend=False
                             )
-                            st.plotly_chart(fig, use_container_width=True, config={'responsive': True, 'displayModeBar': True})  # Force responsive charts
+                            render_chart(fig)
                 
                 with comparison_tabs[2]:
                     # Fundamental metrics table
@@ -305,6 +431,18 @@ def main():
                         height=400
                     )
 
+                with comparison_tabs[3]:
+                    # Correlation and covariance of daily returns
+                    correlation_service = get_correlation_service(comparison_period)
+                    correlation_service.update(panel)
+                    render_chart(create_correlation_heatmap(correlation_service.correlation(panel.symbols)))
+                    
+                    st.subheader('Annualized Covariance')
+                    st.dataframe(
+                        correlation_service.covariance(panel.symbols, annualize=True).round(4),
+                        use_container_width=True
+                    )
+
             except Exception as e:
                 st.error(f"Error: {str(e)}")
                 st.info("Please check the stock symbols and try again.")
@@ -334,14 +472,11 @@ def main():
                         'NASDAQ': '^IXIC',
                         'Dow Jones': '^DJI'
                     }
-                    for name, idx in market_indexes.items():
-                        try:
-                            idx_info = get_company_info(idx)
-                            if idx_info:
-                                peers.append(idx)
-                                peer_data[idx] = idx_info
-                        except:
-                            continue
+                    index_info, _ = fetch_company_info_many(list(market_indexes.values()))
+                    for idx, idx_info in index_info.items():
+                        if idx_info:
+                            peers.append(idx)
+                            peer_data[idx] = idx_info
                 
                 # Industry Overview
                 st.subheader('Industry Overview')
@@ -352,13 +487,7 @@ def main():
                 
                 with peer_tabs[0]:
                     # Performance comparison
-                    df_peers = pd.DataFrame()
-                    for peer in [base_symbol] + peers:
-                        try:
-                            prices = get_stock_data(peer, '1y')['Close']
-                            df_peers[peer] = (prices / prices.iloc[0] - 1) * 100
-                        except:
-                            continue
+                    df_peers = build_price_panel([base_symbol] + peers, '1y').normalized_returns()
                     
                     fig = go.Figure()
                     for col in df_peers.columns:
@@ -377,7 +506,7 @@ def main():
                         template='plotly_dark',
                         height=500
                     )
-                    st.plotly_chart(fig, use_container_width=True, config={'responsive': True, 'displayModeBar': True})  # Force responsive charts
+                    render_chart(fig)
                 
                 with peer_tabs[1]:
                     # Key metrics comparison
@@ -414,7 +543,7 @@ def main():
                             height=300,
                             showlegend=False
                         )
-                        st.plotly_chart(fig, use_container_width=True, config={'responsive': True, 'displayModeBar': True})  # Force responsive charts
+                        render_chart(fig)
                 
                 with peer_tabs[2]:
                     # Growth metrics
@@ -444,6 +573,76 @@ def main():
                 st.error(f"Error: {str(e)}")
                 st.info("Please check the stock symbol and try again.")
 
+    with tabs[3]:  # Screener Tab
+        st.title('Stock Screener 🔎')
+        
+        col1, col2, col3 = st.columns([3, 1, 1])
+        with col1:
+            screen_expr = st.text_input(
+                'Filter:',
+                value='score_composite > 50 and rsi < 70',
+                help="Comparisons of table columns with numbers or quoted text, joined by and/or, "
+                     "e.g. trailingPE < 20 and ichimoku_cloud == 'above'"
+            )
+        with col2:
+            sort_by = st.selectbox('Sort by:', ['score_composite', 'marketCap', 'rsi', 'change_period',
+                                                'volatility', 'sharpe_ratio', 'trailingPE'])
+        with col3:
+            screen_limit = st.number_input('Rows:', min_value=10, max_value=5000, value=100, step=10)
+        
+        try:
+            screener = get_screener()
+            with st.spinner('Refreshing from the local price cache...'):
+                screener.refresh_from_store()
+            st.caption(f"{len(screener)} tickers in the local price cache")
+            if screener.pending_infos:
+                st.caption('Loading company fundamentals in the background; rerun to update scores')
+            
+            results = screener.screen(screen_expr or None, sort_by=sort_by, limit=int(screen_limit),
+                                      columns=['longName', 'sector', 'last_close', 'change_period', 'marketCap',
+                                               'trailingPE', 'score_composite', 'rsi', 'macd_hist',
+                                               'ichimoku_cloud', 'volatility', 'max_drawdown', 'sharpe_ratio'])
+            st.dataframe(results, use_container_width=True, height=500)
+        except ScreenFilterError as e:
+            st.warning(f"Invalid filter: {str(e)}")
+        except Exception as e:
+            st.error(f"Error: {str(e)}")
+            st.info("Please check the filter expression and try again.")
+
+def main():
+    # Initialize database
+    init_db()
+
+    # Set default plotly theme
+    pio.templates.default = "plotly_dark"
+
+    # Page config
+    st.set_page_config(
+        page_title="StockSentry Pro",
+        page_icon="🚀",
+        layout="wide",
+        initial_sidebar_state="expanded",
+        menu_items={
+            'Get Help': 'https://stocksentry.pro/docs',
+            'Report a bug': 'https://stocksentry.pro/issues',
+            'About': '# Institutional-Grade Analytics'
+        }
+    )
+
+    # Opt-in per-rerun timing spans
+    debug_timings = st.sidebar.checkbox('Debug timings', value=False,
+                                        help='Show where time went during this rerun')
+    trace = start_trace('rerun') if debug_timings else None
+
+    try:
+        render_pages()
+    finally:
+        # Always clear the trace, even if the rerun raised or was stopped
+        if trace is not None:
+            end_trace()
+    if trace is not None:
+        render_debug_panel(trace)
+
     # Compliance footer
     st.markdown('<style>.compliance {color: #4a4a4a; font-size: 0.7em; text-align: right;}</style>', unsafe_allow_html=True)
     st.markdown('<div class="compliance">FINRA/SEC/GDPR compliant</div>', unsafe_allow_html=True)
@@ -458,8 +657,14 @@ def main():
 """, unsafe_allow_html=True)
 
 if __name__ == '__main__':
+    from streamlit import runtime
     import streamlit.web.cli as stcli
     import sys
     
-    sys.argv = ["streamlit", "run", __file__, "--server.port=8501", "--server.address=0.0.0.0"]
-    sys.exit(stcli.main())
\ No newline at end of file
+    # `streamlit run` executes this file as __main__ too; only bootstrap a
+    # server when started with plain `python main.py`
+    if runtime.exists():
+        main()
+    else:
+        sys.argv = ["streamlit", "run", __file__, "--server.port=8501", "--server.address=0.0.0.0"]
+        sys.exit(stcli.main())
\ No newline at end of file
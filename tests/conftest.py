@@ -0,0 +1,7 @@
+import os
+import tempfile
+
+# utils.database binds its engine at import time, so the scratch database
+# must be configured before any test module imports utils
+os.environ.setdefault('STOCKSENTRY_DB_URL',
+                      f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='stocksentry-tests-'), 'test.db')}")
@@ -0,0 +1,84 @@
+import math
+
+import numpy as np
+import pytest
+
+from benchmarks.synthetic import make_info
+from utils.visualizations import (build_fundamentals_table, calculate_composite_scores,
+                                  calculate_composite_scores_batch, score_metric)
+
+CATEGORIES = ['Valuation', 'Growth', 'Profitability', 'Financial Health']
+
+def _mean(scores: list) -> float:
+    # np.mean([]) is NaN too, but warns
+    return float(np.mean(scores)) if scores else np.nan
+
+def _reference_scores(info: dict) -> dict:
+    """
+    The per-company scorer as it was before vectorization. It raised on a
+    None growth or margin value; the batch scorer treats None and NaN like
+    a missing key, so those are dropped first
+    """
+    info = {k: v for k, v in info.items() if not (v is None or (isinstance(v, float) and math.isnan(v)))}
+    valuation = [(info.get('trailingPE', 0), 0, 50, True), (info.get('forwardPE', 0), 0, 30, True),
+                 (info.get('pegRatio', 0), 0, 3, True), (info.get('priceToBook', 0), 0, 5, True)]
+    growth = [(info.get('revenueGrowth', 0) * 100, -20, 50, False),
+              (info.get('earningsGrowth', 0) * 100, -30, 100, False)]
+    profitability = [(info.get('operatingMargins', 0) * 100, 0, 40, False),
+                     (info.get('profitMargins', 0) * 100, 0, 30, False),
+                     (info.get('returnOnEquity', 0) * 100, 0, 25, False),
+                     (info.get('returnOnAssets', 0) * 100, 0, 15, False)]
+    health = [(info.get('currentRatio', 0), 0.5, 3, False), (info.get('quickRatio', 0), 0.5, 2, False),
+              (info.get('debtToEquity', 0), 0, 200, True)]
+    return {
+        'Valuation': _mean([score_metric(*m) for m in valuation if m[0] is not None and m[0] > 0]),
+        'Growth': _mean([score_metric(*m) for m in growth if m[0] is not None]),
+        'Profitability': _mean([score_metric(*m) for m in profitability if m[0] is not None]),
+        'Financial Health': _mean([score_metric(*m) for m in health if m[0] is not None and m[0] > 0]),
+    }
+
+def _cases() -> dict:
+    base = make_info('BASE', seed=1)
+    cases = {f'SYN{i}': make_info(f'SYN{i}', seed=i) for i in range(50)}
+    cases['EMPTY'] = {}
+    cases['MISSING_GROWTH'] = {k: v for k, v in base.items() if k not in ('revenueGrowth', 'earningsGrowth')}
+    cases['MISSING_VALUATION'] = {k: v for k, v in base.items()
+                                  if k not in ('trailingPE', 'forwardPE', 'pegRatio', 'priceToBook')}
+    cases['NONE_FIELDS'] = base | {'trailingPE': None, 'revenueGrowth': None, 'profitMargins': None,
+                                   'quickRatio': None}
+    cases['NAN_FIELDS'] = base | {'forwardPE': np.nan, 'earningsGrowth': np.nan, 'returnOnEquity': np.nan,
+                                  'debtToEquity': np.nan}
+    cases['ALL_NAN'] = {field: np.nan for field in base if field not in ('symbol', 'longName', 'sector', 'industry')}
+    cases['NON_POSITIVE'] = base | {'trailingPE': -12.0, 'pegRatio': 0, 'currentRatio': -1.0, 'debtToEquity': 0.0}
+    cases['OUT_OF_RANGE'] = base | {'trailingPE': 500.0, 'revenueGrowth': 3.0, 'earningsGrowth': -2.0,
+                                    'operatingMargins': -0.5, 'currentRatio': 0.1, 'debtToEquity': 1e6}
+    cases['INTEGERS'] = base | {'trailingPE': 20, 'currentRatio': 2, 'revenueGrowth': 0}
+    return cases
+
+CASES = _cases()
+
+def test_batch_matches_reference():
+    batch = calculate_composite_scores_batch(build_fundamentals_table(CASES))
+    assert list(batch.index) == list(CASES)
+    for symbol, info in CASES.items():
+        expected = _reference_scores(info)
+        np.testing.assert_allclose(batch.loc[symbol, CATEGORIES].to_numpy(dtype=float),
+                                   [expected[c] for c in CATEGORIES], rtol=0, atol=1e-12, equal_nan=True,
+                                   err_msg=symbol)
+
+@pytest.mark.parametrize('symbol', list(CASES))
+def test_scalar_matches_reference(symbol):
+    scores = calculate_composite_scores(CASES[symbol])
+    expected = _reference_scores(CASES[symbol])
+    assert list(scores) == CATEGORIES
+    np.testing.assert_allclose([scores[c] for c in CATEGORIES], [expected[c] for c in CATEGORIES],
+                               rtol=0, atol=1e-12, equal_nan=True)
+
+def test_batch_fills_missing_columns():
+    fundamentals = build_fundamentals_table(CASES).drop(columns=['revenueGrowth', 'trailingPE'])
+    batch = calculate_composite_scores_batch(fundamentals)
+    for symbol, info in CASES.items():
+        expected = _reference_scores({k: v for k, v in info.items() if k not in ('revenueGrowth', 'trailingPE')})
+        np.testing.assert_allclose(batch.loc[symbol, CATEGORIES].to_numpy(dtype=float),
+                                   [expected[c] for c in CATEGORIES], rtol=0, atol=1e-12, equal_nan=True,
+                                   err_msg=symbol)
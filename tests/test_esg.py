@@ -0,0 +1,76 @@
+import pandas as pd
+import pytest
+
+import utils.providers
+from benchmarks.synthetic import SyntheticProvider
+from utils.database import ESGSnapshot, get_session, init_db
+from utils.esg_analysis import ESGAnalyzer
+from utils.providers import set_provider
+
+class FlakyProvider(SyntheticProvider):
+    """
+    Synthetic data, except sustainability() fails with a network error or
+    returns nothing for the listed symbols
+    """
+    def __init__(self, failing=(), unrated=()):
+        self.failing = set(failing)
+        self.unrated = set(unrated)
+        self.sustainability_calls = 0
+
+    def sustainability(self, symbol: str):
+        self.sustainability_calls += 1
+        if symbol in self.failing:
+            raise ConnectionError('connection reset')
+        if symbol in self.unrated:
+            return pd.DataFrame()
+        return super().sustainability(symbol)
+
+@pytest.fixture
+def provider(monkeypatch):
+    monkeypatch.setattr(utils.providers, '_provider', None)
+    init_db()
+    session = get_session()
+    try:
+        session.query(ESGSnapshot).delete()
+        session.commit()
+    finally:
+        session.close()
+    provider = FlakyProvider(failing={'FAIL'}, unrated={'NORATE'})
+    set_provider(provider)
+    return provider
+
+def _stored(symbol: str):
+    session = get_session()
+    try:
+        return [row.source for row in session.query(ESGSnapshot).filter(ESGSnapshot.symbol == symbol)]
+    finally:
+        session.close()
+
+def test_yahoo_scores_carry_their_source(provider):
+    scores = ESGAnalyzer().get_esg_scores('AAPL')
+    assert scores['source'] == 'yahoo'
+    assert scores['total'] == pytest.approx(SyntheticProvider().sustainability('AAPL').loc['totalEsg', 'esgScores'])
+
+def test_no_sustainability_data_stores_an_estimate(provider):
+    analyzer = ESGAnalyzer()
+    report = analyzer.get_esg_report('NORATE')
+    assert report['source'] == report['scores']['source'] == 'estimated'
+    assert _stored('NORATE') == ['estimated']
+    # Estimates are not ESG history
+    assert report['trends']['as_of'] == []
+
+    calls = provider.sustainability_calls
+    analyzer.get_esg_scores('NORATE')
+    assert provider.sustainability_calls == calls
+
+def test_fetch_error_is_not_stored(provider):
+    analyzer = ESGAnalyzer()
+    scores = analyzer.get_esg_scores('FAIL')
+    assert scores['source'] == 'estimated'
+    assert _stored('FAIL') == []
+
+    # The next call goes back to Yahoo instead of serving the estimate
+    provider.failing.clear()
+    assert analyzer.get_esg_scores('FAIL')['source'] == 'yahoo'
+    assert _stored('FAIL') == ['yahoo']
+    assert len(analyzer.get_esg_report('FAIL')['trends']['as_of']) == 1
@@ -0,0 +1,63 @@
+import numpy as np
+import pytest
+import yfinance as yf
+
+import utils.fetch
+from benchmarks.synthetic import SyntheticProvider
+from benchmarks.yahoo_fixture_server import start_yahoo_server
+from utils.fetch import YAHOO_BASE_URL_ENV, FetchGateway, set_gateway
+from utils.providers import YahooProvider
+
+@pytest.fixture(scope='module')
+def yahoo_server(tmp_path_factory):
+    # Keep yfinance's timezone and cookie caches out of the user's home
+    yf.set_tz_cache_location(str(tmp_path_factory.mktemp('yfinance')))
+    server, url = start_yahoo_server()
+    yield server, url
+    server.shutdown()
+    server.server_close()
+
+@pytest.fixture
+def gateway(yahoo_server, monkeypatch):
+    server, url = yahoo_server
+    server.requests.clear()
+    monkeypatch.setenv(YAHOO_BASE_URL_ENV, url)
+    monkeypatch.setattr(utils.fetch, '_gateway', None)
+    gateway = FetchGateway(max_retries=0)
+    set_gateway(gateway)
+    return gateway
+
+def test_env_url_redirects_history(gateway, yahoo_server):
+    server, _ = yahoo_server
+    df = YahooProvider().history('AAPL', period='1mo')
+    expected = SyntheticProvider().history('AAPL', period='1mo')
+
+    assert '/v8/finance/chart/AAPL' in server.requests
+    np.testing.assert_allclose(df['Close'].to_numpy(), expected['Close'].to_numpy())
+    assert list(df.index.tz_localize(None).normalize()) == list(expected.index)
+    assert gateway.metrics.snapshot()['history']['errors'] == 0
+
+def test_env_url_redirects_date_range(gateway, yahoo_server):
+    df = gateway.history('MSFT', start='2024-01-01', end='2024-02-01')
+    assert len(df) == 23
+    assert df.index[0].date().isoformat() == '2024-01-01'
+    assert df.index[-1].date().isoformat() == '2024-01-31'
+
+def test_env_url_redirects_info_and_esg(gateway, yahoo_server):
+    server, _ = yahoo_server
+    info = YahooProvider().info('NVDA')
+    expected = SyntheticProvider().info('NVDA')
+
+    assert '/v10/finance/quoteSummary/NVDA' in server.requests
+    for field in ('longName', 'sector', 'trailingPE', 'revenueGrowth', 'debtToEquity'):
+        assert info[field] == expected[field]
+    esg = YahooProvider().sustainability('NVDA')
+    assert esg.loc['totalEsg', 'esgScores'] == pytest.approx(
+        SyntheticProvider().sustainability('NVDA').loc['totalEsg', 'esgScores'])
+
+def test_env_url_redirects_download(gateway, yahoo_server):
+    server, _ = yahoo_server
+    df = gateway.download('AMZN', period='1mo')
+    assert df.shape == (21, 5)
+    assert '/v8/finance/chart/AMZN' in server.requests
+    assert gateway.metrics.snapshot()['download']['calls'] == 1
@@ -0,0 +1,34 @@
+import os
+
+import joblib
+import pytest
+
+from benchmarks.synthetic import make_ohlcv
+from utils.analysis import PriceForecaster
+
+@pytest.fixture
+def frames():
+    return {'AAPL': make_ohlcv(400, seed=1)}
+
+def _forecaster(model_dir) -> PriceForecaster:
+    return PriceForecaster(model_dir=str(model_dir), n_estimators=10, max_workers=1)
+
+@pytest.mark.parametrize('payload', [b'', b'\x80\x04\x95truncated', b'not a joblib file at all'])
+def test_corrupt_model_file_is_refit(tmp_path, frames, payload):
+    assert _forecaster(tmp_path).fit(frames) == {'AAPL': 'trained'}
+    path = _forecaster(tmp_path)._model_path('AAPL')
+    with open(path, 'wb') as f:
+        f.write(payload)
+
+    forecaster = _forecaster(tmp_path)
+    assert forecaster.predict(frames).empty
+    assert not os.path.exists(path)
+
+    assert forecaster.fit(frames) == {'AAPL': 'trained'}
+    assert list(_forecaster(tmp_path).predict(frames).index) == ['AAPL']
+
+def test_unexpected_model_contents_are_refit(tmp_path, frames):
+    forecaster = _forecaster(tmp_path)
+    joblib.dump(['not', 'a', 'model entry'], forecaster._model_path('AAPL'))
+    assert forecaster.fit(frames) == {'AAPL': 'trained'}
+    assert _forecaster(tmp_path).fit(frames) == {'AAPL': 'current'}
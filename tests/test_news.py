@@ -0,0 +1,88 @@
+import os
+from datetime import timedelta
+
+import pytest
+
+from benchmarks.news_fixture_server import make_rss, start_news_server
+from utils.database import DailySentiment, NewsArticle, NewsFetch, get_session, init_db
+from utils.news import (NEWS_FEED_URL_ENV, SENTIMENT_NEGATIVE, SENTIMENT_POSITIVE, NewsSentimentService,
+                        parse_rss)
+from utils.tracing import end_trace, start_trace
+
+@pytest.fixture(scope='module')
+def news_server():
+    server, url = start_news_server()
+    yield server, url
+    server.shutdown()
+    server.server_close()
+
+@pytest.fixture
+def service(news_server, monkeypatch):
+    server, url = news_server
+    assert os.environ['STOCKSENTRY_DB_URL'].startswith('sqlite:///')
+    monkeypatch.setenv(NEWS_FEED_URL_ENV, url)
+    init_db()
+    session = get_session()
+    try:
+        for model in (NewsArticle, DailySentiment, NewsFetch):
+            session.query(model).delete()
+        session.commit()
+    finally:
+        session.close()
+    server.requests.clear()
+    return NewsSentimentService(ttl=timedelta(minutes=30))
+
+def _fetches(symbol: str):
+    session = get_session()
+    try:
+        return [(row.fetched_at, row.articles) for row in session.query(NewsFetch).filter(NewsFetch.symbol == symbol)]
+    finally:
+        session.close()
+
+def test_refresh_dedupes_repeated_story(service, news_server):
+    server, _ = news_server
+    feed = parse_rss(make_rss('AAPL'))
+    unique_titles = {article['title'] for article in feed}
+    assert len(feed) == len(unique_titles) + 1  # the fixture repeats its first story
+
+    assert service.refresh(['aapl']) == {'AAPL': len(unique_titles)}
+    assert len(server.requests) == 1
+
+    articles = service.get_articles('AAPL', limit=100, refresh=False)
+    assert len(articles) == len(unique_titles)
+    assert set(articles['title']) == unique_titles
+
+def test_refresh_within_ttl_is_served_from_store(service, news_server):
+    server, _ = news_server
+    service.refresh(['MSFT'])
+    fetches = _fetches('MSFT')
+    assert len(fetches) == 1 and len(server.requests) == 1
+
+    trace = start_trace('test')
+    try:
+        assert service.refresh(['MSFT']) == {}
+    finally:
+        end_trace()
+    assert trace.counters == {'news_cache.hit': 1}
+    assert _fetches('MSFT') == fetches
+    assert len(server.requests) == 1
+
+    assert service.refresh(['MSFT'], force=True) == {'MSFT': 0}
+    assert len(server.requests) == 2
+
+def test_daily_sentiment_and_controversy(service):
+    service.refresh(['TSLA'])
+    articles = service.get_articles('TSLA', limit=100, refresh=False)
+    daily = service.get_daily_sentiment('TSLA', days=30, refresh=False)
+
+    by_day = articles.groupby(articles['published_at'].dt.normalize())
+    assert list(daily.index) == list(by_day.size().index)
+    assert daily['articles'].tolist() == by_day.size().tolist()
+    assert daily['negative'].tolist() == by_day['polarity'].apply(lambda p: int((p < SENTIMENT_NEGATIVE).sum())).tolist()
+    assert daily['positive'].tolist() == by_day['polarity'].apply(lambda p: int((p > SENTIMENT_POSITIVE).sum())).tolist()
+    assert daily['mean_polarity'].tolist() == pytest.approx(by_day['polarity'].mean().tolist())
+
+    negative = int((articles['polarity'] < SENTIMENT_NEGATIVE).sum())
+    assert negative > 0
+    assert service.controversy_level('TSLA', refresh=False) == pytest.approx(negative / len(articles) * 100)
+    assert service.controversy_level('NONEWS', refresh=False) is None
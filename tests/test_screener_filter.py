@@ -0,0 +1,43 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.screener import ScreenFilterError, filter_mask
+
+@pytest.fixture
+def table():
+    return pd.DataFrame({
+        'trailingPE': [12.0, 35.0, np.nan, 8.5],
+        'rsi': [25.0, 72.0, 40.0, 65.0],
+        'score_composite': [60.0, 45.0, 70.0, 55.0],
+        'ichimoku_cloud': ['above', 'below', 'inside', 'above'],
+    }, index=['AAA', 'BBB', 'CCC', 'DDD'])
+
+@pytest.mark.parametrize('expr', [
+    'trailingPE < 20',
+    'score_composite > 50 and rsi < 70',
+    "trailingPE < 20 and ichimoku_cloud == 'above'",
+    'rsi < 30 or rsi > 70 and score_composite < 50',
+    "ichimoku_cloud != \"above\" or trailingPE >= 1e1",
+    'rsi <= 40.0 and score_composite>=55',
+])
+def test_matches_pandas_query(table, expr):
+    assert list(table[filter_mask(table, expr)].index) == list(table.query(expr).index)
+
+@pytest.mark.parametrize('expr', [
+    '@pd.io.common',
+    'rsi < @limit',
+    "rsi.__class__.__name__ == 'Series'",
+    'rsi.abs() > 1',
+    'rsi < 30 and',
+    'rsi < rsi',
+    'unknown_column > 1',
+    "ichimoku_cloud > 'above'",
+    '(rsi < 30)',
+    'rsi < 30 xor rsi > 70',
+    '   ',
+    '__import__("os").system("true") == 0',
+])
+def test_rejects_anything_else(table, expr):
+    with pytest.raises(ScreenFilterError):
+        filter_mask(table, expr)
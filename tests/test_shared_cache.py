@@ -0,0 +1,37 @@
+import os
+
+import pytest
+
+from utils.shared_cache import MemoryBackend, SharedCache, ShmFileBackend
+
+@pytest.mark.parametrize('data', [b'', b'\x00truncated', b'\x01not zlib', b'\x07unknown'])
+def test_corrupt_entry_is_a_miss(tmp_path, data):
+    backend = ShmFileBackend(str(tmp_path / 'cache'))
+    cache = SharedCache(backend)
+    backend.set(cache._key('info', 'AAPL'), data, 60)
+
+    assert cache.get('info', 'AAPL', 'missing') == 'missing'
+    assert backend.get(cache._key('info', 'AAPL')) is None
+    assert cache.get_or_compute('info', 'AAPL', lambda: {'symbol': 'AAPL'}) == {'symbol': 'AAPL'}
+    assert cache.get('info', 'AAPL') == {'symbol': 'AAPL'}
+
+def test_memory_backend_corrupt_entry_is_a_miss():
+    cache = SharedCache(MemoryBackend())
+    cache.backend.set(cache._key('prices', 'MSFT'), b'\x00\x80', 60)
+    assert cache.get('prices', 'MSFT') is None
+
+def test_shm_directory_is_private(tmp_path):
+    directory = tmp_path / 'cache'
+    ShmFileBackend(str(directory))
+    assert directory.stat().st_mode & 0o777 == 0o700
+
+    directory.chmod(0o755)
+    ShmFileBackend(str(directory))
+    assert directory.stat().st_mode & 0o777 == 0o700
+
+def test_shm_directory_rejects_symlink(tmp_path):
+    target = tmp_path / 'elsewhere'
+    target.mkdir()
+    os.symlink(target, tmp_path / 'cache')
+    with pytest.raises(PermissionError):
+        ShmFileBackend(str(tmp_path / 'cache'))
@@ -0,0 +1,13 @@
+import pandas as pd
+
+from benchmarks.synthetic import SyntheticProvider
+
+def test_weekend_range_is_empty():
+    df = SyntheticProvider().history('AAPL', start='2024-06-08', end='2024-06-10')
+    assert df.empty
+    assert list(df.columns) == ['Open', 'High', 'Low', 'Close', 'Volume']
+    assert isinstance(df.index, pd.DatetimeIndex)
+
+def test_range_end_is_exclusive():
+    df = SyntheticProvider().history('AAPL', start='2024-06-07', end='2024-06-10')
+    assert list(df.index) == [pd.Timestamp('2024-06-07')]
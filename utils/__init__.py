@@ -4,6 +4,23 @@ from .stock_data import *
 from .visualizations import *
 from .technical_analysis import *
 from .esg_analysis import *
+from .esg_aggregates import *
+from .news import *
+from .streaming import *
 from .data_export import *
 from .database import *
 from .analysis import *
+from .fetch import *
+from .providers import *
+from .tracing import *
+from .batch_export import *
+from .export_cache import *
+from .screener import *
+from .panel import *
+from .intraday import *
+from .async_data import *
+from .shared_cache import *
+from .correlation import *
+from .backtest import *
+from .indicator_sweep import *
+from .ohlcv import *
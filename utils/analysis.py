@@ -1,6 +1,12 @@
 import pandas as pd
 import numpy as np
-from typing import Dict, List, Tuple
+import hashlib
+import json
+import os
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+import joblib
 from sklearn.preprocessing import MinMaxScaler
 from textblob import TextBlob
 import requests
@@ -8,7 +14,10 @@ from datetime import datetime, timedelta
 import yfinance as yf
 from sklearn.ensemble import RandomForestRegressor
 from bs4 import BeautifulSoup
-from .technical_analysis import calculate_ichimoku_cloud  # Add interface import
+from .technical_analysis import calculate_ichimoku_cloud, ema_frame, macd_frame, rsi_frame  # Add interface import
+from .providers import get_provider
+from .stock_data import get_data_version, load_cached_prices
+from .tracing import span, traced
 
 # ESG analysis moved to esg_analysis.py
 # Market analysis and ML prediction remain here
@@ -17,12 +26,20 @@ from .technical_analysis import calculate_ichimoku_cloud  # Add interface import
 print('Investments carry inherent risks including potential loss of principal.')
 print('Investments may lose value. Consult a financial advisor before making decisions.')
 
+def beta_from_benchmark(returns: pd.Series, benchmark_returns: pd.Series) -> float:
+    """
+    Beta of returns relative to a benchmark's returns
+    """
+    return np.cov(returns, benchmark_returns)[0][1] / np.var(benchmark_returns)
+
 class RiskAnalyzer:
-    def calculate_risk_metrics(self, df: pd.DataFrame) -> Dict:
+    @traced()
+    def calculate_risk_metrics(self, df: pd.DataFrame, include_beta: bool = True) -> Dict:
         """
-        Calculate comprehensive risk metrics
+        Calculate comprehensive risk metrics; include_beta=False skips the
+        benchmark download and reports beta as NaN
         """
-        returns = df['Close'].pct_change()
+        returns = df['Close'].pct_change().dropna()
         
         metrics = {
             'volatility': returns.std() * np.sqrt(252),  # Annualized volatility
@@ -31,11 +48,35 @@ class RiskAnalyzer:
             'max_drawdown': self._calculate_max_drawdown(df['Close']),
             'sharpe_ratio': self._calculate_sharpe_ratio(returns),
             'sortino_ratio': self._calculate_sortino_ratio(returns),
-            'beta': self._calculate_beta(returns)
+            'beta': self._calculate_beta(returns) if include_beta else np.nan
         }
         
         return metrics
     
+    @traced()
+    def calculate_risk_metrics_frame(self, prices: pd.DataFrame, periods_per_year: float = 252) -> pd.DataFrame:
+        """
+        calculate_risk_metrics (without beta) for every column of a bars x
+        symbols close-price frame; returns one row per symbol.
+        periods_per_year annualizes bars other than daily ones.
+        """
+        returns = prices.pct_change(fill_method=None)
+        rf_daily = 0.02 / periods_per_year
+        std = returns.std()
+        
+        var_95 = pd.Series(np.abs(np.nanpercentile(returns.to_numpy(), 5, axis=0)), index=prices.columns)
+        tail = returns.where(returns.le(-var_95, axis=1))
+        drawdowns = prices / prices.cummax() - 1
+        
+        return pd.DataFrame({
+            'volatility': std * np.sqrt(periods_per_year),
+            'var_95': var_95,
+            'cvar_95': tail.mean().abs(),
+            'max_drawdown': drawdowns.min().abs(),
+            'sharpe_ratio': np.sqrt(periods_per_year) * (returns - rf_daily).mean() / std,
+            'sortino_ratio': np.sqrt(periods_per_year) * (returns - rf_daily).mean() / returns.where(returns < 0).std()
+        })
+    
     def _calculate_var(self, returns: pd.Series, confidence: float) -> float:
         """Calculate Value at Risk"""
         return abs(np.percentile(returns, (1 - confidence) * 100))
@@ -64,7 +105,272 @@ class RiskAnalyzer:
         downside_returns = returns[returns < 0]
         return np.sqrt(252) * excess_returns.mean() / downside_returns.std()
     
+    @traced()
     def _calculate_beta(self, returns: pd.Series) -> float:
         """Calculate Beta relative to S&P 500"""
-        spy = yf.download('^GSPC', start=returns.index[0], end=returns.index[-1])['Close'].pct_change()
-        return np.cov(returns, spy)[0][1] / np.var(spy) 
\ No newline at end of file
+        spy = get_provider().download('^GSPC', start=returns.index[0], end=returns.index[-1])['Close'].pct_change()
+        return beta_from_benchmark(returns, spy)
+
+
+# Price forecasting
+
+FORECAST_MODEL_DIR_ENV = 'STOCKSENTRY_MODEL_DIR'
+DEFAULT_FORECAST_MODEL_DIR = os.path.join('.cache', 'models')
+FORECAST_LAGS = (1, 2, 3, 5, 10, 20)
+FORECAST_HORIZON = 5
+FORECAST_MIN_ROWS = 120
+FORECAST_HOLDOUT = 0.2
+FORECAST_TRAIN_WORKERS = min(4, os.cpu_count() or 1)
+FORECAST_FEATURE_CACHE_SIZE = 256
+
+def forecast_feature_names(lags=FORECAST_LAGS) -> List[str]:
+    return [f'ret_{lag}' for lag in lags] + ['vol_20', 'rsi_14', 'macd_hist', 'ema_gap_20', 'ema_gap_50', 'volume_z']
+
+@traced()
+def build_feature_tensor(close: pd.DataFrame, volume: pd.DataFrame, lags=FORECAST_LAGS,
+                         horizon: int = FORECAST_HORIZON) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Lagged-return and indicator features for every (date, symbol) of a
+    bars x symbols close/volume frame, computed column-wise.
+
+    Returns features shaped (dates, symbols, features) and the forward
+    `horizon`-bar return shaped (dates, symbols), NaN where unknown.
+    """
+    returns = close.pct_change(fill_method=None)
+    macd, signal = macd_frame(close)
+    volume_mean = volume.rolling(20, min_periods=20).mean()
+    volume_std = volume.rolling(20, min_periods=20).std()
+    features = [close / close.shift(lag) - 1 for lag in lags] + [
+        returns.rolling(20, min_periods=20).std(),
+        rsi_frame(close, 14) / 100,
+        (macd - signal) / close,
+        close / ema_frame(close, 20) - 1,
+        close / ema_frame(close, 50) - 1,
+        (volume - volume_mean) / volume_std.replace(0, np.nan),
+    ]
+    tensor = np.stack([f.to_numpy(dtype=np.float64) for f in features], axis=-1)
+    target = (close.shift(-horizon) / close - 1).to_numpy(dtype=np.float64)
+    return tensor, target
+
+def _fit_forecast_model(X: np.ndarray, y: np.ndarray, params: Dict) -> Tuple[RandomForestRegressor, Dict]:
+    """
+    Score on a chronological holdout, then refit on all rows
+    """
+    split = int(len(X) * (1 - FORECAST_HOLDOUT))
+    model = RandomForestRegressor(**params)
+    model.fit(X[:split], y[:split])
+    predicted = model.predict(X[split:])
+    actual = y[split:]
+    scores = {
+        'holdout_mae': float(np.mean(np.abs(predicted - actual))),
+        'holdout_hit_rate': float(np.mean(np.sign(predicted) == np.sign(actual))),
+        'train_rows': int(len(X)),
+    }
+    model.fit(X, y)
+    return model, scores
+
+class PriceForecaster:
+    """
+    Random forest forecasts of the forward `horizon`-bar return.
+
+    Per-symbol models (or one pooled model over all symbols) are persisted
+    with the data version of the prices they were trained on and are only
+    retrained when new bars arrive. Features are built at once for all
+    symbols sharing the same bars and memoised per data version.
+    """
+    def __init__(self, model_dir: Optional[str] = None, horizon: int = FORECAST_HORIZON,
+                 lags=FORECAST_LAGS, n_estimators: int = 200, max_depth: Optional[int] = 8,
+                 max_workers: int = FORECAST_TRAIN_WORKERS, random_state: int = 0):
+        self.model_dir = model_dir or os.environ.get(FORECAST_MODEL_DIR_ENV, DEFAULT_FORECAST_MODEL_DIR)
+        self.horizon = horizon
+        self.lags = tuple(lags)
+        self.max_workers = max_workers
+        self.params = {'n_estimators': n_estimators, 'max_depth': max_depth,
+                       'min_samples_leaf': 5, 'random_state': random_state}
+        self.feature_names = forecast_feature_names(self.lags)
+        self._features = OrderedDict()
+        self._models: Dict[str, Dict] = {}
+
+    def _model_path(self, name: str) -> str:
+        return os.path.join(self.model_dir, f'{name}-h{self.horizon}.joblib')
+
+    def _load_model(self, name: str) -> Optional[Dict]:
+        if name not in self._models:
+            path = self._model_path(name)
+            try:
+                entry = joblib.load(path)
+                if not isinstance(entry, dict) or not {'model', 'scores', 'data_version'} <= entry.keys():
+                    raise ValueError('unexpected model file contents')
+            except FileNotFoundError:
+                return None
+            except Exception as e:
+                # Truncated, corrupt or written by an incompatible scikit-learn: refit
+                print(f"Discarding model {path}: {str(e)}")
+                try:
+                    os.unlink(path)
+                except OSError:
+                    pass
+                return None
+            self._models[name] = entry
+        return self._models[name]
+
+    def _save_model(self, name: str, entry: Dict):
+        os.makedirs(self.model_dir, exist_ok=True)
+        path = self._model_path(name)
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        joblib.dump(entry, tmp_path)
+        os.replace(tmp_path, path)
+        self._models[name] = entry
+
+    @traced()
+    def features(self, frames: Dict[str, pd.DataFrame]) -> Dict[str, Tuple[np.ndarray, np.ndarray, pd.DatetimeIndex]]:
+        """
+        (features, target, dates) per symbol, reusing matrices whose data
+        version has not changed
+        """
+        result, missing = {}, {}
+        for symbol, df in frames.items():
+            key = (symbol, get_data_version(df), self.horizon, self.lags)
+            if key in self._features:
+                self._features.move_to_end(key)
+                result[symbol] = self._features[key]
+            else:
+                missing[symbol] = (key, df)
+
+        if missing:
+            # Features are computed column-wise only across symbols sharing
+            # the same bars, so lags and windows never span another
+            # symbol's dates
+            groups: List[Tuple[pd.Index, List[str]]] = []
+            for symbol, (_, df) in missing.items():
+                for index, symbols in groups:
+                    if index.equals(df.index):
+                        symbols.append(symbol)
+                        break
+                else:
+                    groups.append((df.index, [symbol]))
+            for index, symbols in groups:
+                close = pd.DataFrame({symbol: missing[symbol][1]['Close'].to_numpy() for symbol in symbols}, index=index)
+                volume = pd.DataFrame({symbol: missing[symbol][1]['Volume'].to_numpy() for symbol in symbols},
+                                      index=index).astype(np.float64)
+                tensor, target = build_feature_tensor(close, volume, self.lags, self.horizon)
+                for j, symbol in enumerate(symbols):
+                    key = missing[symbol][0]
+                    entry = (np.ascontiguousarray(tensor[:, j]), target[:, j], pd.DatetimeIndex(index))
+                    self._features[key] = result[symbol] = entry
+            while len(self._features) > FORECAST_FEATURE_CACHE_SIZE:
+                self._features.popitem(last=False)
+        return result
+
+    @staticmethod
+    def _training_rows(X: np.ndarray, y: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        usable = ~np.isnan(X).any(axis=1) & ~np.isnan(y)
+        return X[usable], y[usable]
+
+    @traced()
+    def fit(self, frames: Dict[str, pd.DataFrame], pooled: bool = False, force: bool = False) -> Dict[str, str]:
+        """
+        Train models whose stored data version differs from the given
+        prices. Returns symbol -> 'trained', 'current' or 'insufficient data'.
+        """
+        versions = {symbol: get_data_version(df) for symbol, df in frames.items()}
+        if pooled:
+            name = self._pooled_name(frames)
+            version = json.dumps(sorted(versions.items()))
+            entry = self._load_model(name)
+            if entry is not None and entry['data_version'] == version and not force:
+                return {symbol: 'current' for symbol in frames}
+            matrices = self.features(frames)
+            rows = [self._training_rows(X, y) for X, y, _ in matrices.values()]
+            X = np.concatenate([X for X, _ in rows])
+            y = np.concatenate([y for _, y in rows])
+            if len(X) < FORECAST_MIN_ROWS:
+                return {symbol: 'insufficient data' for symbol in frames}
+            with span('forecast.train', symbols=len(frames), rows=len(X), pooled=True):
+                model, scores = _fit_forecast_model(X, y, {**self.params, 'n_jobs': -1})
+            self._save_model(name, self._entry(model, scores, version))
+            return {symbol: 'trained' for symbol in frames}
+
+        status, todo = {}, {}
+        for symbol, version in versions.items():
+            entry = self._load_model(symbol)
+            if entry is not None and entry['data_version'] == version and not force:
+                status[symbol] = 'current'
+            else:
+                todo[symbol] = version
+        if not todo:
+            return status
+
+        matrices = self.features({symbol: frames[symbol] for symbol in todo})
+        jobs = {}
+        for symbol in todo:
+            X, y, _ = matrices[symbol]
+            X, y = self._training_rows(X, y)
+            if len(X) < FORECAST_MIN_ROWS:
+                status[symbol] = 'insufficient data'
+            else:
+                jobs[symbol] = (X, y)
+
+        with span('forecast.train', symbols=len(jobs), workers=self.max_workers):
+            if self.max_workers <= 1 or len(jobs) <= 1:
+                fitted = {symbol: _fit_forecast_model(X, y, self.params) for symbol, (X, y) in jobs.items()}
+            else:
+                with ProcessPoolExecutor(max_workers=min(self.max_workers, len(jobs))) as pool:
+                    futures = {symbol: pool.submit(_fit_forecast_model, X, y, self.params)
+                               for symbol, (X, y) in jobs.items()}
+                    fitted = {symbol: future.result() for symbol, future in futures.items()}
+
+        for symbol, (model, scores) in fitted.items():
+            self._save_model(symbol, self._entry(model, scores, todo[symbol]))
+            status[symbol] = 'trained'
+        return status
+
+    def _entry(self, model, scores: Dict, version: str) -> Dict:
+        return {
+            'model': model,
+            'data_version': version,
+            'trained_at': datetime.utcnow(),
+            'horizon': self.horizon,
+            'lags': self.lags,
+            'features': self.feature_names,
+            'scores': scores,
+        }
+
+    @staticmethod
+    def _pooled_name(frames: Dict[str, pd.DataFrame]) -> str:
+        return 'pooled-' + hashlib.sha1(','.join(sorted(frames)).encode()).hexdigest()[:12]
+
+    @traced()
+    def predict(self, frames: Dict[str, pd.DataFrame], pooled: bool = False) -> pd.DataFrame:
+        """
+        Forecast from the latest bar of each symbol; one row per symbol.
+        stale is True when the model predates the latest prices.
+        """
+        name = self._pooled_name(frames) if pooled else None
+        matrices = self.features(frames)
+        rows = {}
+        for symbol, (X, _, dates) in matrices.items():
+            entry = self._load_model(name or symbol)
+            latest = X[-1:]
+            if entry is None or np.isnan(latest).any():
+                continue
+            expected = float(entry['model'].predict(latest)[0])
+            last_close = float(frames[symbol]['Close'].iloc[-1])
+            rows[symbol] = {
+                'as_of': dates[-1],
+                'horizon': self.horizon,
+                'expected_return': expected,
+                'predicted_close': last_close * (1 + expected),
+                'holdout_mae': entry['scores']['holdout_mae'],
+                'holdout_hit_rate': entry['scores']['holdout_hit_rate'],
+                'stale': not pooled and entry['data_version'] != get_data_version(frames[symbol]),
+            }
+        return pd.DataFrame.from_dict(rows, orient='index')
+
+    def fit_predict_from_store(self, symbols: List[str], pooled: bool = False) -> pd.DataFrame:
+        """
+        Train if needed and forecast straight from the local price cache
+        """
+        frames = load_cached_prices(symbols)
+        self.fit(frames, pooled=pooled)
+        return self.predict(frames, pooled=pooled)
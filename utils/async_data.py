@@ -0,0 +1,201 @@
+import asyncio
+import concurrent.futures
+import contextvars
+import functools
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from .analysis import beta_from_benchmark
+from .esg_analysis import ESGAnalyzer
+from .providers import get_provider
+from .stock_data import get_company_info, get_stock_data, get_stock_data_range
+from .tracing import span
+
+# Blocking provider and cache calls run on one bounded pool shared by every
+# coroutine, whatever the fan-out
+ASYNC_EXECUTOR_WORKERS = 16
+ASYNC_TIMEOUT = 30.0  # seconds per call
+# Concurrent calls allowed per endpoint; the FetchGateway rate limit still applies
+ASYNC_ENDPOINT_LIMITS = {'history': 8, 'info': 8, 'download': 4, 'esg': 4}
+ASYNC_DEFAULT_LIMIT = 8
+
+class AsyncDataLayer:
+    """
+    asyncio counterparts of the blocking data functions.
+
+    Each call waits on a per-endpoint semaphore, then runs on a bounded
+    executor under a timeout, so fanning out over hundreds of symbols
+    neither opens one thread per request nor exceeds the endpoint limits.
+    Cancelling a caller (or hitting its timeout) releases its slot at once;
+    a call already running in the executor finishes in the background and
+    its result is dropped. Calls run in a copy of the caller's context, so
+    their spans and counters land on the caller's trace.
+
+    run_sync() drives a coroutine from synchronous code such as the
+    Streamlit script on a long-lived background event loop.
+    """
+    def __init__(self, max_workers: int = ASYNC_EXECUTOR_WORKERS, limits: Optional[Dict[str, int]] = None,
+                 timeout: float = ASYNC_TIMEOUT):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='stocksentry-async')
+        self.limits = {**ASYNC_ENDPOINT_LIMITS, **(limits or {})}
+        self.timeout = timeout
+        # Semaphores belong to the loop they are used on
+        self._semaphores = weakref.WeakKeyDictionary()
+        self._loop = None
+        self._loop_lock = threading.Lock()
+
+    def _semaphore(self, endpoint: str) -> asyncio.Semaphore:
+        per_loop = self._semaphores.setdefault(asyncio.get_running_loop(), {})
+        if endpoint not in per_loop:
+            per_loop[endpoint] = asyncio.Semaphore(self.limits.get(endpoint, ASYNC_DEFAULT_LIMIT))
+        return per_loop[endpoint]
+
+    async def call(self, endpoint: str, fn: Callable, *args, timeout: Optional[float] = None, **kwargs) -> Any:
+        """
+        Run blocking fn on the executor within the endpoint's concurrency
+        limit; raises asyncio.TimeoutError after timeout seconds
+        """
+        loop = asyncio.get_running_loop()
+        async with self._semaphore(endpoint):
+            # run_in_executor does not carry contextvars over to the worker thread
+            ctx = contextvars.copy_context()
+            future = loop.run_in_executor(self.executor, functools.partial(ctx.run, fn, *args, **kwargs))
+            return await asyncio.wait_for(future, self.timeout if timeout is None else timeout)
+
+    async def gather(self, fn: Callable[..., Awaitable], symbols: List[str], *args,
+                     limit: Optional[int] = None, **kwargs) -> Tuple[Dict[str, Any], Dict[str, str]]:
+        """
+        Await fn(symbol, *args, **kwargs) for every symbol concurrently
+        (at most limit at once, if given); returns (results, errors) keyed
+        by symbol
+        """
+        symbols = list(dict.fromkeys(symbols))
+        semaphore = asyncio.Semaphore(limit) if limit else None
+
+        async def _one(symbol):
+            if semaphore is None:
+                return await fn(symbol, *args, **kwargs)
+            async with semaphore:
+                return await fn(symbol, *args, **kwargs)
+
+        outcomes = await asyncio.gather(*(_one(symbol) for symbol in symbols), return_exceptions=True)
+        results, errors = {}, {}
+        for symbol, outcome in zip(symbols, outcomes):
+            if isinstance(outcome, BaseException):
+                if isinstance(outcome, asyncio.CancelledError):
+                    raise outcome
+                errors[symbol] = str(outcome) or type(outcome).__name__
+            else:
+                results[symbol] = outcome
+        return results, errors
+
+    async def get_stock_data(self, symbol: str, period: str, timeout: Optional[float] = None) -> pd.DataFrame:
+        return await self.call('history', get_stock_data, symbol, period, timeout=timeout)
+
+    async def get_stock_data_range(self, symbol: str, start_date, end_date,
+                                   timeout: Optional[float] = None) -> pd.DataFrame:
+        return await self.call('history', get_stock_data_range, symbol, start_date, end_date, timeout=timeout)
+
+    async def get_company_info(self, symbol: str, timeout: Optional[float] = None) -> dict:
+        return await self.call('info', get_company_info, symbol, timeout=timeout)
+
+    async def get_esg_scores(self, symbol: str, analyzer: Optional[ESGAnalyzer] = None,
+                             timeout: Optional[float] = None) -> Dict[str, float]:
+        analyzer = analyzer or ESGAnalyzer()
+        return await self.call('esg', analyzer.get_esg_scores, symbol, timeout=timeout)
+
+    async def get_historical_data(self, symbols: List[str], start_date, end_date,
+                                  limit: Optional[int] = None) -> Tuple[Dict[str, pd.DataFrame], Dict[str, str]]:
+        """
+        Date-range histories for many symbols through the price cache;
+        returns (data, errors) keyed by symbol
+        """
+        return await self.gather(self.get_stock_data_range, symbols, start_date, end_date, limit=limit)
+
+    async def get_peer_comparison(self, symbol: str) -> tuple:
+        """
+        Peer symbols of symbol and their company info, fetched concurrently
+        """
+        info = await self.get_company_info(symbol)
+        peers = info.get('recommendationKey', [])
+        peer_data, errors = await self.gather(self.get_company_info, list(peers))
+        if errors:
+            raise Exception(f"Failed to fetch peer data: {errors}")
+        return peers, peer_data
+
+    async def calculate_beta(self, returns: pd.Series, timeout: Optional[float] = None) -> float:
+        """
+        Beta of returns against the S&P 500, like RiskAnalyzer._calculate_beta
+        """
+        benchmark = await self.call('download', get_provider().download, '^GSPC',
+                                    start=returns.index[0], end=returns.index[-1], timeout=timeout)
+        return beta_from_benchmark(returns, benchmark['Close'].pct_change())
+
+    def _event_loop(self) -> asyncio.AbstractEventLoop:
+        with self._loop_lock:
+            if self._loop is None or self._loop.is_closed():
+                self._loop = asyncio.new_event_loop()
+                threading.Thread(target=self._loop.run_forever, name='stocksentry-async-loop', daemon=True).start()
+            return self._loop
+
+    def run_sync(self, coro: Awaitable, timeout: Optional[float] = None) -> Any:
+        """
+        Run a coroutine on the background loop and wait for its result;
+        on timeout the coroutine is cancelled
+        """
+        loop = self._event_loop()
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            coro.close()
+            raise RuntimeError("run_sync() cannot be called from the async data layer's own loop")
+        # The task is created in a copy of the caller's context (e.g. its active trace)
+        future = contextvars.copy_context().run(asyncio.run_coroutine_threadsafe, coro, loop)
+        try:
+            return future.result(timeout)
+        except concurrent.futures.TimeoutError:
+            future.cancel()
+            raise
+
+_async_layer = None
+_async_layer_lock = threading.Lock()
+
+def get_async_layer() -> AsyncDataLayer:
+    global _async_layer
+    with _async_layer_lock:
+        if _async_layer is None:
+            _async_layer = AsyncDataLayer()
+        return _async_layer
+
+def run_sync(coro: Awaitable, timeout: Optional[float] = None) -> Any:
+    return get_async_layer().run_sync(coro, timeout)
+
+def fetch_stock_data_many(symbols: List[str], period: str) -> Tuple[Dict[str, pd.DataFrame], Dict[str, str]]:
+    """
+    get_stock_data for many symbols at once; returns (data, errors)
+    """
+    layer = get_async_layer()
+    with span('async.stock_data', symbols=len(symbols)):
+        return layer.run_sync(layer.gather(layer.get_stock_data, symbols, period))
+
+def fetch_stock_data_range_many(symbols: List[str], start_date, end_date) -> Tuple[Dict[str, pd.DataFrame], Dict[str, str]]:
+    """
+    get_stock_data_range for many symbols at once; returns (data, errors)
+    """
+    layer = get_async_layer()
+    with span('async.stock_data_range', symbols=len(symbols)):
+        return layer.run_sync(layer.get_historical_data(symbols, start_date, end_date))
+
+def fetch_company_info_many(symbols: List[str]) -> Tuple[Dict[str, dict], Dict[str, str]]:
+    """
+    get_company_info for many symbols at once; returns (info, errors)
+    """
+    layer = get_async_layer()
+    with span('async.company_info', symbols=len(symbols)):
+        return layer.run_sync(layer.gather(layer.get_company_info, symbols))
@@ -0,0 +1,256 @@
+import itertools
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, List, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+from .analysis import RiskAnalyzer
+from .panel import PricePanel
+from .tracing import span, traced
+
+DEFAULT_COST_BPS = 10.0
+SWEEP_WORKERS = min(8, os.cpu_count() or 1)
+
+# Rebalance schedules accepted by run(); an int rebalances every N bars
+REBALANCE_FREQUENCIES = {'D': None, 'W': 'W', 'M': 'M', 'Q': 'Q', 'Y': 'Y'}
+
+class BacktestResult:
+    """
+    Output of one backtest run: daily equity curve, net returns and the
+    trading activity at each rebalance
+    """
+    def __init__(self, equity: pd.Series, weights: pd.DataFrame, turnover: pd.Series, costs: pd.Series):
+        self.equity = equity
+        self.returns = equity.pct_change(fill_method=None)
+        self.weights = weights
+        self.turnover = turnover
+        self.costs = costs
+
+    def metrics(self) -> Dict:
+        """
+        RiskAnalyzer metrics of the equity curve plus return and trading stats
+        """
+        equity = self.equity.dropna()
+        metrics = RiskAnalyzer().calculate_risk_metrics_frame(equity.to_frame('equity')).iloc[0].to_dict()
+        years = len(equity) / 252
+        total_return = equity.iloc[-1] / equity.iloc[0] - 1 if len(equity) else np.nan
+        metrics.update({
+            'total_return': total_return,
+            'cagr': (1 + total_return) ** (1 / years) - 1 if years > 0 else np.nan,
+            'annual_turnover': self.turnover.sum() / years if years > 0 else np.nan,
+            'total_costs': self.costs.sum(),
+            'rebalances': len(self.turnover),
+        })
+        return metrics
+
+class Backtester:
+    """
+    Vectorized portfolio simulator over an aligned price matrix.
+
+    Target weights are executed at the close of each rebalance date and then
+    drift with prices until the next one; any weight not allocated is held
+    as cash. Transaction costs are cost_bps per unit of traded weight.
+
+    Within a holding period every asset's value is its weight times its
+    price relative to the rebalance close, so the equity curve is a few
+    whole-matrix operations and a cumulative product over rebalances.
+    """
+    def __init__(self, prices: Union[PricePanel, pd.DataFrame], cost_bps: float = DEFAULT_COST_BPS,
+                 initial_capital: float = 1.0):
+        if isinstance(prices, PricePanel):
+            self.dates = prices.dates
+            self.symbols = prices.symbols
+            self.prices = prices.values
+        else:
+            self.dates = pd.DatetimeIndex(prices.index)
+            self.symbols = list(prices.columns)
+            self.prices = np.ascontiguousarray(prices.ffill().to_numpy(dtype=np.float64))
+        self.cost_bps = cost_bps
+        self.initial_capital = initial_capital
+
+    def price_frame(self) -> pd.DataFrame:
+        return pd.DataFrame(self.prices, index=self.dates, columns=self.symbols, copy=False)
+
+    def _target_matrix(self, weights) -> np.ndarray:
+        if isinstance(weights, pd.DataFrame):
+            matrix = weights.reindex(columns=self.symbols).reindex(self.dates, method='ffill').to_numpy(dtype=np.float64)
+        else:
+            row = pd.Series(weights, dtype=np.float64).reindex(self.symbols).to_numpy()
+            matrix = np.broadcast_to(row, self.prices.shape)
+        # Nothing can be bought before an asset has a price
+        return np.where(np.isnan(self.prices) | np.isnan(matrix), 0.0, matrix)
+
+    def _rebalance_mask(self, rebalance: Union[str, int], targets: np.ndarray) -> np.ndarray:
+        tradable = targets.any(axis=1)
+        if isinstance(rebalance, int):
+            mask = np.arange(len(self.dates)) % rebalance == 0
+        elif rebalance == 'on_change':
+            mask = np.ones(len(self.dates), dtype=bool)
+            mask[1:] = (targets[1:] != targets[:-1]).any(axis=1)
+        elif rebalance in REBALANCE_FREQUENCIES:
+            freq = REBALANCE_FREQUENCIES[rebalance]
+            if freq is None:
+                mask = np.ones(len(self.dates), dtype=bool)
+            else:
+                # Last trading day of each calendar period
+                periods = self.dates.to_period(freq).asi8
+                mask = np.append(periods[1:] != periods[:-1], True)
+        else:
+            raise ValueError(f"Unknown rebalance schedule: {rebalance}")
+
+        # Always trade into the first investable date
+        if tradable.any():
+            first = int(np.argmax(tradable))
+            mask[:first] = False
+            mask[first] = True
+        else:
+            mask[:] = False
+        return mask
+
+    @traced()
+    def run(self, weights, rebalance: Union[str, int] = 'M') -> BacktestResult:
+        """
+        Simulate a portfolio.
+
+        weights: dict/Series of static target weights, or a dates x symbols
+        frame of targets (e.g. from signals_to_weights). rebalance: 'D', 'W',
+        'M', 'Q', 'Y', every N bars as an int, or 'on_change' to trade only
+        when the targets change.
+        """
+        prices = self.prices
+        with span('backtest.targets'):
+            targets = self._target_matrix(weights)
+            rebalance_at = self._rebalance_mask(rebalance, targets)
+            rebalance_idx = np.flatnonzero(rebalance_at)
+
+        if len(rebalance_idx) == 0:
+            equity = pd.Series(self.initial_capital, index=self.dates, name='equity')
+            empty = pd.Series(dtype=np.float64)
+            return BacktestResult(equity, pd.DataFrame(columns=self.symbols), empty, empty)
+
+        with span('backtest.simulate', bars=len(self.dates), assets=len(self.symbols),
+                  rebalances=len(rebalance_idx)):
+            held = np.ascontiguousarray(targets[rebalance_idx])
+            entry = prices[rebalance_idx]
+            cash = 1.0 - held.sum(axis=1)
+            segment = np.cumsum(rebalance_at) - 1
+            invested = segment >= 0
+            seg = segment[invested]
+
+            with np.errstate(invalid='ignore', divide='ignore'):
+                # Growth of each holding since its rebalance close
+                value = held[seg] * (prices[invested] / entry[seg])
+                value = np.where(held[seg] == 0.0, 0.0, value)
+                growth = cash[seg] + value.sum(axis=1)
+
+                # Drifted weights just before each rebalance after the first
+                before = held[:-1] * (entry[1:] / entry[:-1])
+                before = np.where(held[:-1] == 0.0, 0.0, before)
+                before_growth = cash[:-1] + before.sum(axis=1)
+                drifted = before / before_growth[:, None]
+
+            turnover = np.empty(len(rebalance_idx))
+            turnover[0] = np.abs(held[0]).sum()
+            turnover[1:] = np.abs(held[1:] - drifted).sum(axis=1)
+            cost_rate = turnover * self.cost_bps / 10_000
+
+            period_growth = np.ones(len(rebalance_idx))
+            period_growth[1:] = before_growth
+            capital = self.initial_capital * np.cumprod(period_growth * (1 - cost_rate))
+
+            equity = np.full(len(self.dates), self.initial_capital, dtype=np.float64)
+            equity[invested] = capital[seg] * growth
+
+        rebalance_dates = self.dates[rebalance_idx]
+        capital_before = np.empty(len(rebalance_idx))
+        capital_before[0] = self.initial_capital
+        capital_before[1:] = capital[:-1] * before_growth
+        return BacktestResult(
+            pd.Series(equity, index=self.dates, name='equity'),
+            pd.DataFrame(held, index=rebalance_dates, columns=self.symbols),
+            pd.Series(turnover, index=rebalance_dates, name='turnover'),
+            pd.Series(capital_before * cost_rate, index=rebalance_dates, name='costs'),
+        )
+
+def signals_to_weights(signals: pd.DataFrame, long_only: bool = True, lag: int = 1) -> pd.DataFrame:
+    """
+    Turn a dates x symbols signal frame (positive = long, negative = short)
+    into equal weights with gross exposure 1. Signals are lagged by `lag` bars
+    so a signal computed on a close is traded on a later close.
+    """
+    signals = signals.shift(lag) if lag else signals
+    if long_only:
+        signals = signals.clip(lower=0)
+    direction = np.sign(signals.fillna(0.0))
+    gross = direction.abs().sum(axis=1).replace(0, np.nan)
+    return direction.div(gross, axis=0).fillna(0.0)
+
+# Strategies take the filled close frame plus parameters and return target
+# weights; they are module-level so sweeps can pickle them
+
+def equal_weight(prices: pd.DataFrame) -> pd.DataFrame:
+    listed = prices.notna().astype(np.float64)
+    return listed.div(listed.sum(axis=1).replace(0, np.nan), axis=0).fillna(0.0)
+
+def momentum(prices: pd.DataFrame, lookback: int = 126, top_n: int = 10) -> pd.DataFrame:
+    """
+    Hold the top_n assets by trailing lookback-bar return
+    """
+    trailing = prices / prices.shift(lookback) - 1
+    rank = trailing.rank(axis=1, ascending=False, method='first')
+    return signals_to_weights((rank <= top_n).astype(np.float64).where(trailing.notna()))
+
+def moving_average_crossover(prices: pd.DataFrame, fast: int = 50, slow: int = 200) -> pd.DataFrame:
+    """
+    Long every asset whose fast moving average is above its slow one
+    """
+    fast_ma = prices.rolling(fast, min_periods=fast).mean()
+    slow_ma = prices.rolling(slow, min_periods=slow).mean()
+    return signals_to_weights((fast_ma > slow_ma).astype(np.float64).where(slow_ma.notna()))
+
+STRATEGIES = {
+    'equal_weight': equal_weight,
+    'momentum': momentum,
+    'moving_average_crossover': moving_average_crossover,
+}
+
+# Per-worker state for sweeps so the price matrix is sent once per process
+_sweep_backtester: Optional[Backtester] = None
+
+def _init_sweep_worker(values, dates, symbols, cost_bps):
+    global _sweep_backtester
+    _sweep_backtester = Backtester(pd.DataFrame(values, index=dates, columns=symbols), cost_bps=cost_bps)
+
+def _run_variant(strategy: Callable, params: Dict, rebalance) -> Dict:
+    backtester = _sweep_backtester
+    weights = strategy(backtester.price_frame(), **params)
+    return backtester.run(weights, rebalance=rebalance).metrics()
+
+@traced()
+def parameter_sweep(prices: Union[PricePanel, pd.DataFrame], strategy: Union[str, Callable],
+                    grid: Dict[str, List], rebalance: Union[str, int] = 'M',
+                    cost_bps: float = DEFAULT_COST_BPS, max_workers: int = SWEEP_WORKERS,
+                    sort_by: str = 'sharpe_ratio') -> pd.DataFrame:
+    """
+    Backtest every combination in grid (parameter name -> values) across a
+    process pool; returns one row of metrics per variant, best first
+    """
+    strategy = STRATEGIES[strategy] if isinstance(strategy, str) else strategy
+    backtester = Backtester(prices, cost_bps=cost_bps)
+    names = list(grid)
+    variants = [dict(zip(names, values)) for values in itertools.product(*(grid[name] for name in names))]
+    initargs = (backtester.prices, backtester.dates, backtester.symbols, cost_bps)
+
+    if max_workers <= 1 or len(variants) <= 1:
+        _init_sweep_worker(*initargs)
+        results = [_run_variant(strategy, params, rebalance) for params in variants]
+    else:
+        with ProcessPoolExecutor(max_workers=min(max_workers, len(variants)),
+                                 initializer=_init_sweep_worker, initargs=initargs) as pool:
+            futures = [pool.submit(_run_variant, strategy, params, rebalance) for params in variants]
+            results = [future.result() for future in futures]
+
+    table = pd.DataFrame([{**params, **metrics} for params, metrics in zip(variants, results)])
+    return table.sort_values(sort_by, ascending=False, na_position='last').reset_index(drop=True)
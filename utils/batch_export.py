@@ -0,0 +1,199 @@
+import argparse
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Dict, List, Optional
+
+import pandas as pd
+import xlsxwriter
+
+from .data_export import _write_frame
+from .stock_data import get_stock_data_range
+
+EXPORT_FORMATS = ('parquet', 'feather', 'csv', 'excel')
+
+class BatchExportJob:
+    """
+    Export date-range histories for many symbols into one artifact.
+
+    Each fetched symbol is checkpointed under work_dir, so a job that fails
+    part-way can be re-run and only fetches what is missing. Formats:
+    parquet/feather (one long table with a Symbol column), csv (one
+    symbol=XXX partition per symbol) or excel (one sheet per symbol).
+    """
+    def __init__(self, symbols: List[str], start_date, end_date, output_path: str,
+                 fmt: str = 'parquet', max_workers: int = 8,
+                 progress_callback: Optional[Callable[[int, int, str, str], None]] = None,
+                 work_dir: Optional[str] = None):
+        if fmt not in EXPORT_FORMATS:
+            raise ValueError(f"Unsupported export format: {fmt}")
+        self.symbols = list(dict.fromkeys(s.strip().upper() for s in symbols if s.strip()))
+        self.start_date = start_date
+        self.end_date = end_date
+        self.output_path = output_path
+        self.fmt = fmt
+        self.max_workers = max_workers
+        self.progress_callback = progress_callback
+        self.work_dir = work_dir or f'{output_path}.parts'
+        self.manifest_path = os.path.join(self.work_dir, 'manifest.json')
+
+        self.completed = 0
+        self.failed: Dict[str, str] = {}
+        self.summary: Optional[dict] = None
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def _part_path(self, symbol: str) -> str:
+        return os.path.join(self.work_dir, f'{symbol}.pkl')
+
+    def _load_manifest(self) -> dict:
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path) as f:
+                return json.load(f)
+        return {'start_date': str(self.start_date), 'end_date': str(self.end_date), 'symbols': {}}
+
+    def _save_manifest(self, manifest: dict):
+        tmp_path = self.manifest_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(tmp_path, self.manifest_path)
+
+    def _fetch(self, symbol: str) -> int:
+        df = get_stock_data_range(symbol, self.start_date, self.end_date)
+        if df.empty:
+            raise Exception('no data returned')
+        tmp_path = self._part_path(symbol) + '.tmp'
+        df.to_pickle(tmp_path)
+        os.replace(tmp_path, self._part_path(symbol))
+        return len(df)
+
+    def _report(self, symbol: str, status: str):
+        if self.progress_callback:
+            self.progress_callback(self.completed + len(self.failed), len(self.symbols), symbol, status)
+
+    def run(self) -> dict:
+        """
+        Fetch missing symbols, then assemble the output; returns a summary
+        """
+        os.makedirs(self.work_dir, exist_ok=True)
+        manifest = self._load_manifest()
+        if manifest.get('start_date') != str(self.start_date) or manifest.get('end_date') != str(self.end_date):
+            # Checkpoints from a different date range can't be reused
+            manifest = {'start_date': str(self.start_date), 'end_date': str(self.end_date), 'symbols': {}}
+
+        pending = [s for s in self.symbols
+                   if manifest['symbols'].get(s, {}).get('status') != 'done' or not os.path.exists(self._part_path(s))]
+        self.completed = len(self.symbols) - len(pending)
+        self.failed = {}
+
+        started = time.perf_counter()
+        if pending:
+            with ThreadPoolExecutor(max_workers=min(self.max_workers, len(pending))) as pool:
+                futures = {pool.submit(self._fetch, symbol): symbol for symbol in pending}
+                for future in as_completed(futures):
+                    symbol = futures[future]
+                    try:
+                        rows = future.result()
+                        entry = {'status': 'done', 'rows': rows}
+                    except Exception as e:
+                        entry = {'status': 'failed', 'error': str(e)}
+                    with self._lock:
+                        manifest['symbols'][symbol] = entry
+                        if entry['status'] == 'done':
+                            self.completed += 1
+                        else:
+                            self.failed[symbol] = entry['error']
+                        self._save_manifest(manifest)
+                    self._report(symbol, entry['status'])
+        fetch_elapsed = time.perf_counter() - started
+
+        done = [s for s in self.symbols if manifest['symbols'].get(s, {}).get('status') == 'done']
+        if done:
+            self._write_output(done)
+
+        elapsed = time.perf_counter() - started
+        self.summary = {
+            'output_path': self.output_path,
+            'format': self.fmt,
+            'symbols': len(self.symbols),
+            'exported': len(done),
+            'fetched_this_run': len(pending) - len(self.failed),
+            'failed': dict(self.failed),
+            'elapsed_s': elapsed,
+            'symbols_per_minute': (len(pending) - len(self.failed)) / fetch_elapsed * 60 if fetch_elapsed > 0 else 0.0,
+            'complete': not self.failed,
+        }
+        return self.summary
+
+    def _frames(self, symbols: List[str]):
+        for symbol in symbols:
+            yield symbol, pd.read_pickle(self._part_path(symbol))
+
+    def _long_table(self, symbols: List[str]) -> pd.DataFrame:
+        frames = []
+        for symbol, df in self._frames(symbols):
+            df = df.reset_index().rename(columns={df.index.name or 'index': 'Date'})
+            df.insert(0, 'Symbol', symbol)
+            frames.append(df)
+        table = pd.concat(frames, ignore_index=True)
+        table['Date'] = pd.to_datetime(table['Date'], utc=True)
+        return table
+
+    def _write_output(self, symbols: List[str]):
+        tmp_path = self.output_path + '.tmp'
+        if self.fmt == 'parquet':
+            self._long_table(symbols).to_parquet(tmp_path, index=False)
+        elif self.fmt == 'feather':
+            self._long_table(symbols).to_feather(tmp_path)
+        elif self.fmt == 'excel':
+            workbook = xlsxwriter.Workbook(tmp_path, {'constant_memory': True})
+            date_format = workbook.add_format({'num_format': 'yyyy-mm-dd hh:mm:ss'})
+            for symbol, df in self._frames(symbols):
+                _write_frame(workbook.add_worksheet(symbol[:31]), df, date_format)
+            workbook.close()
+        else:
+            # Partitioned CSV: one directory per symbol, written one frame at a time
+            os.makedirs(self.output_path, exist_ok=True)
+            for symbol, df in self._frames(symbols):
+                partition = os.path.join(self.output_path, f'symbol={symbol}')
+                os.makedirs(partition, exist_ok=True)
+                df.to_csv(os.path.join(partition, 'part-0.csv'))
+            return
+        os.replace(tmp_path, self.output_path)
+
+    def start(self) -> 'BatchExportJob':
+        """
+        Run the job on a background thread
+        """
+        self._thread = threading.Thread(target=self.run, name='batch-export', daemon=True)
+        self._thread.start()
+        return self
+
+    def wait(self, timeout: Optional[float] = None) -> Optional[dict]:
+        if self._thread is not None:
+            self._thread.join(timeout)
+        return self.summary
+
+    @property
+    def progress(self) -> float:
+        return (self.completed + len(self.failed)) / len(self.symbols) if self.symbols else 1.0
+
+def main():
+    parser = argparse.ArgumentParser(description='Export many symbols to one file')
+    parser.add_argument('symbols', nargs='+')
+    parser.add_argument('--start', required=True)
+    parser.add_argument('--end', required=True)
+    parser.add_argument('--output', required=True)
+    parser.add_argument('--format', default='parquet', choices=EXPORT_FORMATS)
+    parser.add_argument('--workers', type=int, default=8)
+    args = parser.parse_args()
+
+    job = BatchExportJob(args.symbols, args.start, args.end, args.output, args.format, args.workers,
+                         progress_callback=lambda done, total, symbol, status: print(f'[{done}/{total}] {symbol}: {status}'))
+    summary = job.run()
+    print(json.dumps(summary, indent=2))
+
+if __name__ == '__main__':
+    main()
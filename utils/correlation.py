@@ -0,0 +1,179 @@
+import threading
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from .panel import PricePanel, trading_dates
+from .stock_data import get_data_version
+from .tracing import span, traced
+
+class CorrelationService:
+    """
+    Aligned daily returns panel for tracked symbols with running co-moment
+    sums, giving pairwise-complete correlation/covariance matrices.
+
+    The sums (joint counts, sums, sums of squares and cross products) are
+    additive over rows, so an update only subtracts the old and adds the new
+    contribution of the rows that changed, in blocks of block_size rows.
+    Full matrices are finalised lazily once per update and any symbol
+    subset is then a k x k lookup. All methods may be called from several
+    threads (e.g. concurrent Streamlit sessions sharing one service).
+    """
+    def __init__(self, block_size: int = 256, min_periods: int = 20):
+        self.block_size = block_size
+        self.min_periods = min_periods
+        self.returns = pd.DataFrame(dtype=np.float64)
+        self._versions: Dict[str, str] = {}
+        self._index: Dict[str, int] = {}
+        self._n = np.zeros((0, 0))
+        self._sx = np.zeros((0, 0))
+        self._sxx = np.zeros((0, 0))
+        self._sxy = np.zeros((0, 0))
+        self._corr = None
+        self._cov = None
+        self._lock = threading.RLock()
+
+    @property
+    def symbols(self) -> List[str]:
+        return list(self.returns.columns)
+
+    def _accumulate(self, block: np.ndarray, sign: float):
+        mask = ~np.isnan(block)
+        x = np.where(mask, block, 0.0)
+        m = mask.astype(np.float64)
+        self._n += sign * (m.T @ m)
+        self._sx += sign * (x.T @ m)
+        self._sxx += sign * ((x * x).T @ m)
+        self._sxy += sign * (x.T @ x)
+
+    def _accumulate_rows(self, values: np.ndarray, sign: float):
+        for start in range(0, len(values), self.block_size):
+            self._accumulate(values[start:start + self.block_size], sign)
+
+    def _rebuild(self):
+        size = self.returns.shape[1]
+        self._n, self._sx, self._sxx, self._sxy = (np.zeros((size, size)) for _ in range(4))
+        self._accumulate_rows(self.returns.to_numpy(dtype=np.float64), 1.0)
+
+    @traced()
+    def update(self, prices) -> int:
+        """
+        Track new symbols / bars from a PricePanel, or a dict mapping symbol
+        to an OHLCV frame or close series. Returns the number of return rows
+        that changed.
+        """
+        with self._lock:
+            return self._update(prices)
+
+    def _update(self, prices) -> int:
+        changed = {}
+        if isinstance(prices, PricePanel):
+            versions = prices.versions()
+            returns = prices.returns()
+            for symbol in prices.symbols:
+                if self._versions.get(symbol) != versions[symbol]:
+                    changed[symbol] = (returns[symbol].dropna(), versions[symbol])
+        else:
+            for symbol, data in prices.items():
+                version = get_data_version(data if isinstance(data, pd.DataFrame) else data.to_frame())
+                if self._versions.get(symbol) != version:
+                    close = data['Close'] if isinstance(data, pd.DataFrame) else data
+                    series = close.pct_change(fill_method=None).iloc[1:]
+                    series.index = trading_dates(series.index)
+                    changed[symbol] = (series[~series.index.duplicated(keep='last')], version)
+        if not changed:
+            return 0
+
+        with span('correlation.align', symbols=len(changed)):
+            index = self.returns.index
+            for series, _ in changed.values():
+                index = index.union(series.index)
+            columns = self.symbols + [s for s in changed if s not in self._index]
+            old = self.returns.reindex(index=index, columns=columns)
+            new = old.copy()
+            for symbol, (series, _) in changed.items():
+                new[symbol] = series.reindex(index)
+
+            old_values = old.to_numpy(dtype=np.float64)
+            new_values = new.to_numpy(dtype=np.float64)
+            differs = ~((old_values == new_values) | (np.isnan(old_values) & np.isnan(new_values)))
+            rows = np.flatnonzero(differs.any(axis=1))
+
+        with span('correlation.accumulate', rows=len(rows)):
+            added = len(columns) - len(self._index)
+            if added:
+                # New symbols start with zero sums; their rows are in `rows`
+                self._n, self._sx, self._sxx, self._sxy = (np.pad(m, ((0, added), (0, added)))
+                                                           for m in (self._n, self._sx, self._sxx, self._sxy))
+            self.returns = new
+            self._index = {symbol: i for i, symbol in enumerate(columns)}
+            if len(rows) * 2 > len(index):
+                self._rebuild()
+            else:
+                self._accumulate_rows(old_values[rows], -1.0)
+                self._accumulate_rows(new_values[rows], 1.0)
+
+        for symbol, (_, version) in changed.items():
+            self._versions[symbol] = version
+        self._corr = self._cov = None
+        return len(rows)
+
+    def remove(self, symbols: List[str]):
+        with self._lock:
+            self._remove(symbols)
+
+    def _remove(self, symbols: List[str]):
+        keep = [s for s in self.symbols if s not in set(symbols)]
+        self.returns = self.returns[keep].dropna(how='all')
+        for symbol in symbols:
+            self._versions.pop(symbol, None)
+        self._index = {symbol: i for i, symbol in enumerate(keep)}
+        self._rebuild()
+        self._corr = self._cov = None
+
+    def _finalize(self):
+        if self._corr is not None:
+            return
+        with span('correlation.finalize', symbols=len(self._index)):
+            with np.errstate(invalid='ignore', divide='ignore'):
+                n = self._n
+                cov = (self._sxy - self._sx * self._sx.T / n) / (n - 1)
+                # Variance of i over the rows shared with j, as pandas' pairwise corr does
+                var = (self._sxx - self._sx ** 2 / n) / (n - 1)
+                corr = cov / np.sqrt(var * var.T)
+            insufficient = n < max(self.min_periods, 2)
+            cov[insufficient] = np.nan
+            corr[insufficient] = np.nan
+            np.fill_diagonal(corr, np.where(np.diag(insufficient), np.nan, 1.0))
+            self._cov = cov
+            self._corr = np.clip(corr, -1.0, 1.0)
+
+    def _lookup(self, matrix: np.ndarray, symbols: Optional[List[str]]) -> pd.DataFrame:
+        symbols = self.symbols if symbols is None else list(symbols)
+        idx = [self._index[s] for s in symbols]
+        return pd.DataFrame(matrix[np.ix_(idx, idx)], index=symbols, columns=symbols)
+
+    def correlation(self, symbols: Optional[List[str]] = None) -> pd.DataFrame:
+        """
+        Correlation sub-matrix for any subset of tracked symbols
+        """
+        with self._lock:
+            self._finalize()
+            return self._lookup(self._corr, symbols)
+
+    def covariance(self, symbols: Optional[List[str]] = None, annualize: bool = False) -> pd.DataFrame:
+        """
+        Covariance sub-matrix of daily returns (x252 when annualize=True)
+        """
+        with self._lock:
+            self._finalize()
+            cov = self._lookup(self._cov, symbols)
+        return cov * 252 if annualize else cov
+
+    def observations(self, symbols: Optional[List[str]] = None) -> pd.DataFrame:
+        """
+        Number of jointly observed returns behind each pair
+        """
+        with self._lock:
+            return self._lookup(self._n, symbols).astype(np.int64)
@@ -1,84 +1,185 @@
 import pandas as pd
 import plotly.io as pio
+import hashlib
 import io
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-import yfinance as yf
-from openpyxl import Workbook
-from openpyxl.drawing.image import Image
-import base64
+from typing import List, Tuple
+import xlsxwriter
+from .async_data import get_async_layer, run_sync
+from .shared_cache import get_shared_cache
+from .tracing import traced, span
 
-def export_to_excel(symbol: str, df: pd.DataFrame, info: dict, figures: list) -> io.BytesIO:
+# Exports larger than this spill from memory to a temporary file
+EXPORT_SPOOL_SIZE = 8 * 1024 * 1024
+EXPORT_ROW_BATCH = 5000
+CHART_RENDER_WORKERS = 4
+CHART_IMAGE_CACHE_TTL = 24 * 3600.0
+
+METRIC_FIELDS = [
+    ('Market Cap', 'marketCap'), ('Enterprise Value', 'enterpriseValue'),
+    ('P/E Ratio', 'trailingPE'), ('Forward P/E', 'forwardPE'),
+    ('PEG Ratio', 'pegRatio'), ('Price/Book', 'priceToBook'),
+    ('EV/EBITDA', 'enterpriseToEbitda'), ('EV/Revenue', 'enterpriseToRevenue'),
+    ('Profit Margin', 'profitMargins'), ('Operating Margin', 'operatingMargins'),
+    ('ROE', 'returnOnEquity'), ('ROA', 'returnOnAssets')
+]
+
+_renderer_lock = threading.Lock()
+_renderer_started = False
+
+def _ensure_renderer(workers: int):
     """
-    Export stock data, metrics, and charts to Excel
+    Start Kaleido once per process so every export reuses a warm renderer
     """
-    output = io.BytesIO()
-    
-    # Create Excel writer
-    writer = pd.ExcelWriter(output, engine='openpyxl')
-    
-    # Write price data
-    df.to_excel(writer, sheet_name='Historical Data', index=True)
-    
-    # Write company metrics
-    metrics_df = pd.DataFrame({
-        'Metric': [
-            'Market Cap', 'Enterprise Value', 'P/E Ratio', 'Forward P/E',
-            'PEG Ratio', 'Price/Book', 'EV/EBITDA', 'EV/Revenue',
-            'Profit Margin', 'Operating Margin', 'ROE', 'ROA'
-        ],
-        'Value': [
-            info.get('marketCap'), info.get('enterpriseValue'),
-            info.get('trailingPE'), info.get('forwardPE'),
-            info.get('pegRatio'), info.get('priceToBook'),
-            info.get('enterpriseToEbitda'), info.get('enterpriseToRevenue'),
-            info.get('profitMargins'), info.get('operatingMargins'),
-            info.get('returnOnEquity'), info.get('returnOnAssets')
-        ]
-    })
-    metrics_df.to_excel(writer, sheet_name='Metrics', index=False)
+    global _renderer_started
+    with _renderer_lock:
+        if _renderer_started:
+            return
+        try:
+            import kaleido
+            # Kaleido >= 1.0 renders through a browser; keep one server alive for all exports
+            if hasattr(kaleido, 'start_sync_server'):
+                kaleido.start_sync_server(n=workers, silence_warnings=True)
+        except ImportError:
+            pass
+        _renderer_started = True
+
+def render_chart_images(figures: list, workers: int = CHART_RENDER_WORKERS) -> List[bytes]:
+    """
+    Render figures to PNG concurrently through the shared renderer, reusing
+    images already in the shared cache
+    """
+    if not figures:
+        return []
+    _ensure_renderer(workers)
+    cache = get_shared_cache()
+
+    def _render(fig):
+        # Identical figures are rendered once across all worker processes
+        key = hashlib.sha1(fig.to_json().encode()).hexdigest()
+        return cache.get_or_compute('chart_png', key, lambda: pio.to_image(fig, format='png'),
+                                    ttl=CHART_IMAGE_CACHE_TTL)
+
+    with ThreadPoolExecutor(max_workers=min(workers, len(figures))) as pool:
+        return list(pool.map(_render, figures))
+
+def _write_frame(worksheet, df: pd.DataFrame, date_format):
+    """
+    Write a frame row by row in batches, so only one batch is ever converted
+    """
+    worksheet.write_row(0, 0, [df.index.name or 'Date'] + [str(c) for c in df.columns])
+    index = df.index
+    if isinstance(index, pd.DatetimeIndex) and index.tz is not None:
+        index = index.tz_localize(None)
+
+    row = 1
+    for start in range(0, len(df), EXPORT_ROW_BATCH):
+        batch = df.iloc[start:start + EXPORT_ROW_BATCH]
+        values = batch.to_numpy(dtype=object)
+        values[pd.isna(values)] = None
+        for idx, record in zip(index[start:start + EXPORT_ROW_BATCH], values):
+            if isinstance(idx, (pd.Timestamp, datetime)):
+                worksheet.write_datetime(row, 0, idx.to_pydatetime() if isinstance(idx, pd.Timestamp) else idx, date_format)
+            else:
+                worksheet.write(row, 0, idx)
+            worksheet.write_row(row, 1, record)
+            row += 1
+
+@traced()
+def export_to_excel(symbol: str, df: pd.DataFrame, info: dict, figures: list) -> io.IOBase:
+    """
+    Export stock data, metrics, and charts to Excel.
+
+    Sheets are written in xlsxwriter's constant-memory mode while the chart
+    images render in parallel; the returned file object spills to disk for
+    large exports and is positioned at the start.
+    """
+    output = tempfile.SpooledTemporaryFile(max_size=EXPORT_SPOOL_SIZE)
     
-    # Save and convert charts to images
-    for i, fig in enumerate(figures):
-        img_bytes = fig.to_image(format="png")
-        writer.sheets[f'Chart_{i+1}'] = writer.book.create_sheet(f'Chart_{i+1}')
-        img = Image(io.BytesIO(img_bytes))
-        writer.sheets[f'Chart_{i+1}'].add_image(img, 'A1')
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        # Start rendering charts while the data sheets are written
+        images = pool.submit(render_chart_images, figures)
+        
+        workbook = xlsxwriter.Workbook(output, {'constant_memory': True})
+        date_format = workbook.add_format({'num_format': 'yyyy-mm-dd hh:mm:ss'})
+        
+        # Write price data
+        with span('export.historical_data', rows=len(df)):
+            _write_frame(workbook.add_worksheet('Historical Data'), df, date_format)
+        
+        # Write company metrics
+        metrics_sheet = workbook.add_worksheet('Metrics')
+        metrics_sheet.write_row(0, 0, ['Metric', 'Value'])
+        for row, (label, key) in enumerate(METRIC_FIELDS, start=1):
+            metrics_sheet.write_row(row, 0, [label, info.get(key)])
+        
+        # Insert rendered charts
+        with span('export.charts', count=len(figures)):
+            for i, img_bytes in enumerate(images.result()):
+                workbook.add_worksheet(f'Chart_{i+1}').insert_image(
+                    'A1', f'chart_{i+1}.png', {'image_data': io.BytesIO(img_bytes)}
+                )
+        
+        workbook.close()
     
-    writer.close()
     output.seek(0)
     return output
 
+def cached_export_to_excel(symbol: str, df: pd.DataFrame, info: dict, figures: list, cache=None) -> bytes:
+    """
+    export_to_excel served from the on-disk export cache when the data
+    version, figures and exported metrics are unchanged; returns the
+    workbook bytes
+    """
+    from .export_cache import get_export_cache
+    cache = cache or get_export_cache()
+    key = cache.key(symbol, df, figures, extra={field: info.get(field) for _, field in METRIC_FIELDS})
+    path = cache.get(key)
+    if path is not None:
+        try:
+            with open(path, 'rb') as f:
+                return f.read()
+        except FileNotFoundError:
+            # Evicted by another export between get() and open()
+            pass
+    output = export_to_excel(symbol, df, info, figures)
+    try:
+        cache.put(key, output)
+        return output.read()
+    finally:
+        output.close()
+
+def fetch_histories(symbols: list, start_date, end_date, max_workers: int = 8) -> Tuple[dict, dict]:
+    """
+    Fetch date-range histories for many symbols concurrently through the
+    price cache, at most max_workers at a time; returns (data, errors)
+    keyed by symbol
+    """
+    if not symbols:
+        return {}, {}
+    layer = get_async_layer()
+    return layer.run_sync(layer.get_historical_data(symbols, start_date, end_date, limit=max_workers))
+
+@traced()
 def get_historical_data(symbols: list, start_date: str, end_date: str) -> dict:
     """
     Fetch historical data for multiple symbols within a date range
     """
-    data = {}
-    for symbol in symbols:
-        try:
-            stock = yf.Ticker(symbol)
-            df = stock.history(start=start_date, end=end_date)
-            data[symbol] = df
-        except Exception as e:
-            print(f"Error fetching data for {symbol}: {str(e)}")
-            continue
+    data, errors = fetch_histories(symbols, start_date, end_date)
+    for symbol, error in errors.items():
+        print(f"Error fetching data for {symbol}: {error}")
     return data
 
+@traced()
 def get_peer_comparison(symbol: str) -> tuple:
     """
     Get peer comparison data
     """
     try:
-        stock = yf.Ticker(symbol)
-        info = stock.info
-        peers = info.get('recommendationKey', [])
-        
-        # Get data for peers
-        peer_data = {}
-        for peer in peers:
-            peer_stock = yf.Ticker(peer)
-            peer_data[peer] = peer_stock.info
-            
-        return peers, peer_data
+        return run_sync(get_async_layer().get_peer_comparison(symbol))
     except Exception as e:
         print(f"Error fetching peer data: {str(e)}")
         return [], {}
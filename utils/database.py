@@ -1,10 +1,11 @@
-from sqlalchemy import create_engine, Column, Integer, String, Float, DateTime, ForeignKey
+from sqlalchemy import create_engine, Column, Integer, String, Float, DateTime, ForeignKey, UniqueConstraint, Index, LargeBinary
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, relationship
 from datetime import datetime
+import os
 
-# Create database engine
-engine = create_engine('sqlite:///stock_analysis.db')
+# Create database engine (STOCKSENTRY_DB_URL lets benchmarks and workers use another database)
+engine = create_engine(os.environ.get('STOCKSENTRY_DB_URL', 'sqlite:///stock_analysis.db'))
 Base = declarative_base()
 Session = sessionmaker(bind=engine)
 
@@ -22,6 +23,23 @@ class StockData(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
 
 class UserPreference(Base):
+    """One row per (symbol, period) with an access counter"""
+    __tablename__ = 'user_preference_counts'
+    __table_args__ = (
+        UniqueConstraint('symbol', 'period', name='uq_user_preference_symbol_period'),
+        Index('ix_user_preference_last_seen', 'last_seen'),
+        Index('ix_user_preference_hit_count', 'hit_count'),
+    )
+    
+    id = Column(Integer, primary_key=True)
+    symbol = Column(String, nullable=False)
+    period = Column(String, nullable=False, default='1mo')
+    hit_count = Column(Integer, nullable=False, default=0)
+    first_seen = Column(DateTime, default=datetime.utcnow)
+    last_seen = Column(DateTime, default=datetime.utcnow)
+
+class LegacyUserPreference(Base):
+    """Append-only preference log kept only until it is rolled up into UserPreference"""
     __tablename__ = 'user_preferences'
     
     id = Column(Integer, primary_key=True)
@@ -29,6 +47,88 @@ class UserPreference(Base):
     period = Column(String, default='1mo')
     created_at = Column(DateTime, default=datetime.utcnow)
 
+class ESGSnapshot(Base):
+    """ESG scores for a symbol as of one day; re-fetches on the same day overwrite the row"""
+    __tablename__ = 'esg_snapshots'
+    __table_args__ = (
+        UniqueConstraint('symbol', 'as_of', name='uq_esg_snapshot_symbol_as_of'),
+        Index('ix_esg_snapshot_industry_as_of', 'industry', 'as_of'),
+        Index('ix_esg_snapshot_fetched_at', 'fetched_at'),
+    )
+    
+    id = Column(Integer, primary_key=True)
+    symbol = Column(String, nullable=False)
+    as_of = Column(DateTime, nullable=False)
+    environmental = Column(Float)
+    social = Column(Float)
+    governance = Column(Float)
+    total = Column(Float)
+    controversy_level = Column(Float)
+    sector = Column(String)
+    industry = Column(String)
+    source = Column(String, nullable=False, default='yahoo')
+    fetched_at = Column(DateTime, default=datetime.utcnow)
+
+class NewsArticle(Base):
+    """A headline seen for a symbol, deduplicated by content hash"""
+    __tablename__ = 'news_articles'
+    __table_args__ = (
+        UniqueConstraint('symbol', 'content_hash', name='uq_news_article_symbol_hash'),
+        Index('ix_news_article_symbol_published', 'symbol', 'published_at'),
+    )
+    
+    id = Column(Integer, primary_key=True)
+    symbol = Column(String, nullable=False)
+    content_hash = Column(String, nullable=False)
+    title = Column(String, nullable=False)
+    summary = Column(String)
+    link = Column(String)
+    published_at = Column(DateTime, nullable=False)
+    polarity = Column(Float)
+    subjectivity = Column(Float)
+    fetched_at = Column(DateTime, default=datetime.utcnow)
+
+class DailySentiment(Base):
+    """Per-symbol, per-day aggregate of NewsArticle sentiment"""
+    __tablename__ = 'daily_sentiment'
+    __table_args__ = (
+        UniqueConstraint('symbol', 'date', name='uq_daily_sentiment_symbol_date'),
+    )
+    
+    id = Column(Integer, primary_key=True)
+    symbol = Column(String, nullable=False)
+    date = Column(DateTime, nullable=False)
+    articles = Column(Integer, nullable=False, default=0)
+    positive = Column(Integer, nullable=False, default=0)
+    negative = Column(Integer, nullable=False, default=0)
+    mean_polarity = Column(Float)
+    mean_subjectivity = Column(Float)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+class NewsFetch(Base):
+    """When each symbol's feed was last fetched, including fetches with no new articles"""
+    __tablename__ = 'news_fetches'
+    
+    symbol = Column(String, primary_key=True)
+    fetched_at = Column(DateTime, nullable=False)
+    articles = Column(Integer, nullable=False, default=0)
+
+class IntradayChunk(Base):
+    """One exchange-local day of intraday bars for a symbol and interval, stored as a compressed array"""
+    __tablename__ = 'intraday_chunks'
+    __table_args__ = (
+        UniqueConstraint('symbol', 'interval', 'day', name='uq_intraday_chunk_symbol_interval_day'),
+    )
+    
+    id = Column(Integer, primary_key=True)
+    symbol = Column(String, nullable=False)
+    interval = Column(String, nullable=False)
+    day = Column(DateTime, nullable=False)
+    bars = Column(Integer, nullable=False)
+    tz = Column(String)
+    payload = Column(LargeBinary, nullable=False)
+    fetched_at = Column(DateTime, default=datetime.utcnow)
+
 def init_db():
     Base.metadata.create_all(engine)
 
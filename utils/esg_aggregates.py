@@ -0,0 +1,170 @@
+import threading
+from bisect import bisect_left, bisect_right, insort
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import func
+
+from .database import get_session, ESGSnapshot
+from .tracing import span, traced
+
+ESG_AGGREGATE_FIELDS = ['environmental', 'social', 'governance', 'total']
+ESG_GROUP_LEVELS = ('sector', 'industry')
+
+class _ScoreGroup:
+    """
+    Sorted scores plus running sums for one sector or industry
+    """
+    def __init__(self):
+        self.scores: Dict[str, List[float]] = {field: [] for field in ESG_AGGREGATE_FIELDS}
+        self.sums: Dict[str, float] = {field: 0.0 for field in ESG_AGGREGATE_FIELDS}
+        self.members = 0
+
+    def add(self, values: Dict[str, Optional[float]], keep_sorted: bool = True):
+        self.members += 1
+        for field in ESG_AGGREGATE_FIELDS:
+            value = values.get(field)
+            if value is not None:
+                if keep_sorted:
+                    insort(self.scores[field], value)
+                else:
+                    self.scores[field].append(value)
+                self.sums[field] += value
+
+    def sort(self):
+        for scores in self.scores.values():
+            scores.sort()
+
+    def remove(self, values: Dict[str, Optional[float]]):
+        self.members -= 1
+        for field in ESG_AGGREGATE_FIELDS:
+            value = values.get(field)
+            if value is not None:
+                scores = self.scores[field]
+                del scores[bisect_left(scores, value)]
+                self.sums[field] -= value
+
+    def average(self, field: str) -> Optional[float]:
+        count = len(self.scores[field])
+        return self.sums[field] / count if count else None
+
+    def percentile(self, field: str, score: float) -> Optional[float]:
+        """
+        Share of the group below score, counting ties as half
+        """
+        scores = self.scores[field]
+        if not scores:
+            return None
+        below = bisect_left(scores, score)
+        ties = bisect_right(scores, score) - below
+        return (below + 0.5 * ties) / len(scores) * 100
+
+class ESGAggregates:
+    """
+    Sector and industry ESG aggregates over the latest Yahoo-sourced
+    snapshot of every symbol.
+
+    Each group keeps its scores sorted, so a percentile rank is a binary
+    search and an average is a running sum over a count. refresh() only
+    reads snapshots fetched since the previous refresh.
+    """
+    def __init__(self):
+        self.groups: Dict[Tuple[str, str], _ScoreGroup] = {}
+        self._latest: Dict[str, dict] = {}
+        self._watermark: Optional[datetime] = None
+        self._lock = threading.Lock()
+
+    def _keys(self, snapshot: dict) -> List[Tuple[str, str]]:
+        return [(level, snapshot[level]) for level in ESG_GROUP_LEVELS if snapshot.get(level)]
+
+    def _apply(self, snapshot: dict, keep_sorted: bool = True):
+        previous = self._latest.get(snapshot['symbol'])
+        if previous is not None:
+            if previous['as_of'] > snapshot['as_of']:
+                return
+            for key in self._keys(previous):
+                self.groups[key].remove(previous)
+        for key in self._keys(snapshot):
+            self.groups.setdefault(key, _ScoreGroup()).add(snapshot, keep_sorted)
+        self._latest[snapshot['symbol']] = snapshot
+
+    @traced()
+    def refresh(self) -> int:
+        """
+        Fold in snapshots stored since the last refresh; returns how many
+        were read
+        """
+        columns = [ESGSnapshot.symbol, ESGSnapshot.as_of, ESGSnapshot.fetched_at,
+                   ESGSnapshot.sector, ESGSnapshot.industry] + \
+                  [getattr(ESGSnapshot, field) for field in ESG_AGGREGATE_FIELDS]
+        with self._lock:
+            session = get_session()
+            try:
+                with span('sqlite.esg_snapshots'):
+                    if self._watermark is None:
+                        # Full build: only the latest snapshot of each symbol matters
+                        latest = session.query(ESGSnapshot.symbol, func.max(ESGSnapshot.as_of).label('as_of'))\
+                            .filter(ESGSnapshot.source == 'yahoo')\
+                            .group_by(ESGSnapshot.symbol)\
+                            .subquery()
+                        query = session.query(*columns)\
+                            .join(latest, (ESGSnapshot.symbol == latest.c.symbol) & (ESGSnapshot.as_of == latest.c.as_of))
+                    else:
+                        # Same-timestamp rows are re-read; applying them again is a no-op
+                        query = session.query(*columns)\
+                            .filter(ESGSnapshot.fetched_at >= self._watermark)
+                    rows = query.filter(ESGSnapshot.source == 'yahoo')\
+                        .order_by(ESGSnapshot.as_of)\
+                        .all()
+            finally:
+                session.close()
+
+            full_build = self._watermark is None
+            for row in rows:
+                # A full build appends and sorts each group once at the end
+                self._apply(dict(row._mapping), keep_sorted=not full_build)
+                if self._watermark is None or row.fetched_at > self._watermark:
+                    self._watermark = row.fetched_at
+            if full_build:
+                for group in self.groups.values():
+                    group.sort()
+                self._watermark = self._watermark or datetime.min
+            return len(rows)
+
+    def group(self, level: str, name: str) -> Optional[_ScoreGroup]:
+        return self.groups.get((level, name))
+
+    def industry_average(self, industry: str, field: str = 'total', level: str = 'industry') -> Optional[float]:
+        group = self.group(level, industry)
+        return group.average(field) if group else None
+
+    def percentile_rank(self, industry: str, field: str, score: float, level: str = 'industry') -> Optional[float]:
+        group = self.group(level, industry)
+        return group.percentile(field, score) if group else None
+
+    def peer_comparison(self, snapshot: dict, level: str = 'industry') -> Dict[str, any]:
+        """
+        Group averages and percentile ranks of a snapshot's scores within
+        its sector or industry
+        """
+        name = snapshot.get(level)
+        group = self.group(level, name) if name else None
+        if group is None:
+            return {level: name, 'peers': 0, 'industry_average': {}, 'percentile_rank': {}}
+
+        average, rank = {}, {}
+        for field in ESG_AGGREGATE_FIELDS:
+            value = group.average(field)
+            if value is not None:
+                average[field] = value
+            if snapshot.get(field) is not None and group.scores[field]:
+                rank[field] = group.percentile(field, snapshot[field])
+        return {level: name, 'peers': group.members, 'industry_average': average, 'percentile_rank': rank}
+
+_esg_aggregates = None
+
+def get_esg_aggregates() -> ESGAggregates:
+    global _esg_aggregates
+    if _esg_aggregates is None:
+        _esg_aggregates = ESGAggregates()
+    return _esg_aggregates
@@ -1,12 +1,36 @@
-import yfinance as yf
 import pandas as pd
 import numpy as np
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
 from typing import Dict, Optional, List
 import requests
 from bs4 import BeautifulSoup
+from sqlalchemy import func
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from .database import get_session, ESGSnapshot
+from .esg_aggregates import get_esg_aggregates
+from .news import get_news_service
+from .providers import get_provider
+from .tracing import span, traced
+
+ESG_CACHE_TTL = timedelta(hours=24)
+ESG_FETCH_WORKERS = 8
+ESG_SCORE_FIELDS = ['environmental', 'social', 'governance', 'total']
+
+# Yahoo sustainability rows behind each stored score
+ESG_SOURCE_ROWS = {
+    'environmental': 'environmentScore',
+    'social': 'socialScore',
+    'governance': 'governanceScore',
+    'total': 'totalEsg',
+    'controversy_level': 'highestControversy'
+}
 
 class ESGAnalyzer:
-    def __init__(self):
+    def __init__(self, ttl: timedelta = ESG_CACHE_TTL, max_workers: int = ESG_FETCH_WORKERS):
+        self.ttl = ttl
+        self.max_workers = max_workers
         self.esg_metrics = {
             'environmental': [
                 'carbonEmissions', 'carbonIntensity', 'energyEfficiency',
@@ -22,80 +46,187 @@ class ESGAnalyzer:
             ]
         }
         
+    @traced()
     def get_esg_scores(self, symbol: str) -> Dict[str, float]:
-        """Get ESG scores from Yahoo Finance and other sources"""
+        """Get ESG scores from the snapshot store, fetching from Yahoo Finance when stale"""
+        snapshot = self.get_esg_scores_batch([symbol])[symbol.upper()]
+        return self._scores(snapshot, self._detailed_peer_comparison(snapshot['symbol'], snapshot))
+    
+    def _scores(self, snapshot: Dict, peers: Dict) -> Dict[str, float]:
+        scores = {field: snapshot[field] for field in ESG_SCORE_FIELDS}
+        # 'yahoo' or 'estimated'; estimates are placeholders, not ratings
+        scores['source'] = snapshot.get('source')
+        
+        # Enhance with additional data
+        scores.update(self._get_additional_esg_data(snapshot, peers))
+        return scores
+    
+    @traced()
+    def get_esg_scores_batch(self, symbols: List[str]) -> Dict[str, Dict]:
+        """
+        Latest snapshot per symbol. Snapshots younger than the TTL come from
+        the database in one query; the rest are fetched concurrently and
+        stored in a single transaction. When a fetch fails, the stale
+        snapshot (or an unsaved estimate) is served and the next call
+        retries Yahoo.
+        """
+        symbols = list(dict.fromkeys(s.upper() for s in symbols))
+        snapshots = self._latest_snapshots(symbols)
+        cutoff = datetime.utcnow() - self.ttl
+        stale = [s for s in symbols if s not in snapshots or snapshots[s]['fetched_at'] < cutoff]
+        
+        if stale:
+            with span('esg.fetch', symbols=len(stale)):
+                with ThreadPoolExecutor(max_workers=min(self.max_workers, len(stale))) as pool:
+                    fetched = dict(zip(stale, pool.map(self._fetch_snapshot, stale)))
+            stored = {symbol: snapshot for symbol, snapshot in fetched.items() if snapshot is not None}
+            if stored:
+                self._store_snapshots(list(stored.values()))
+            snapshots.update(stored)
+            for symbol in fetched.keys() - stored.keys():
+                if symbol not in snapshots:
+                    snapshots[symbol] = self._estimated_snapshot(self._new_snapshot(symbol))
+        return snapshots
+    
+    def _fetch_snapshot(self, symbol: str) -> Optional[Dict]:
+        """
+        Fetch one symbol's scores; falls back to estimates when Yahoo has
+        none, and returns None when the fetch itself fails
+        """
         try:
-            stock = yf.Ticker(symbol)
-            esg_data = stock.sustainability
-            
-            if esg_data is None:
-                return self._generate_estimated_scores(symbol)
-            
-            scores = {
-                'environmental': float(esg_data.loc['environmentScore'].value),
-                'social': float(esg_data.loc['socialScore'].value),
-                'governance': float(esg_data.loc['governanceScore'].value),
-                'total': float(esg_data.loc['totalEsg'].value)
-            }
-            
-            # Enhance with additional data
-            additional = self._get_additional_esg_data(symbol)
-            scores.update(additional)
-            
-            return scores
-        except Exception:
-            return self._generate_estimated_scores(symbol)
+            esg_data = get_provider().sustainability(symbol)
+        except Exception as e:
+            print(f"Failed to fetch ESG data for {symbol}: {str(e)}")
+            return None
+        
+        snapshot = self._new_snapshot(symbol)
+        try:
+            snapshot.update(self._parse_sustainability(esg_data))
+            snapshot['source'] = 'yahoo'
+        except ValueError:
+            snapshot = self._estimated_snapshot(snapshot)
+        return snapshot
     
-    def _get_additional_esg_data(self, symbol: str) -> Dict[str, float]:
-        """Get additional ESG data from alternative sources"""
+    def _new_snapshot(self, symbol: str) -> Dict:
+        now = datetime.utcnow()
+        snapshot = {'symbol': symbol, 'as_of': datetime(now.year, now.month, now.day), 'fetched_at': now}
         try:
-            # This is a placeholder for additional data sources
-            # In a production environment, you would integrate with paid ESG data providers
-            return {
-                'controversy_level': self._analyze_controversy_level(symbol),
-                'sustainability_rating': self._calculate_sustainability_rating(symbol),
-                'peer_comparison': self._get_peer_comparison_score(symbol)
-            }
+            info = get_provider().info(symbol) or {}
         except Exception:
-            return {}
+            info = {}
+        snapshot['sector'] = info.get('sector')
+        snapshot['industry'] = info.get('industry')
+        return snapshot
+    
+    def _estimated_snapshot(self, snapshot: Dict) -> Dict:
+        snapshot.update(self._generate_estimated_scores(snapshot['symbol']))
+        snapshot['source'] = 'estimated'
+        return snapshot
+    
+    def _parse_sustainability(self, esg_data: Optional[pd.DataFrame]) -> Dict[str, float]:
+        if esg_data is None or esg_data.empty:
+            raise ValueError('No sustainability data')
+        column = esg_data.iloc[:, 0]
+        values = {}
+        for field, row in ESG_SOURCE_ROWS.items():
+            value = pd.to_numeric(column.get(row), errors='coerce')
+            values[field] = float(value) if pd.notna(value) else None
+        if values['controversy_level'] is not None:
+            # Yahoo rates controversies 0-5
+            values['controversy_level'] *= 20
+        if values['total'] is None:
+            raise ValueError('No total ESG score')
+        return values
     
-    def _analyze_controversy_level(self, symbol: str) -> float:
-        """Analyze controversy level based on news sentiment"""
-        # Placeholder for news sentiment analysis
-        # In production, integrate with news API and sentiment analysis
-        return np.random.uniform(0, 100)  # Simulated score
+    def _latest_snapshots(self, symbols: List[str]) -> Dict[str, Dict]:
+        session = get_session()
+        try:
+            latest = session.query(ESGSnapshot.symbol, func.max(ESGSnapshot.as_of).label('as_of'))\
+                .filter(ESGSnapshot.symbol.in_(symbols))\
+                .group_by(ESGSnapshot.symbol)\
+                .subquery()
+            rows = session.query(ESGSnapshot)\
+                .join(latest, (ESGSnapshot.symbol == latest.c.symbol) & (ESGSnapshot.as_of == latest.c.as_of))\
+                .all()
+            return {row.symbol: self._snapshot_dict(row) for row in rows}
+        finally:
+            session.close()
+    
+    @staticmethod
+    def _snapshot_dict(row: ESGSnapshot) -> Dict:
+        return {
+            'symbol': row.symbol, 'as_of': row.as_of, 'fetched_at': row.fetched_at,
+            'environmental': row.environmental, 'social': row.social,
+            'governance': row.governance, 'total': row.total,
+            'controversy_level': row.controversy_level,
+            'sector': row.sector, 'industry': row.industry, 'source': row.source
+        }
+    
+    def _store_snapshots(self, snapshots: List[Dict]):
+        """Upsert one row per (symbol, day)"""
+        columns = ESG_SCORE_FIELDS + ['controversy_level', 'sector', 'industry', 'source', 'fetched_at']
+        session = get_session()
+        try:
+            for snapshot in snapshots:
+                stmt = sqlite_insert(ESGSnapshot).values(
+                    symbol=snapshot['symbol'], as_of=snapshot['as_of'],
+                    **{column: snapshot.get(column) for column in columns}
+                )
+                stmt = stmt.on_conflict_do_update(
+                    index_elements=['symbol', 'as_of'],
+                    set_={column: stmt.excluded[column] for column in columns}
+                )
+                session.execute(stmt)
+            session.commit()
+        except Exception as e:
+            session.rollback()
+            print(f"Failed to save ESG snapshots: {str(e)}")
+            return
+        finally:
+            session.close()
+        get_esg_aggregates().refresh()
     
-    def _calculate_sustainability_rating(self, symbol: str) -> float:
-        """Calculate sustainability rating based on available data"""
-        # Placeholder for sustainability calculation
-        # In production, use real sustainability metrics
-        return np.random.uniform(0, 100)  # Simulated score
+    def _get_additional_esg_data(self, snapshot: Dict, peers: Dict) -> Dict[str, float]:
+        """Derived fields from the stored snapshot and its industry peers"""
+        scores = [snapshot.get(field) for field in ('environmental', 'social', 'governance')]
+        scores = [score for score in scores if score is not None]
+        controversy = snapshot.get('controversy_level')
+        if controversy is None:
+            controversy = self._analyze_controversy_level(snapshot['symbol'])
+        return {
+            'controversy_level': controversy,
+            'sustainability_rating': float(np.mean(scores)) if scores else None,
+            'peer_comparison': peers['percentile_rank'].get('total')
+        }
     
-    def _get_peer_comparison_score(self, symbol: str) -> float:
-        """Compare ESG performance with industry peers"""
-        # Placeholder for peer comparison
-        # In production, use industry averages and peer data
-        return np.random.uniform(0, 100)  # Simulated score
+    def _analyze_controversy_level(self, symbol: str) -> Optional[float]:
+        """Controversy level from stored news sentiment when Yahoo has no rating"""
+        try:
+            return get_news_service().controversy_level(symbol)
+        except Exception:
+            return None
     
     def _generate_estimated_scores(self, symbol: str) -> Dict[str, float]:
         """Generate estimated ESG scores when actual data is unavailable"""
-        # This is a simplified estimation. In production, use more sophisticated methods
+        # Seeded by symbol so an estimate is stable across calls and snapshots
+        rng = np.random.default_rng(zlib.crc32(symbol.encode()))
         return {
-            'environmental': np.random.uniform(30, 70),
-            'social': np.random.uniform(30, 70),
-            'governance': np.random.uniform(30, 70),
-            'total': np.random.uniform(30, 70),
-            'controversy_level': np.random.uniform(0, 100),
-            'sustainability_rating': np.random.uniform(0, 100),
-            'peer_comparison': np.random.uniform(0, 100)
+            'environmental': rng.uniform(30, 70),
+            'social': rng.uniform(30, 70),
+            'governance': rng.uniform(30, 70),
+            'total': rng.uniform(30, 70),
+            'controversy_level': None
         }
     
+    @traced()
     def get_esg_report(self, symbol: str) -> Dict[str, any]:
         """Generate a comprehensive ESG report"""
-        scores = self.get_esg_scores(symbol)
-        stock = yf.Ticker(symbol)
+        snapshot = self.get_esg_scores_batch([symbol])[symbol.upper()]
+        peers = self._detailed_peer_comparison(snapshot['symbol'], snapshot)
+        scores = self._scores(snapshot, peers)
         
         report = {
+            'source': scores['source'],
             'scores': scores,
             'analysis': {
                 'environmental': self._analyze_environmental(scores),
@@ -104,15 +235,17 @@ class ESGAnalyzer:
             },
             'recommendations': self._generate_recommendations(scores),
             'trends': self._analyze_trends(symbol),
-            'peer_comparison': self._detailed_peer_comparison(symbol)
+            'peer_comparison': peers
         }
         
         return report
     
     def _analyze_environmental(self, scores: Dict[str, float]) -> Dict[str, str]:
         """Analyze environmental scores and provide insights"""
-        env_score = scores.get('environmental', 0)
+        env_score = scores.get('environmental')
         
+        if env_score is None:
+            return self._unrated_analysis('environmental')
         if env_score >= 70:
             return {
                 'rating': 'Excellent',
@@ -143,8 +276,10 @@ class ESGAnalyzer:
     
     def _analyze_social(self, scores: Dict[str, float]) -> Dict[str, str]:
         """Analyze social scores and provide insights"""
-        social_score = scores.get('social', 0)
+        social_score = scores.get('social')
         
+        if social_score is None:
+            return self._unrated_analysis('social')
         if social_score >= 70:
             return {
                 'rating': 'Excellent',
@@ -175,8 +310,10 @@ class ESGAnalyzer:
     
     def _analyze_governance(self, scores: Dict[str, float]) -> Dict[str, str]:
         """Analyze governance scores and provide insights"""
-        gov_score = scores.get('governance', 0)
+        gov_score = scores.get('governance')
         
+        if gov_score is None:
+            return self._unrated_analysis('governance')
         if gov_score >= 70:
             return {
                 'rating': 'Excellent',
@@ -205,25 +342,41 @@ class ESGAnalyzer:
                                         'Improve risk management']
             }
     
+    @staticmethod
+    def _unrated_analysis(pillar: str) -> Dict[str, str]:
+        """Analysis for a pillar Yahoo reported no score for"""
+        return {
+            'rating': 'Not Rated',
+            'summary': f'No {pillar} score available',
+            'strengths': [],
+            'areas_for_improvement': []
+        }
+    
+    @staticmethod
+    def _below(scores: Dict[str, float], field: str, threshold: float) -> bool:
+        """True when the pillar is scored and under threshold; missing pillars are not flagged"""
+        score = scores.get(field)
+        return score is not None and score < threshold
+    
     def _generate_recommendations(self, scores: Dict[str, float]) -> List[str]:
         """Generate specific recommendations based on ESG scores"""
         recommendations = []
         
-        if scores.get('environmental', 0) < 50:
+        if self._below(scores, 'environmental', 50):
             recommendations.extend([
                 'Develop comprehensive environmental policy',
                 'Set specific emissions reduction targets',
                 'Implement energy efficiency programs'
             ])
             
-        if scores.get('social', 0) < 50:
+        if self._below(scores, 'social', 50):
             recommendations.extend([
                 'Strengthen diversity and inclusion initiatives',
                 'Improve employee development programs',
                 'Enhance community engagement'
             ])
             
-        if scores.get('governance', 0) < 50:
+        if self._below(scores, 'governance', 50):
             recommendations.extend([
                 'Increase board independence',
                 'Improve executive compensation transparency',
@@ -232,29 +385,30 @@ class ESGAnalyzer:
             
         return recommendations if recommendations else ['Maintain current ESG performance']
     
-    def _analyze_trends(self, symbol: str) -> Dict[str, List[float]]:
-        """Analyze ESG score trends over time"""
-        # Placeholder for historical trend analysis
-        # In production, use historical ESG data
+    def _analyze_trends(self, symbol: str, limit: int = 5) -> Dict[str, List[float]]:
+        """Analyze ESG score trends over the last `limit` Yahoo-sourced snapshots"""
+        session = get_session()
+        try:
+            rows = session.query(ESGSnapshot.as_of, ESGSnapshot.environmental,
+                                 ESGSnapshot.social, ESGSnapshot.governance)\
+                .filter(ESGSnapshot.symbol == symbol.upper(), ESGSnapshot.source == 'yahoo')\
+                .order_by(ESGSnapshot.as_of.desc())\
+                .limit(limit)\
+                .all()
+        finally:
+            session.close()
+        rows = rows[::-1]
         return {
-            'environmental': [np.random.uniform(30, 70) for _ in range(5)],
-            'social': [np.random.uniform(30, 70) for _ in range(5)],
-            'governance': [np.random.uniform(30, 70) for _ in range(5)]
+            'as_of': [row.as_of for row in rows],
+            'environmental': [row.environmental for row in rows],
+            'social': [row.social for row in rows],
+            'governance': [row.governance for row in rows]
         }
     
-    def _detailed_peer_comparison(self, symbol: str) -> Dict[str, any]:
-        """Provide detailed peer comparison analysis"""
-        # Placeholder for detailed peer comparison
-        # In production, use actual peer data
-        return {
-            'industry_average': {
-                'environmental': np.random.uniform(30, 70),
-                'social': np.random.uniform(30, 70),
-                'governance': np.random.uniform(30, 70)
-            },
-            'percentile_rank': {
-                'environmental': np.random.uniform(0, 100),
-                'social': np.random.uniform(0, 100),
-                'governance': np.random.uniform(0, 100)
-            }
-        }
+    def _detailed_peer_comparison(self, symbol: str, snapshot: Optional[Dict] = None) -> Dict[str, any]:
+        """Industry averages and percentile ranks from the precomputed industry aggregates"""
+        if snapshot is None:
+            snapshot = self._latest_snapshots([symbol.upper()]).get(symbol.upper(), {'symbol': symbol.upper()})
+        aggregates = get_esg_aggregates()
+        aggregates.refresh()
+        return aggregates.peer_comparison(snapshot)
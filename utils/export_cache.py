@@ -0,0 +1,114 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+from typing import Optional
+
+import pandas as pd
+
+from .stock_data import get_data_version
+from .tracing import count
+
+EXPORT_CACHE_DIR_ENV = 'STOCKSENTRY_EXPORT_CACHE_DIR'
+DEFAULT_EXPORT_CACHE_DIR = os.path.join('.cache', 'exports')
+DEFAULT_EXPORT_CACHE_BYTES = 256 * 1024 * 1024
+
+def figure_fingerprint(fig) -> str:
+    """
+    Identify a figure by its title and traces; the plotted data itself is
+    covered by the price frame's data version
+    """
+    title = fig.layout.title.text if fig.layout.title else None
+    traces = [(trace.type, trace.name) for trace in fig.data]
+    return json.dumps([title, traces, fig.layout.height, fig.layout.width], default=str)
+
+class ExportCache:
+    """
+    On-disk cache of generated export files with size-bounded LRU eviction.
+    Access refreshes a file's mtime, which is the LRU order.
+    """
+    def __init__(self, directory: Optional[str] = None, max_bytes: int = DEFAULT_EXPORT_CACHE_BYTES):
+        self.directory = directory or os.environ.get(EXPORT_CACHE_DIR_ENV, DEFAULT_EXPORT_CACHE_DIR)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+    def key(self, symbol: str, df: pd.DataFrame, figures: list, extra: dict = None, kind: str = 'xlsx') -> str:
+        payload = json.dumps({
+            'symbol': symbol,
+            'data_version': get_data_version(df),
+            'first_bar': str(df.index[0]) if len(df) else None,
+            'columns': [str(c) for c in df.columns],
+            'figures': [figure_fingerprint(fig) for fig in figures],
+            'extra': extra,
+            'kind': kind,
+        }, sort_keys=True, default=str)
+        return f"{hashlib.sha1(payload.encode()).hexdigest()}.{kind}"
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key)
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        Path of the cached artifact, or None
+        """
+        path = self._path(key)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            count('export_cache.miss')
+            return None
+        count('export_cache.hit')
+        return path
+
+    def put(self, key: str, fileobj) -> str:
+        """
+        Store a file object's contents and evict old entries over the size
+        bound; the new entry itself is never evicted
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(key)
+        tmp_path = f'{path}.{threading.get_ident()}.tmp'
+        fileobj.seek(0)
+        with open(tmp_path, 'wb') as f:
+            shutil.copyfileobj(fileobj, f)
+        os.replace(tmp_path, path)
+        fileobj.seek(0)
+        self.evict(keep=path)
+        return path
+
+    def evict(self, keep: Optional[str] = None):
+        with self._lock:
+            entries = []
+            for name in os.listdir(self.directory):
+                if name.endswith('.tmp'):
+                    continue
+                path = self._path(name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                if path == keep:
+                    continue
+                try:
+                    os.remove(path)
+                    total -= size
+                except FileNotFoundError:
+                    pass
+
+    def clear(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+_export_cache = None
+
+def get_export_cache() -> ExportCache:
+    global _export_cache
+    if _export_cache is None:
+        _export_cache = ExportCache()
+    return _export_cache
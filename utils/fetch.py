@@ -0,0 +1,249 @@
+import os
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+from urllib.parse import urlsplit, urlunsplit
+
+import requests
+import yfinance as yf
+from requests.adapters import HTTPAdapter
+
+# Point every Yahoo request at another host, e.g. a local fake server in tests
+YAHOO_BASE_URL_ENV = 'STOCKSENTRY_YAHOO_URL'
+
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+class TokenBucket:
+    """
+    Thread-safe token bucket; acquire() blocks until a token is available
+    """
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens: float = 1.0):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                wait = (tokens - self._tokens) / self.rate
+            time.sleep(wait)
+
+class FetchMetrics:
+    """
+    Per-endpoint call counts, errors, retries and latency
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, float]] = {}
+
+    def record(self, endpoint: str, latency: float, error: bool = False, retries: int = 0, collapsed: bool = False):
+        with self._lock:
+            stats = self._stats.setdefault(endpoint, {
+                'calls': 0, 'errors': 0, 'retries': 0, 'collapsed': 0,
+                'total_latency': 0.0, 'max_latency': 0.0
+            })
+            if collapsed:
+                stats['collapsed'] += 1
+                return
+            stats['calls'] += 1
+            stats['errors'] += int(error)
+            stats['retries'] += retries
+            stats['total_latency'] += latency
+            stats['max_latency'] = max(stats['max_latency'], latency)
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            result = {}
+            for endpoint, stats in self._stats.items():
+                stats = dict(stats)
+                stats['avg_latency'] = stats['total_latency'] / stats['calls'] if stats['calls'] else 0.0
+                result[endpoint] = stats
+            return result
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+
+class _RewriteAdapter(HTTPAdapter):
+    """
+    Transport adapter that redirects Yahoo hosts to a configured base URL
+    """
+    def __init__(self, base_url: str, **kwargs):
+        self.base = urlsplit(base_url)
+        super().__init__(**kwargs)
+
+    def send(self, request, **kwargs):
+        parts = urlsplit(request.url)
+        if parts.hostname and parts.hostname.endswith('yahoo.com'):
+            request.url = urlunsplit((self.base.scheme, self.base.netloc, parts.path, parts.query, parts.fragment))
+        return super().send(request, **kwargs)
+
+class _InFlight:
+    __slots__ = ('event', 'result', 'error')
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+class FetchGateway:
+    """
+    Single entry point for Yahoo Finance calls: pooled session, global rate
+    limit, jittered exponential backoff and collapsing of identical requests
+    """
+    def __init__(self, rate: float = 4.0, burst: int = 8, max_retries: int = 3,
+                 backoff_base: float = 0.5, backoff_cap: float = 8.0,
+                 pool_size: int = 20, base_url: Optional[str] = None,
+                 ticker_ttl: float = 900.0):
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.ticker_ttl = ticker_ttl
+        self.bucket = TokenBucket(rate, burst)
+        self.metrics = FetchMetrics()
+        self.session = self._build_session(pool_size, base_url or os.environ.get(YAHOO_BASE_URL_ENV))
+        self._inflight: Dict[tuple, _InFlight] = {}
+        self._inflight_lock = threading.Lock()
+        self._tickers: Dict[str, tuple] = {}
+        self._tickers_lock = threading.Lock()
+
+    def _build_session(self, pool_size: int, base_url: Optional[str]) -> requests.Session:
+        session = requests.Session()
+        if base_url:
+            adapter = _RewriteAdapter(base_url, pool_connections=pool_size, pool_maxsize=pool_size)
+        else:
+            adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        return session
+
+    def call(self, endpoint: str, key: Any, fn: Callable, *args, **kwargs):
+        """
+        Run fn through the rate limiter and retry policy; concurrent calls
+        with the same (endpoint, key) share a single upstream request
+        """
+        flight_key = (endpoint, key)
+        with self._inflight_lock:
+            flight = self._inflight.get(flight_key)
+            leader = flight is None
+            if leader:
+                flight = _InFlight()
+                self._inflight[flight_key] = flight
+
+        if not leader:
+            flight.event.wait()
+            self.metrics.record(endpoint, 0.0, collapsed=True)
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+
+        try:
+            flight.result = self._call_with_retry(endpoint, fn, *args, **kwargs)
+            return flight.result
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._inflight_lock:
+                self._inflight.pop(flight_key, None)
+            flight.event.set()
+
+    def _call_with_retry(self, endpoint: str, fn: Callable, *args, **kwargs):
+        attempt = 0
+        start = time.perf_counter()
+        while True:
+            self.bucket.acquire()
+            try:
+                result = fn(*args, **kwargs)
+                self.metrics.record(endpoint, time.perf_counter() - start, retries=attempt)
+                return result
+            except Exception as e:
+                if attempt >= self.max_retries or not self._is_retryable(e):
+                    self.metrics.record(endpoint, time.perf_counter() - start, error=True, retries=attempt)
+                    raise
+                # Full jitter: sleep uniformly in [0, min(cap, base * 2^attempt)]
+                time.sleep(random.uniform(0, min(self.backoff_cap, self.backoff_base * 2 ** attempt)))
+                attempt += 1
+
+    @staticmethod
+    def _is_retryable(error: Exception) -> bool:
+        if isinstance(error, (requests.ConnectionError, requests.Timeout, ConnectionError, TimeoutError)):
+            return True
+        response = getattr(error, 'response', None)
+        if response is not None and getattr(response, 'status_code', None) in RETRYABLE_STATUS:
+            return True
+        message = str(error).lower()
+        return 'too many requests' in message or 'rate limit' in message
+
+    def ticker(self, symbol: str) -> yf.Ticker:
+        """
+        Shared Ticker bound to the pooled session, rebuilt after ticker_ttl
+        """
+        now = time.monotonic()
+        with self._tickers_lock:
+            cached = self._tickers.get(symbol)
+            if cached and now - cached[1] < self.ticker_ttl:
+                return cached[0]
+            ticker = yf.Ticker(symbol, session=self.session)
+            self._tickers[symbol] = (ticker, now)
+            return ticker
+
+    def history(self, symbol: str, **kwargs):
+        key = (symbol, tuple(sorted(kwargs.items())))
+        return self.call('history', key, lambda: self.ticker(symbol).history(**kwargs))
+
+    def info(self, symbol: str) -> dict:
+        return self.call('info', symbol, lambda: self.ticker(symbol).info)
+
+    def sustainability(self, symbol: str):
+        return self.call('sustainability', symbol, lambda: self.ticker(symbol).sustainability)
+
+    def download(self, tickers, **kwargs):
+        key = (tickers if isinstance(tickers, str) else tuple(tickers), tuple(sorted((k, str(v)) for k, v in kwargs.items())))
+        kwargs.setdefault('progress', False)
+        return self.call('download', key, yf.download, tickers, session=self.session, **kwargs)
+
+    def get(self, url: str, endpoint: str = 'http', timeout: float = 10.0, **kwargs) -> requests.Response:
+        """
+        Plain HTTP GET through the same limiter, retry policy and session
+        """
+        def _get():
+            response = self.session.get(url, timeout=timeout, **kwargs)
+            if response.status_code in RETRYABLE_STATUS:
+                response.raise_for_status()
+            return response
+        key = (url, tuple(sorted((k, str(v)) for k, v in kwargs.items())))
+        return self.call(endpoint, key, _get)
+
+_gateway = None
+_gateway_lock = threading.Lock()
+
+def get_gateway() -> FetchGateway:
+    """
+    Process-wide FetchGateway
+    """
+    global _gateway
+    with _gateway_lock:
+        if _gateway is None:
+            _gateway = FetchGateway()
+        return _gateway
+
+def set_gateway(gateway: FetchGateway):
+    """
+    Replace the process-wide gateway (e.g. one pointed at a fake server)
+    """
+    global _gateway
+    with _gateway_lock:
+        _gateway = gateway
+
+def get_fetch_metrics() -> Dict[str, Dict[str, float]]:
+    return get_gateway().metrics.snapshot()
@@ -0,0 +1,181 @@
+import itertools
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+
+from .analysis import RiskAnalyzer
+from .backtest import DEFAULT_COST_BPS
+from .panel import PricePanel
+from .technical_analysis import calculate_ichimoku_cloud, ema_frame, macd_frame, rsi_frame
+from .tracing import span, traced
+
+SWEEP_WORKERS = os.cpu_count() or 1
+SWEEP_BLOCK_SIZE = 64
+SWEEP_FIELDS = ('Close', 'High', 'Low')
+SWEEP_METRICS = ['total_return', 'volatility', 'max_drawdown', 'sharpe_ratio', 'sortino_ratio',
+                 'var_95', 'trades', 'exposure']
+
+# Signal functions take bars x symbols Close/High/Low frames plus parameters
+# and return a 1 (long) / 0 (flat) / NaN (hold previous) frame
+
+def ema_crossover_signal(close, high, low, fast=20, slow=50):
+    '''Long while the fast EMA is above the slow EMA'''
+    fast_ema, slow_ema = ema_frame(close, fast), ema_frame(close, slow)
+    return (fast_ema > slow_ema).astype(np.float64).where(slow_ema.notna(), 0.0)
+
+def rsi_reversion_signal(close, high, low, window=14, lower=30, upper=70):
+    '''Buy when RSI falls below lower, sell when it rises above upper'''
+    rsi = rsi_frame(close, window)
+    signal = pd.DataFrame(np.nan, index=close.index, columns=close.columns)
+    signal[rsi < lower] = 1.0
+    signal[rsi > upper] = 0.0
+    return signal
+
+def macd_signal(close, high, low, fast=12, slow=26, signal=9):
+    '''Long while MACD is above its signal line'''
+    macd, line = macd_frame(close, fast, slow, signal)
+    return (macd > line).astype(np.float64).where(line.notna(), 0.0)
+
+def ichimoku_signal(close, high, low, conversion=9, base=26, span_b=52):
+    '''Long while the close is above the Ichimoku cloud'''
+    _, _, span_a, span_b_line = calculate_ichimoku_cloud({'High': high, 'Low': low}, conversion, base, span_b)
+    cloud_top = np.fmax(span_a.to_numpy(), span_b_line.to_numpy())
+    return pd.DataFrame((close.to_numpy() > cloud_top).astype(np.float64), index=close.index, columns=close.columns)
+
+SIGNALS = {
+    'ema_crossover': ema_crossover_signal,
+    'rsi_reversion': rsi_reversion_signal,
+    'macd': macd_signal,
+    'ichimoku': ichimoku_signal,
+}
+
+def _signal_returns(close: pd.DataFrame, signal: pd.DataFrame, cost_bps: float):
+    """
+    Daily returns of trading each column's signal on the next bar, net of
+    cost_bps per unit of position change
+    """
+    position = signal.ffill().fillna(0.0).where(close.notna(), 0.0)
+    held = position.shift(1).fillna(0.0)
+    returns = close.pct_change(fill_method=None).fillna(0.0)
+    trades = position.diff().abs().fillna(position.abs())
+    strategy = held * returns - trades * cost_bps / 10_000
+    return strategy.where(close.notna()), trades.sum(), held.where(close.notna()).mean()
+
+# Per-worker views onto the parent's shared memory blocks
+_worker_blocks: Dict[str, shared_memory.SharedMemory] = {}
+_worker_arrays: Dict[str, np.ndarray] = {}
+
+def _attach(specs: Dict[str, tuple]):
+    for field, (name, shape) in specs.items():
+        # Pool workers share the parent's resource tracker, so the parent's
+        # unlink() is the only cleanup needed
+        block = shared_memory.SharedMemory(name=name)
+        _worker_blocks[field] = block
+        _worker_arrays[field] = np.ndarray(shape, dtype=np.float64, buffer=block.buf)
+
+def _evaluate(signal_name: str, params: Dict, start: int, stop: int, cost_bps: float) -> np.ndarray:
+    """
+    Metrics for one parameter set over symbol columns [start, stop); the
+    price arrays are read from shared memory, not sent with the task
+    """
+    close, high, low = (pd.DataFrame(_worker_arrays[field][:, start:stop]) for field in SWEEP_FIELDS)
+    signal = SIGNALS[signal_name](close, high, low, **params)
+    returns, trades, exposure = _signal_returns(close, signal, cost_bps)
+
+    equity = (1 + returns.fillna(0.0)).cumprod().where(close.notna())
+    metrics = RiskAnalyzer().calculate_risk_metrics_frame(equity)
+    metrics['total_return'] = equity.ffill().iloc[-1] / equity.bfill().iloc[0] - 1
+    metrics['trades'] = trades
+    metrics['exposure'] = exposure
+    return metrics[SWEEP_METRICS].to_numpy(dtype=np.float64)
+
+class IndicatorSweep:
+    """
+    Evaluate grids of indicator parameters over many symbols on a process pool.
+
+    The aligned Close/High/Low matrices are copied once into shared memory;
+    workers map them on start-up, and each task only names a parameter set
+    and a block of symbol columns, so throughput scales with the number of
+    workers rather than with pickling.
+    """
+    def __init__(self, frames: Dict[str, pd.DataFrame], max_workers: int = SWEEP_WORKERS,
+                 block_size: int = SWEEP_BLOCK_SIZE, cost_bps: float = DEFAULT_COST_BPS):
+        with span('sweep.align', symbols=len(frames)):
+            panels = {field: PricePanel.from_frames(frames, field=field) for field in SWEEP_FIELDS}
+        self.symbols = panels['Close'].symbols
+        self.dates = panels['Close'].dates
+        self._panels = panels
+        self.max_workers = max_workers
+        self.block_size = block_size
+        self.cost_bps = cost_bps
+
+    def _blocks(self) -> List[tuple]:
+        return [(start, min(start + self.block_size, len(self.symbols)))
+                for start in range(0, len(self.symbols), self.block_size)]
+
+    @traced()
+    def run(self, signal: str, grid: Dict[str, List], per_symbol: bool = False,
+            sort_by: str = 'sharpe_ratio') -> pd.DataFrame:
+        """
+        Run every parameter combination in grid for the named signal
+        (see SIGNALS). Returns one row per combination with metrics averaged
+        over symbols, best first; per_symbol=True returns the unaggregated
+        (params x symbol) rows instead.
+        """
+        names = list(grid)
+        variants = [dict(zip(names, values)) for values in itertools.product(*(grid[name] for name in names))]
+        tasks = [(params, start, stop) for params in variants for start, stop in self._blocks()]
+
+        if self.max_workers <= 1:
+            with span('sweep.evaluate', tasks=len(tasks), workers=1):
+                _worker_arrays.update({field: self._panels[field].values for field in SWEEP_FIELDS})
+                try:
+                    results = [_evaluate(signal, params, start, stop, self.cost_bps) for params, start, stop in tasks]
+                finally:
+                    _worker_arrays.clear()
+            return self._rank(tasks, results, names, per_symbol, sort_by)
+
+        blocks = []
+        try:
+            specs = {}
+            for field in SWEEP_FIELDS:
+                values = self._panels[field].values
+                block = shared_memory.SharedMemory(create=True, size=max(values.nbytes, 1))
+                blocks.append(block)
+                np.ndarray(values.shape, dtype=np.float64, buffer=block.buf)[:] = values
+                specs[field] = (block.name, values.shape)
+
+            with span('sweep.evaluate', tasks=len(tasks), workers=self.max_workers):
+                with ProcessPoolExecutor(max_workers=min(self.max_workers, len(tasks)),
+                                         initializer=_attach, initargs=(specs,)) as pool:
+                    futures = [pool.submit(_evaluate, signal, params, start, stop, self.cost_bps)
+                               for params, start, stop in tasks]
+                    results = [future.result() for future in futures]
+        finally:
+            for block in blocks:
+                block.close()
+                block.unlink()
+        return self._rank(tasks, results, names, per_symbol, sort_by)
+
+    def _rank(self, tasks, results, names, per_symbol, sort_by) -> pd.DataFrame:
+        rows = []
+        for (params, start, _), metrics in zip(tasks, results):
+            for offset, values in enumerate(metrics):
+                rows.append({**params, 'symbol': self.symbols[start + offset], **dict(zip(SWEEP_METRICS, values))})
+        table = pd.DataFrame(rows)
+        if not per_symbol:
+            table['hit_rate'] = (table['total_return'] > 0).astype(np.float64)
+            table = table.groupby(names, sort=False)[SWEEP_METRICS + ['hit_rate']].mean().reset_index()
+        return table.sort_values(sort_by, ascending=False, na_position='last').reset_index(drop=True)
+
+def sweep_indicator_parameters(frames: Dict[str, pd.DataFrame], signal: str, grid: Dict[str, List],
+                               max_workers: int = SWEEP_WORKERS, cost_bps: float = DEFAULT_COST_BPS,
+                               per_symbol: bool = False) -> pd.DataFrame:
+    """
+    One-shot IndicatorSweep: ranked table of parameter sets for a signal
+    """
+    return IndicatorSweep(frames, max_workers=max_workers, cost_bps=cost_bps).run(signal, grid, per_symbol=per_symbol)
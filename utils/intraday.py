@@ -0,0 +1,292 @@
+import threading
+import zlib
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import func
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from .database import get_session, IntradayChunk
+from .panel import PERIOD_DAYS
+from .providers import get_provider
+from .stock_data import get_data_version, get_stock_data
+from .streaming import TRADING_SECONDS_PER_YEAR
+from .tracing import count, span, traced
+
+OHLCV_COLUMNS = ['Open', 'High', 'Low', 'Close', 'Volume']
+
+# Bar length in seconds of every stored intraday interval, finest first
+INTRADAY_INTERVALS = {'1m': 60, '5m': 300, '15m': 900, '1h': 3600}
+# Yahoo only serves this many calendar days of history per intraday interval
+INTRADAY_MAX_DAYS = {'1m': 7, '5m': 60, '15m': 60, '1h': 730}
+# Timeframes offered in the UI; daily and weekly bars come from the daily store
+TIMEFRAMES = ['1m', '5m', '15m', '1h', '1d', '1wk']
+
+# Bars per trading year of the daily-store timeframes
+DAILY_PERIODS_PER_YEAR = {'1d': 252, '1wk': 52}
+
+INTRADAY_CACHE_TTL = timedelta(minutes=15)
+INTRADAY_COVERAGE_TOLERANCE = timedelta(days=4)
+RESAMPLE_CACHE_SIZE = 64
+
+def periods_per_year(timeframe: str) -> float:
+    """
+    Bars per trading year of a timeframe, for annualizing risk metrics
+    """
+    if timeframe in INTRADAY_INTERVALS:
+        return TRADING_SECONDS_PER_YEAR / INTRADAY_INTERVALS[timeframe]
+    return DAILY_PERIODS_PER_YEAR[timeframe]
+
+def encode_bars(df: pd.DataFrame) -> bytes:
+    """
+    Compact payload for one chunk of bars: delta-encoded epoch seconds
+    followed by the byte-shuffled float64 OHLCV columns, zlib-compressed.
+    Regular bar spacing and slowly moving prices both compress well.
+    """
+    seconds = pd.DatetimeIndex(df.index).asi8 // 1_000_000_000
+    deltas = np.diff(seconds, prepend=0).astype('<i8')
+    values = np.ascontiguousarray(df[OHLCV_COLUMNS].to_numpy(dtype='<f8').T)
+    shuffled = values.view(np.uint8).reshape(-1, 8).T
+    return zlib.compress(deltas.tobytes() + shuffled.tobytes(), 6)
+
+def decode_bars(payload: bytes, bars: int, tz: Optional[str]) -> pd.DataFrame:
+    raw = np.frombuffer(zlib.decompress(payload), dtype=np.uint8)
+    seconds = np.cumsum(raw[:bars * 8].view('<i8'))
+    values = raw[bars * 8:].reshape(8, -1).T.copy().view('<f8').reshape(len(OHLCV_COLUMNS), bars).T
+    index = pd.DatetimeIndex(seconds * 1_000_000_000, tz='UTC', name='Datetime')
+    if tz:
+        index = index.tz_convert(tz)
+    return pd.DataFrame(values, index=index, columns=OHLCV_COLUMNS)
+
+def _wall_clock(index: pd.DatetimeIndex) -> np.ndarray:
+    """
+    Exchange-local wall time of each bar as int64 nanoseconds
+    """
+    index = pd.DatetimeIndex(index)
+    if index.tz is not None:
+        index = index.tz_localize(None)
+    return index.asi8
+
+def bucket_keys(index: pd.DatetimeIndex, timeframe: str) -> np.ndarray:
+    """
+    Start of the target bar each source bar belongs to, in local wall time.
+    Sub-daily buckets are anchored on the session open (e.g. 09:30), like
+    the exchange's own hourly bars; weeks start on Monday.
+    """
+    wall = _wall_clock(index)
+    day = np.int64(86_400 * 1_000_000_000)
+    if timeframe in INTRADAY_INTERVALS:
+        step = np.int64(INTRADAY_INTERVALS[timeframe] * 1_000_000_000)
+        anchor = (wall % day).min() % step if len(wall) else 0
+        return (wall - anchor) // step * step + anchor
+    days = wall // day
+    if timeframe == '1d':
+        return days * day
+    if timeframe == '1wk':
+        # 1970-01-01 was a Thursday
+        return (days - (days + 3) % 7) * day
+    raise ValueError(f"Unsupported timeframe: {timeframe}")
+
+def resample_ohlcv(df: pd.DataFrame, timeframe: str) -> pd.DataFrame:
+    """
+    Aggregate OHLCV bars into a coarser timeframe in one vectorized pass:
+    first open, max high, min low, last close, summed volume per bucket.
+    Bars must be sorted; buckets without bars are not emitted.
+    """
+    if df.empty:
+        return df[OHLCV_COLUMNS].copy()
+    keys = bucket_keys(df.index, timeframe)
+    starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+    ends = np.r_[starts[1:], len(keys)] - 1
+
+    values = df[OHLCV_COLUMNS].to_numpy(dtype=np.float64)
+    result = np.column_stack([
+        values[starts, 0],
+        np.fmax.reduceat(values[:, 1], starts),
+        np.fmin.reduceat(values[:, 2], starts),
+        values[ends, 3],
+        np.add.reduceat(np.nan_to_num(values[:, 4]), starts),
+    ])
+    index = pd.DatetimeIndex(keys[starts], name=df.index.name)
+    tz = pd.DatetimeIndex(df.index).tz
+    if tz is not None:
+        index = index.tz_localize(tz, ambiguous='NaT', nonexistent='shift_forward')
+    return pd.DataFrame(result, index=index, columns=OHLCV_COLUMNS)
+
+class IntradayStore:
+    """
+    Intraday bars stored as one compressed chunk per symbol, interval and
+    exchange-local day, plus a resampling engine on top.
+
+    get_bars() serves any timeframe from the finest fresh interval already
+    stored that covers the period, resampling on the fly; resampled frames
+    are memoized by data version, so switching timeframes only re-reads
+    the store's watermark. Daily and weekly bars come from the daily store.
+    """
+    def __init__(self, ttl: timedelta = INTRADAY_CACHE_TTL, cache_size: int = RESAMPLE_CACHE_SIZE):
+        self.ttl = ttl
+        self.cache_size = cache_size
+        self._frames: Dict[Tuple[str, str], Tuple[datetime, pd.DataFrame]] = {}
+        self._resampled = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _coverage(self, symbol: str) -> Dict[str, Tuple[datetime, datetime, datetime]]:
+        """
+        (first day, last day, last fetch) per stored interval of symbol
+        """
+        session = get_session()
+        try:
+            with span('sqlite.intraday_coverage'):
+                rows = session.query(IntradayChunk.interval, func.min(IntradayChunk.day),
+                                     func.max(IntradayChunk.day), func.max(IntradayChunk.fetched_at))\
+                    .filter(IntradayChunk.symbol == symbol)\
+                    .group_by(IntradayChunk.interval)\
+                    .all()
+        finally:
+            session.close()
+        return {interval: (first, last, fetched_at) for interval, first, last, fetched_at in rows}
+
+    def _fetch(self, symbol: str, interval: str, days: int) -> int:
+        """
+        Download the last `days` days of bars and upsert them by day;
+        returns the number of bars stored
+        """
+        days = min(days, INTRADAY_MAX_DAYS[interval])
+        with span('provider.intraday', interval=interval, days=days):
+            df = get_provider().history(symbol, period=f'{days}d', interval=interval)
+        if df is None or df.empty:
+            return 0
+        df = df[OHLCV_COLUMNS].sort_index()
+        df = df[~df.index.duplicated(keep='last')]
+        index = pd.DatetimeIndex(df.index)
+        tz = str(index.tz) if index.tz is not None else None
+        local_days = pd.DatetimeIndex(_wall_clock(index)).normalize()
+
+        now = datetime.utcnow()
+        rows = [{'symbol': symbol, 'interval': interval, 'day': day.to_pydatetime(),
+                 'bars': len(chunk), 'tz': tz, 'payload': encode_bars(chunk), 'fetched_at': now}
+                for day, chunk in df.groupby(local_days, sort=True)]
+        session = get_session()
+        try:
+            stmt = sqlite_insert(IntradayChunk)
+            session.execute(stmt.on_conflict_do_update(
+                index_elements=['symbol', 'interval', 'day'],
+                set_={column: stmt.excluded[column] for column in ('bars', 'tz', 'payload', 'fetched_at')}
+            ), rows)
+            session.commit()
+        except Exception as e:
+            session.rollback()
+            raise Exception(f"Failed to store intraday bars: {str(e)}")
+        finally:
+            session.close()
+        return len(df)
+
+    def _load(self, symbol: str, interval: str, fetched_at: datetime) -> pd.DataFrame:
+        """
+        All stored bars of one interval, decoded once per fetch watermark
+        """
+        key = (symbol, interval)
+        cached = self._frames.get(key)
+        if cached is not None and cached[0] == fetched_at:
+            return cached[1]
+        session = get_session()
+        try:
+            with span('sqlite.intraday_chunks', interval=interval):
+                chunks = session.query(IntradayChunk.payload, IntradayChunk.bars, IntradayChunk.tz)\
+                    .filter(IntradayChunk.symbol == symbol, IntradayChunk.interval == interval)\
+                    .order_by(IntradayChunk.day)\
+                    .all()
+        finally:
+            session.close()
+        frames = [decode_bars(payload, bars, tz) for payload, bars, tz in chunks]
+        df = pd.concat(frames) if frames else pd.DataFrame(columns=OHLCV_COLUMNS)
+        self._frames[key] = (fetched_at, df)
+        return df
+
+    def _source(self, symbol: str, timeframe: str, start: datetime) -> Tuple[str, pd.DataFrame]:
+        """
+        Finest fresh stored interval that divides timeframe and reaches back
+        to start; fetches (or tops up) timeframe itself when none does
+        """
+        seconds = INTRADAY_INTERVALS[timeframe]
+        cutoff = datetime.utcnow() - self.ttl
+        coverage = self._coverage(symbol)
+        for interval, step in INTRADAY_INTERVALS.items():
+            if step > seconds or seconds % step or interval not in coverage:
+                continue
+            first, _, fetched_at = coverage[interval]
+            if first <= start + INTRADAY_COVERAGE_TOLERANCE and fetched_at >= cutoff:
+                count('intraday_cache.hit')
+                return interval, self._load(symbol, interval, fetched_at)
+
+        count('intraday_cache.miss')
+        days = (datetime.utcnow() - start).days + 1
+        if timeframe in coverage:
+            first, last, _ = coverage[timeframe]
+            if first <= start + INTRADAY_COVERAGE_TOLERANCE:
+                # Older days are complete; only the most recent ones can change
+                days = (datetime.utcnow() - last).days + 1
+        self._fetch(symbol, timeframe, days)
+        coverage = self._coverage(symbol)
+        if timeframe not in coverage:
+            return timeframe, pd.DataFrame(columns=OHLCV_COLUMNS)
+        return timeframe, self._load(symbol, timeframe, coverage[timeframe][2])
+
+    def resample(self, symbol: str, df: pd.DataFrame, source: str, timeframe: str) -> pd.DataFrame:
+        """
+        resample_ohlcv memoized by (symbol, source, timeframe, data version)
+        """
+        if source == timeframe:
+            return df
+        key = (symbol, source, timeframe, get_data_version(df))
+        with self._lock:
+            if key in self._resampled:
+                self._resampled.move_to_end(key)
+                count('resample_cache.hit')
+                return self._resampled[key]
+        count('resample_cache.miss')
+        with span('resample', source=source, timeframe=timeframe, bars=len(df)):
+            result = resample_ohlcv(df, timeframe)
+        with self._lock:
+            self._resampled[key] = result
+            while len(self._resampled) > self.cache_size:
+                self._resampled.popitem(last=False)
+        return result
+
+    @traced()
+    def get_bars(self, symbol: str, timeframe: str, period: str) -> pd.DataFrame:
+        """
+        OHLCV bars of symbol at timeframe (see TIMEFRAMES) over period.
+        Intraday history is limited to INTRADAY_MAX_DAYS of the timeframe.
+        """
+        if timeframe in ('1d', '1wk'):
+            daily = get_stock_data(symbol, period)
+            return self.resample(symbol, daily, '1d', timeframe)
+        if timeframe not in INTRADAY_INTERVALS:
+            raise ValueError(f"Unsupported timeframe: {timeframe}")
+
+        days = min(PERIOD_DAYS.get(period, INTRADAY_MAX_DAYS[timeframe]), INTRADAY_MAX_DAYS[timeframe])
+        start = (datetime.utcnow() - timedelta(days=days)).replace(hour=0, minute=0, second=0, microsecond=0)
+        source, df = self._source(symbol, timeframe, start)
+        if df.empty:
+            return df
+        # Trim on the source so the memo key is stable for a given window
+        df = df[_wall_clock(df.index) >= np.datetime64(start, 'ns').astype(np.int64)]
+        return self.resample(symbol, df, source, timeframe)
+
+_intraday_store = None
+
+def get_intraday_store() -> IntradayStore:
+    global _intraday_store
+    if _intraday_store is None:
+        _intraday_store = IntradayStore()
+    return _intraday_store
+
+def get_bars(symbol: str, timeframe: str, period: str) -> pd.DataFrame:
+    """
+    Bars of symbol at any supported timeframe; see IntradayStore.get_bars
+    """
+    return get_intraday_store().get_bars(symbol, timeframe, period)
@@ -0,0 +1,273 @@
+import hashlib
+import os
+import re
+import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from email.utils import parsedate_to_datetime
+from typing import Dict, List, Optional
+
+import pandas as pd
+from bs4 import BeautifulSoup
+from sqlalchemy import case, func
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from textblob import TextBlob
+
+from .database import get_session, DailySentiment, NewsArticle, NewsFetch
+from .fetch import get_gateway
+from .tracing import count, span, traced
+
+# Point the headline feed at another server, e.g. a local fixture server
+NEWS_FEED_URL_ENV = 'STOCKSENTRY_NEWS_URL'
+DEFAULT_NEWS_FEED_URL = 'https://feeds.finance.yahoo.com/rss/2.0/headline'
+
+NEWS_CACHE_TTL = timedelta(minutes=30)
+NEWS_FETCH_WORKERS = 8
+SENTIMENT_POSITIVE = 0.1
+SENTIMENT_NEGATIVE = -0.1
+
+def news_feed_url() -> str:
+    return os.environ.get(NEWS_FEED_URL_ENV, DEFAULT_NEWS_FEED_URL)
+
+def _normalize(text: str) -> str:
+    return re.sub(r'\s+', ' ', text or '').strip().lower()
+
+def content_hash(title: str, summary: str) -> str:
+    """
+    Identity of a story regardless of feed, link or whitespace
+    """
+    return hashlib.sha1(f'{_normalize(title)}\n{_normalize(summary)}'.encode()).hexdigest()
+
+def parse_rss(payload: bytes, fetched_at: Optional[datetime] = None) -> List[Dict]:
+    """
+    Items of an RSS 2.0 document as dicts with title, summary, link and a
+    naive UTC published_at
+    """
+    fetched_at = fetched_at or datetime.utcnow()
+    root = ET.fromstring(payload)
+    articles = []
+    for item in root.iter('item'):
+        title = (item.findtext('title') or '').strip()
+        if not title:
+            continue
+        summary = item.findtext('description') or ''
+        if '<' in summary:
+            summary = BeautifulSoup(summary, 'html.parser').get_text(' ')
+        published_at = fetched_at
+        pub_date = item.findtext('pubDate')
+        if pub_date:
+            try:
+                published = parsedate_to_datetime(pub_date)
+                if published.tzinfo is not None:
+                    published = published.astimezone(timezone.utc).replace(tzinfo=None)
+                published_at = published
+            except (TypeError, ValueError):
+                pass
+        summary = summary.strip()
+        articles.append({
+            'title': title,
+            'summary': summary,
+            'link': (item.findtext('link') or '').strip() or None,
+            'published_at': published_at,
+            'content_hash': content_hash(title, summary),
+        })
+    return articles
+
+def score_texts(texts: List[str]) -> List[tuple]:
+    """
+    (polarity, subjectivity) per text
+    """
+    return [tuple(TextBlob(text).sentiment) for text in texts]
+
+class NewsSentimentService:
+    """
+    Headline ingestion and sentiment store.
+
+    Feeds are fetched concurrently through the shared FetchGateway session,
+    parsed, deduplicated by content hash and scored once per unique story.
+    Articles and per-day aggregates are stored, and a symbol's feed is only
+    fetched again once its last fetch is older than the TTL.
+    """
+    def __init__(self, ttl: timedelta = NEWS_CACHE_TTL, max_workers: int = NEWS_FETCH_WORKERS):
+        self.ttl = ttl
+        self.max_workers = max_workers
+
+    def _fetch_feed(self, symbol: str) -> List[Dict]:
+        response = get_gateway().get(news_feed_url(), endpoint='news',
+                                     params={'s': symbol, 'region': 'US', 'lang': 'en-US'})
+        response.raise_for_status()
+        return parse_rss(response.content)
+
+    def _stale(self, symbols: List[str]) -> List[str]:
+        session = get_session()
+        try:
+            rows = session.query(NewsFetch.symbol, NewsFetch.fetched_at)\
+                .filter(NewsFetch.symbol.in_(symbols))\
+                .all()
+        finally:
+            session.close()
+        cutoff = datetime.utcnow() - self.ttl
+        fresh = {symbol for symbol, fetched_at in rows if fetched_at >= cutoff}
+        return [symbol for symbol in symbols if symbol not in fresh]
+
+    @traced()
+    def refresh(self, symbols: List[str], force: bool = False) -> Dict[str, int]:
+        """
+        Fetch feeds that are stale (or all with force); returns the number
+        of new articles stored per fetched symbol
+        """
+        symbols = list(dict.fromkeys(s.upper() for s in symbols))
+        stale = symbols if force else self._stale(symbols)
+        if not stale:
+            count('news_cache.hit', len(symbols))
+            return {}
+        count('news_cache.miss', len(stale))
+
+        feeds, errors = {}, {}
+        with span('news.fetch', symbols=len(stale)):
+            with ThreadPoolExecutor(max_workers=min(self.max_workers, len(stale))) as pool:
+                futures = {symbol: pool.submit(self._fetch_feed, symbol) for symbol in stale}
+                for symbol, future in futures.items():
+                    try:
+                        feeds[symbol] = future.result()
+                    except Exception as e:
+                        errors[symbol] = e
+        for symbol, error in errors.items():
+            print(f"Failed to fetch news for {symbol}: {str(error)}")
+
+        return self._store(feeds)
+
+    def _store(self, feeds: Dict[str, List[Dict]]) -> Dict[str, int]:
+        now = datetime.utcnow()
+        session = get_session()
+        try:
+            with span('news.dedupe'):
+                # One row per story per symbol, even if a feed repeats it
+                for symbol, articles in feeds.items():
+                    feeds[symbol] = list({article['content_hash']: article for article in articles}.values())
+                hashes = {article['content_hash'] for articles in feeds.values() for article in articles}
+                known = session.query(NewsArticle.symbol, NewsArticle.content_hash,
+                                      NewsArticle.polarity, NewsArticle.subjectivity)\
+                    .filter(NewsArticle.content_hash.in_(hashes))\
+                    .all() if hashes else []
+                stored = {(row.symbol, row.content_hash) for row in known}
+                scores = {row.content_hash: (row.polarity, row.subjectivity) for row in known}
+                new = {symbol: [a for a in articles if (symbol, a['content_hash']) not in stored]
+                       for symbol, articles in feeds.items()}
+
+            with span('news.score'):
+                unscored = {a['content_hash']: f"{a['title']}. {a['summary']}"
+                            for articles in new.values() for a in articles
+                            if a['content_hash'] not in scores}
+                scores.update(zip(unscored, score_texts(list(unscored.values()))))
+
+            rows = [{**article, 'symbol': symbol, 'fetched_at': now,
+                     'polarity': scores[article['content_hash']][0],
+                     'subjectivity': scores[article['content_hash']][1]}
+                    for symbol, articles in new.items() for article in articles]
+            if rows:
+                session.execute(sqlite_insert(NewsArticle).on_conflict_do_nothing(), rows)
+            for symbol, articles in new.items():
+                stmt = sqlite_insert(NewsFetch).values(symbol=symbol, fetched_at=now, articles=len(articles))
+                session.execute(stmt.on_conflict_do_update(
+                    index_elements=['symbol'],
+                    set_={'fetched_at': stmt.excluded.fetched_at, 'articles': stmt.excluded.articles}
+                ))
+            self._aggregate(session, rows)
+            session.commit()
+        except Exception as e:
+            session.rollback()
+            raise Exception(f"Failed to store news: {str(e)}")
+        finally:
+            session.close()
+        return {symbol: len(articles) for symbol, articles in new.items()}
+
+    def _aggregate(self, session, rows: List[Dict]):
+        """
+        Recompute DailySentiment for the (symbol, day) pairs that received articles
+        """
+        if not rows:
+            return
+        symbols = {row['symbol'] for row in rows}
+        days = {(row['symbol'], row['published_at'].strftime('%Y-%m-%d')) for row in rows}
+        since = min(row['published_at'] for row in rows).replace(hour=0, minute=0, second=0, microsecond=0)
+        day = func.date(NewsArticle.published_at)
+        with span('news.aggregate', days=len(days)):
+            totals = session.query(
+                NewsArticle.symbol, day.label('day'), func.count(NewsArticle.id),
+                func.sum(case((NewsArticle.polarity > SENTIMENT_POSITIVE, 1), else_=0)),
+                func.sum(case((NewsArticle.polarity < SENTIMENT_NEGATIVE, 1), else_=0)),
+                func.avg(NewsArticle.polarity), func.avg(NewsArticle.subjectivity)
+            ).filter(NewsArticle.symbol.in_(symbols), NewsArticle.published_at >= since)\
+                .group_by(NewsArticle.symbol, day)\
+                .all()
+            now = datetime.utcnow()
+            for symbol, day_value, articles, positive, negative, polarity, subjectivity in totals:
+                if (symbol, day_value) not in days:
+                    continue
+                stmt = sqlite_insert(DailySentiment).values(
+                    symbol=symbol, date=datetime.strptime(day_value, '%Y-%m-%d'), articles=articles,
+                    positive=positive, negative=negative, mean_polarity=polarity,
+                    mean_subjectivity=subjectivity, updated_at=now
+                )
+                session.execute(stmt.on_conflict_do_update(
+                    index_elements=['symbol', 'date'],
+                    set_={column: stmt.excluded[column] for column in
+                          ('articles', 'positive', 'negative', 'mean_polarity', 'mean_subjectivity', 'updated_at')}
+                ))
+
+    def get_articles(self, symbol: str, limit: int = 20, refresh: bool = True) -> pd.DataFrame:
+        """
+        Most recent stored headlines for symbol, newest first
+        """
+        if refresh:
+            self.refresh([symbol])
+        session = get_session()
+        try:
+            rows = session.query(NewsArticle.published_at, NewsArticle.title, NewsArticle.link,
+                                 NewsArticle.polarity, NewsArticle.subjectivity)\
+                .filter(NewsArticle.symbol == symbol.upper())\
+                .order_by(NewsArticle.published_at.desc())\
+                .limit(limit)\
+                .all()
+        finally:
+            session.close()
+        return pd.DataFrame(rows, columns=['published_at', 'title', 'link', 'polarity', 'subjectivity'])
+
+    def get_daily_sentiment(self, symbol: str, days: int = 30, refresh: bool = True) -> pd.DataFrame:
+        """
+        Stored per-day aggregates for the last `days` days, indexed by date
+        """
+        if refresh:
+            self.refresh([symbol])
+        since = datetime.utcnow() - timedelta(days=days)
+        session = get_session()
+        try:
+            rows = session.query(DailySentiment.date, DailySentiment.articles, DailySentiment.positive,
+                                 DailySentiment.negative, DailySentiment.mean_polarity,
+                                 DailySentiment.mean_subjectivity)\
+                .filter(DailySentiment.symbol == symbol.upper(), DailySentiment.date >= since)\
+                .order_by(DailySentiment.date)\
+                .all()
+        finally:
+            session.close()
+        columns = ['date', 'articles', 'positive', 'negative', 'mean_polarity', 'mean_subjectivity']
+        return pd.DataFrame(rows, columns=columns).set_index('date')
+
+    def controversy_level(self, symbol: str, days: int = 30, refresh: bool = True) -> Optional[float]:
+        """
+        Share of negative headlines over the window, 0-100; None without news
+        """
+        daily = self.get_daily_sentiment(symbol, days, refresh=refresh)
+        articles = daily['articles'].sum() if not daily.empty else 0
+        if not articles:
+            return None
+        return float(daily['negative'].sum() / articles * 100)
+
+_news_service = None
+
+def get_news_service() -> NewsSentimentService:
+    global _news_service
+    if _news_service is None:
+        _news_service = NewsSentimentService()
+    return _news_service
@@ -0,0 +1,242 @@
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from .intraday import OHLCV_COLUMNS
+from .stock_data import load_cached_prices
+from .tracing import span, traced
+
+OHLC_FIELDS = OHLCV_COLUMNS[:4]
+PRICE_DTYPES = (np.float32, np.float64)
+# Symbols read from the price cache per query when filling a store
+OHLCV_LOAD_BATCH = 250
+
+def _frame_bytes(n_bars: int) -> int:
+    """
+    Data bytes of the equivalent float64 OHLCV DataFrame with a datetime index
+    """
+    return n_bars * 8 * (len(OHLCV_COLUMNS) + 1)
+
+class OHLCVSeries:
+    """
+    Compact bars for one symbol.
+
+    timestamps are int64 epoch nanoseconds (UTC when tz is set, wall time
+    otherwise), prices is one 4 x bars float32 or float64 matrix whose
+    contiguous rows are Open/High/Low/Close, and volume is int64. The
+    pandas accessors wrap these buffers without copying, so plotting and
+    analytics code can use them as ordinary frames.
+    """
+    __slots__ = ('symbol', 'timestamps', 'prices', 'volume', 'tz')
+
+    def __init__(self, symbol: str, timestamps: np.ndarray, prices: np.ndarray, volume: np.ndarray,
+                 tz: Optional[str] = None):
+        timestamps = np.ascontiguousarray(timestamps, dtype=np.int64)
+        if prices.dtype not in PRICE_DTYPES:
+            prices = prices.astype(np.float64)
+        if prices.ndim != 2 or (prices.shape[1] > 1 and prices.strides[1] != prices.itemsize):
+            # Column slices of a buffer are kept as views; rows just have to be contiguous
+            prices = np.ascontiguousarray(prices)
+        volume = np.ascontiguousarray(volume, dtype=np.int64)
+        if prices.shape != (len(OHLC_FIELDS), len(timestamps)) or volume.shape != timestamps.shape:
+            raise ValueError(f"Inconsistent OHLCV buffers for {symbol}: timestamps {timestamps.shape}, "
+                             f"prices {prices.shape}, volume {volume.shape}")
+        self.symbol = symbol
+        self.timestamps = timestamps
+        self.prices = prices
+        self.volume = volume
+        self.tz = tz
+
+    @classmethod
+    def from_frame(cls, symbol: str, df: pd.DataFrame, dtype=np.float64) -> 'OHLCVSeries':
+        """
+        Copy an OHLCV frame into compact buffers
+        """
+        index = pd.DatetimeIndex(df.index)
+        tz = str(index.tz) if index.tz is not None else None
+        timestamps = index.tz_convert('UTC').tz_localize(None).asi8 if tz else index.asi8
+        prices = np.empty((len(OHLC_FIELDS), len(df)), dtype=dtype)
+        for row, field in enumerate(OHLC_FIELDS):
+            prices[row] = df[field].to_numpy(dtype=dtype)
+        volume = df['Volume'].fillna(0).to_numpy(dtype=np.int64) if 'Volume' in df else np.zeros(len(df), np.int64)
+        return cls(symbol, timestamps, prices, volume, tz)
+
+    @classmethod
+    def from_records(cls, symbol: str, records: Iterable, dtype=np.float64) -> 'OHLCVSeries':
+        """
+        Build from StockData rows (or anything with the same attributes)
+        """
+        records = list(records)
+        n = len(records)
+        timestamps = np.fromiter((pd.Timestamp(r.date).value for r in records), dtype=np.int64, count=n)
+        prices = np.empty((len(OHLC_FIELDS), n), dtype=dtype)
+        for row, attr in enumerate(('open_price', 'high_price', 'low_price', 'close_price')):
+            prices[row] = np.fromiter((getattr(r, attr) for r in records), dtype=np.float64, count=n)
+        volume = np.fromiter((r.volume or 0 for r in records), dtype=np.float64, count=n).astype(np.int64)
+        return cls(symbol, timestamps, prices, volume)
+
+    def __len__(self) -> int:
+        return len(self.timestamps)
+
+    def __repr__(self) -> str:
+        return f"OHLCVSeries({self.symbol!r}, bars={len(self)}, dtype={self.dtype.name}, nbytes={self.nbytes})"
+
+    @property
+    def dtype(self) -> np.dtype:
+        return self.prices.dtype
+
+    @property
+    def open(self) -> np.ndarray:
+        return self.prices[0]
+
+    @property
+    def high(self) -> np.ndarray:
+        return self.prices[1]
+
+    @property
+    def low(self) -> np.ndarray:
+        return self.prices[2]
+
+    @property
+    def close(self) -> np.ndarray:
+        return self.prices[3]
+
+    def index(self) -> pd.DatetimeIndex:
+        """
+        Bar timestamps; a view of the buffer unless tz is set, in which
+        case converting to local time needs its own array
+        """
+        index = pd.DatetimeIndex(self.timestamps.view('M8[ns]'), copy=False, name='Date')
+        return index.tz_localize('UTC').tz_convert(self.tz) if self.tz else index
+
+    def series(self, field: str = 'Close') -> pd.Series:
+        """
+        One column as a Series over the price or volume buffer
+        """
+        values = self.volume if field == 'Volume' else self.prices[OHLC_FIELDS.index(field)]
+        return pd.Series(values, index=self.index(), name=field, copy=False)
+
+    def to_frame(self) -> pd.DataFrame:
+        """
+        OHLCV DataFrame whose columns are views of the buffers; copy it
+        before writing to it
+        """
+        index = self.index()
+        prices = pd.DataFrame(self.prices.T, index=index, columns=OHLC_FIELDS, copy=False)
+        volume = pd.Series(self.volume, index=index, name='Volume', copy=False)
+        return pd.concat([prices, volume], axis=1, copy=False)
+
+    def slice(self, start=None, end=None) -> 'OHLCVSeries':
+        """
+        Bars with start <= timestamp <= end, sharing this series' buffers
+        """
+        def position(value, side):
+            ts = pd.Timestamp(value)
+            if self.tz:
+                ts = ts.tz_localize(self.tz) if ts.tzinfo is None else ts
+                ts = ts.tz_convert('UTC').tz_localize(None)
+            elif ts.tzinfo is not None:
+                ts = ts.tz_localize(None)
+            return int(np.searchsorted(self.timestamps, ts.value, side=side))
+
+        lo = position(start, 'left') if start is not None else 0
+        hi = position(end, 'right') if end is not None else len(self)
+        return OHLCVSeries(self.symbol, self.timestamps[lo:hi], self.prices[:, lo:hi], self.volume[lo:hi], self.tz)
+
+    def astype(self, dtype) -> 'OHLCVSeries':
+        """
+        Same bars with prices in another float width
+        """
+        if np.dtype(dtype) == self.dtype:
+            return self
+        return OHLCVSeries(self.symbol, self.timestamps, self.prices.astype(dtype), self.volume, self.tz)
+
+    @property
+    def nbytes(self) -> int:
+        return self.timestamps.nbytes + self.prices.nbytes + self.volume.nbytes
+
+    def memory_report(self) -> Dict[str, float]:
+        """
+        Buffer sizes in bytes, compared with a float64 DataFrame of the same bars
+        """
+        frame_bytes = _frame_bytes(len(self))
+        return {
+            'bars': len(self),
+            'dtype': self.dtype.name,
+            'timestamps_bytes': self.timestamps.nbytes,
+            'prices_bytes': self.prices.nbytes,
+            'volume_bytes': self.volume.nbytes,
+            'total_bytes': self.nbytes,
+            'bytes_per_bar': self.nbytes / len(self) if len(self) else 0.0,
+            'frame_bytes': frame_bytes,
+            'saving': 1 - self.nbytes / frame_bytes if frame_bytes else 0.0,
+        }
+
+class OHLCVStore:
+    """
+    Resident OHLCVSeries for many symbols, e.g. a whole universe of daily
+    histories kept in memory for screening or backtests
+    """
+    def __init__(self, dtype=np.float32):
+        self.dtype = np.dtype(dtype)
+        self.series: Dict[str, OHLCVSeries] = {}
+
+    def __len__(self) -> int:
+        return len(self.series)
+
+    def __contains__(self, symbol: str) -> bool:
+        return symbol in self.series
+
+    def __getitem__(self, symbol: str) -> OHLCVSeries:
+        return self.series[symbol]
+
+    def add_frames(self, frames: Dict[str, pd.DataFrame]):
+        for symbol, df in frames.items():
+            if df is not None and not df.empty:
+                self.series[symbol] = OHLCVSeries.from_frame(symbol, df, self.dtype)
+
+    @traced()
+    def load_cached(self, symbols: Optional[List[str]] = None, batch_size: int = OHLCV_LOAD_BATCH) -> int:
+        """
+        Fill from the price cache in batches, so only one batch of
+        intermediate DataFrames is alive at a time; returns symbols loaded
+        """
+        if symbols is None:
+            frames = load_cached_prices()
+            self.add_frames(frames)
+            return len(frames)
+        loaded = 0
+        for start in range(0, len(symbols), batch_size):
+            with span('ohlcv.load_batch', symbols=len(symbols[start:start + batch_size])):
+                frames = load_cached_prices(symbols[start:start + batch_size])
+                self.add_frames(frames)
+            loaded += len(frames)
+        return loaded
+
+    def frames(self, symbols: Optional[List[str]] = None) -> Dict[str, pd.DataFrame]:
+        """
+        Zero-copy frames, e.g. for PricePanel.from_frames or the screener
+        """
+        symbols = list(self.series) if symbols is None else [s for s in symbols if s in self.series]
+        return {symbol: self.series[symbol].to_frame() for symbol in symbols}
+
+    @property
+    def nbytes(self) -> int:
+        return sum(series.nbytes for series in self.series.values())
+
+    def memory_report(self) -> Dict[str, float]:
+        """
+        Totals over all symbols, compared with float64 DataFrames
+        """
+        bars = sum(len(series) for series in self.series.values())
+        frame_bytes = _frame_bytes(bars)
+        return {
+            'symbols': len(self.series),
+            'bars': bars,
+            'dtype': self.dtype.name,
+            'total_bytes': self.nbytes,
+            'bytes_per_bar': self.nbytes / bars if bars else 0.0,
+            'frame_bytes': frame_bytes,
+            'saving': 1 - self.nbytes / frame_bytes if frame_bytes else 0.0,
+        }
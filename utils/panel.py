@@ -0,0 +1,202 @@
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import func
+
+from .database import get_session, StockData
+from .async_data import fetch_stock_data_many, fetch_stock_data_range_many
+from .stock_data import CACHE_TTL, RANGE_COVERAGE_TOLERANCE, load_cached_prices
+from .tracing import span, traced
+
+# Calendar days covered by each Period option
+PERIOD_DAYS = {
+    '1d': 1, '5d': 5, '1mo': 31, '3mo': 92, '6mo': 183, '1y': 366,
+    '2y': 731, '5y': 1827, '10y': 3653
+}
+
+def trading_dates(index: pd.Index) -> pd.DatetimeIndex:
+    """
+    Local trading date of each bar, so exchanges in different time zones
+    (e.g. .HK and US listings) share one calendar
+    """
+    index = pd.DatetimeIndex(index)
+    if index.tz is not None:
+        index = index.tz_localize(None)
+    return index.normalize()
+
+def period_start(period: str, end: pd.Timestamp) -> Optional[pd.Timestamp]:
+    if period == 'ytd':
+        return pd.Timestamp(year=end.year, month=1, day=1)
+    days = PERIOD_DAYS.get(period)
+    return end - pd.Timedelta(days=days) if days else None
+
+class PricePanel:
+    """
+    One field (e.g. Close) for many symbols on a shared date index.
+
+    values is a single C-contiguous float64 (dates x symbols) matrix after
+    the fill policy has been applied; mask marks cells that were actually
+    observed, so analytics can ignore filled values.
+    """
+    def __init__(self, values: np.ndarray, dates: pd.DatetimeIndex, symbols: List[str], mask: np.ndarray):
+        self.values = np.ascontiguousarray(values, dtype=np.float64)
+        self.dates = dates
+        self.symbols = list(symbols)
+        self.mask = mask
+        self._columns = {symbol: i for i, symbol in enumerate(self.symbols)}
+
+    @classmethod
+    @traced()
+    def from_frames(cls, frames: Dict[str, pd.DataFrame], field: str = 'Close',
+                    calendar: str = 'union', fill: Optional[str] = 'ffill',
+                    fill_limit: Optional[int] = None) -> 'PricePanel':
+        """
+        Align per-symbol frames (or series) in one pass.
+
+        calendar: 'union' keeps every date any symbol traded, 'intersection'
+        only dates all symbols traded. fill: 'ffill' carries the last
+        observation forward (at most fill_limit rows), None leaves NaN.
+        """
+        series = {}
+        for symbol, data in frames.items():
+            if data is None or len(data) == 0:
+                continue
+            column = data[field] if isinstance(data, pd.DataFrame) else data
+            values = column.to_numpy(dtype=np.float64)
+            dates = trading_dates(column.index)
+            keep = ~dates.duplicated(keep='last')
+            series[symbol] = (dates[keep], values[keep])
+
+        symbols = list(series)
+        if not symbols:
+            return cls(np.empty((0, 0)), pd.DatetimeIndex([]), [], np.empty((0, 0), dtype=bool))
+
+        all_dates = [dates for dates, _ in series.values()]
+        if calendar == 'intersection':
+            index = all_dates[0]
+            for dates in all_dates[1:]:
+                index = index.intersection(dates)
+        else:
+            index = pd.DatetimeIndex(np.unique(np.concatenate([d.to_numpy() for d in all_dates])))
+        index = index.sort_values()
+
+        matrix = np.full((len(index), len(symbols)), np.nan)
+        for j, symbol in enumerate(symbols):
+            dates, values = series[symbol]
+            positions = index.get_indexer(dates)
+            present = positions >= 0
+            matrix[positions[present], j] = values[present]
+        mask = ~np.isnan(matrix)
+
+        if fill == 'ffill':
+            matrix = pd.DataFrame(matrix).ffill(limit=fill_limit).to_numpy()
+
+        return cls(matrix, index, symbols, mask)
+
+    def __len__(self) -> int:
+        return len(self.dates)
+
+    def __contains__(self, symbol: str) -> bool:
+        return symbol in self._columns
+
+    def column(self, symbol: str) -> np.ndarray:
+        """
+        View of one symbol's values (no copy)
+        """
+        return self.values[:, self._columns[symbol]]
+
+    def subset(self, symbols: List[str]) -> 'PricePanel':
+        idx = [self._columns[s] for s in symbols]
+        return PricePanel(self.values[:, idx], self.dates, symbols, self.mask[:, idx])
+
+    def to_frame(self) -> pd.DataFrame:
+        return pd.DataFrame(self.values, index=self.dates, columns=self.symbols, copy=False)
+
+    def first_valid(self) -> np.ndarray:
+        """
+        First observed value per symbol
+        """
+        first = self.mask.argmax(axis=0)
+        return self.values[first, np.arange(len(self.symbols))]
+
+    def normalized_returns(self) -> pd.DataFrame:
+        """
+        Percent change since each symbol's first observation
+        """
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return pd.DataFrame((self.values / self.first_valid() - 1) * 100,
+                                index=self.dates, columns=self.symbols)
+
+    def returns(self) -> pd.DataFrame:
+        """
+        Simple returns between consecutive observations, NaN on dates a
+        symbol did not trade (filled values never create returns)
+        """
+        observed = pd.DataFrame(np.where(self.mask, self.values, np.nan), index=self.dates, columns=self.symbols)
+        previous = observed.ffill().shift(1)
+        return (observed / previous - 1).where(self.mask)
+
+    def versions(self) -> Dict[str, str]:
+        """
+        Per-symbol data version: last observed date and observation count
+        """
+        last = len(self.dates) - 1 - self.mask[::-1].argmax(axis=0)
+        counts = self.mask.sum(axis=0)
+        return {symbol: f"{self.dates[last[j]].isoformat()}/{counts[j]}" for j, symbol in enumerate(self.symbols)}
+
+    @property
+    def nbytes(self) -> int:
+        return self.values.nbytes + self.mask.nbytes
+
+@traced()
+def build_price_panel(symbols: List[str], period: str, field: str = 'Close',
+                      calendar: str = 'union', fill: Optional[str] = 'ffill') -> PricePanel:
+    """
+    Build a panel for symbols from the price cache in one read, fetching
+    only symbols whose cached rows are missing, stale or shorter than the period
+    """
+    symbols = list(dict.fromkeys(symbols))
+    session = get_session()
+    try:
+        with span('sqlite.freshness'):
+            cached_rows = session.query(StockData.symbol, func.max(StockData.created_at),
+                                        func.min(StockData.date), func.max(StockData.date))\
+                .filter(StockData.symbol.in_(symbols))\
+                .group_by(StockData.symbol)\
+                .all()
+    finally:
+        session.close()
+    now = datetime.utcnow()
+    fresh = set()
+    for symbol, created, first, last in cached_rows:
+        if not created or now - created >= CACHE_TTL:
+            continue
+        # Rows cached for a shorter period do not cover this one
+        start = period_start(period, pd.Timestamp(last))
+        if start is None or first <= start + RANGE_COVERAGE_TOLERANCE:
+            fresh.add(symbol)
+
+    frames = load_cached_prices([s for s in symbols if s in fresh]) if fresh else {}
+    missing = [symbol for symbol in symbols if symbol not in frames]
+    if missing:
+        start = period_start(period, pd.Timestamp(now).normalize())
+        if start is None:
+            fetched, _ = fetch_stock_data_many(missing, period)
+        else:
+            # get_stock_data would serve a shorter cached history as-is
+            fetched, _ = fetch_stock_data_range_many(missing, start, pd.Timestamp(now).normalize() + pd.Timedelta(days=1))
+        frames.update(fetched)
+
+    # The cache can hold more history than asked for
+    ordered = {}
+    for symbol in symbols:
+        df = frames.get(symbol)
+        if df is None or df.empty:
+            continue
+        start = period_start(period, trading_dates(df.index)[-1])
+        if start is not None:
+            df = df[trading_dates(df.index) >= start]
+        ordered[symbol] = df
+    return PricePanel.from_frames(ordered, field=field, calendar=calendar, fill=fill)
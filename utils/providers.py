@@ -0,0 +1,193 @@
+from abc import ABC, abstractmethod
+import gzip
+import hashlib
+import json
+import os
+import pickle
+import random
+import threading
+import time
+from typing import Any, Dict, Optional
+
+import pandas as pd
+
+from .fetch import get_gateway
+
+# live (default), record or replay
+DATA_MODE_ENV = 'STOCKSENTRY_DATA_MODE'
+FIXTURE_DIR_ENV = 'STOCKSENTRY_FIXTURE_DIR'
+REPLAY_LATENCY_ENV = 'STOCKSENTRY_REPLAY_LATENCY_MS'
+DEFAULT_FIXTURE_DIR = 'fixtures/market_data'
+
+class DataProvider(ABC):
+    """
+    Source of market data used by the utils modules
+    """
+    @abstractmethod
+    def history(self, symbol: str, **kwargs) -> pd.DataFrame:
+        pass
+
+    @abstractmethod
+    def info(self, symbol: str) -> dict:
+        pass
+
+    @abstractmethod
+    def download(self, tickers, **kwargs) -> pd.DataFrame:
+        pass
+
+    @abstractmethod
+    def sustainability(self, symbol: str) -> Optional[pd.DataFrame]:
+        pass
+
+class YahooProvider(DataProvider):
+    """
+    Live Yahoo Finance data through the shared FetchGateway
+    """
+    def history(self, symbol: str, **kwargs) -> pd.DataFrame:
+        return get_gateway().history(symbol, **kwargs)
+
+    def info(self, symbol: str) -> dict:
+        return get_gateway().info(symbol)
+
+    def download(self, tickers, **kwargs) -> pd.DataFrame:
+        return get_gateway().download(tickers, **kwargs)
+
+    def sustainability(self, symbol: str) -> Optional[pd.DataFrame]:
+        return get_gateway().sustainability(symbol)
+
+def fixture_key(method: str, *args, **kwargs) -> str:
+    """
+    Stable file name for a provider call
+    """
+    payload = json.dumps([method, [str(a) for a in args], sorted((k, str(v)) for k, v in kwargs.items())])
+    return hashlib.sha1(payload.encode()).hexdigest()
+
+class _FixtureStore:
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._lock = threading.Lock()
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.directory, f'{key}.pkl.gz')
+
+    def write(self, key: str, call: Dict[str, Any], value: Any):
+        os.makedirs(self.directory, exist_ok=True)
+        tmp_path = self.path(key) + '.tmp'
+        with gzip.open(tmp_path, 'wb') as f:
+            pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, self.path(key))
+
+        # Human-readable index of what each fixture holds
+        with self._lock:
+            manifest_path = os.path.join(self.directory, 'manifest.json')
+            manifest = {}
+            if os.path.exists(manifest_path):
+                with open(manifest_path) as f:
+                    manifest = json.load(f)
+            manifest[key] = call
+            with open(manifest_path, 'w') as f:
+                json.dump(manifest, f, indent=2, sort_keys=True)
+
+    def read(self, key: str) -> Any:
+        with gzip.open(self.path(key), 'rb') as f:
+            return pickle.load(f)
+
+    def exists(self, key: str) -> bool:
+        return os.path.exists(self.path(key))
+
+class RecordingProvider(DataProvider):
+    """
+    Pass calls through to another provider and save every response as a
+    compressed fixture
+    """
+    def __init__(self, inner: Optional[DataProvider] = None, directory: str = DEFAULT_FIXTURE_DIR):
+        self.inner = inner or YahooProvider()
+        self.store = _FixtureStore(directory)
+
+    def _record(self, method: str, *args, **kwargs):
+        value = getattr(self.inner, method)(*args, **kwargs)
+        call = {'method': method, 'args': [str(a) for a in args],
+                'kwargs': {k: str(v) for k, v in kwargs.items()}}
+        self.store.write(fixture_key(method, *args, **kwargs), call, value)
+        return value
+
+    def history(self, symbol: str, **kwargs) -> pd.DataFrame:
+        return self._record('history', symbol, **kwargs)
+
+    def info(self, symbol: str) -> dict:
+        return self._record('info', symbol)
+
+    def download(self, tickers, **kwargs) -> pd.DataFrame:
+        return self._record('download', tickers, **kwargs)
+
+    def sustainability(self, symbol: str) -> Optional[pd.DataFrame]:
+        return self._record('sustainability', symbol)
+
+class ReplayProvider(DataProvider):
+    """
+    Serve recorded fixtures deterministically, optionally with synthetic
+    network latency (latency_ms +/- jitter_ms, seeded)
+    """
+    def __init__(self, directory: str = DEFAULT_FIXTURE_DIR, latency_ms: float = 0.0,
+                 jitter_ms: float = 0.0, seed: int = 0):
+        self.store = _FixtureStore(directory)
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self._rng = random.Random(seed)
+        self._rng_lock = threading.Lock()
+
+    def _sleep(self):
+        if self.latency_ms <= 0 and self.jitter_ms <= 0:
+            return
+        with self._rng_lock:
+            delay = self.latency_ms + self._rng.uniform(-self.jitter_ms, self.jitter_ms)
+        time.sleep(max(0.0, delay) / 1000)
+
+    def _replay(self, method: str, *args, **kwargs):
+        key = fixture_key(method, *args, **kwargs)
+        if not self.store.exists(key):
+            raise Exception(f"No recorded response for {method}{args} {kwargs}")
+        self._sleep()
+        value = self.store.read(key)
+        # Hand out copies so callers mutating frames don't affect later replays
+        return value.copy() if isinstance(value, (pd.DataFrame, dict)) else value
+
+    def history(self, symbol: str, **kwargs) -> pd.DataFrame:
+        return self._replay('history', symbol, **kwargs)
+
+    def info(self, symbol: str) -> dict:
+        return self._replay('info', symbol)
+
+    def download(self, tickers, **kwargs) -> pd.DataFrame:
+        return self._replay('download', tickers, **kwargs)
+
+    def sustainability(self, symbol: str) -> Optional[pd.DataFrame]:
+        return self._replay('sustainability', symbol)
+
+_provider = None
+_provider_lock = threading.Lock()
+
+def _provider_from_env() -> DataProvider:
+    mode = os.environ.get(DATA_MODE_ENV, 'live').lower()
+    directory = os.environ.get(FIXTURE_DIR_ENV, DEFAULT_FIXTURE_DIR)
+    if mode == 'record':
+        return RecordingProvider(directory=directory)
+    if mode == 'replay':
+        return ReplayProvider(directory=directory,
+                              latency_ms=float(os.environ.get(REPLAY_LATENCY_ENV, 0)))
+    return YahooProvider()
+
+def get_provider() -> DataProvider:
+    """
+    Process-wide data provider, chosen by STOCKSENTRY_DATA_MODE on first use
+    """
+    global _provider
+    with _provider_lock:
+        if _provider is None:
+            _provider = _provider_from_env()
+        return _provider
+
+def set_provider(provider: DataProvider):
+    global _provider
+    with _provider_lock:
+        _provider = provider
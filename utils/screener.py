@@ -0,0 +1,319 @@
+import operator
+import re
+import threading
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .analysis import RiskAnalyzer
+from .async_data import fetch_company_info_many
+from .shared_cache import get_shared_cache
+from .stock_data import get_data_version, load_cached_prices
+from .technical_analysis import indicator_state_frame
+from .tracing import count, span, traced
+from .visualizations import build_fundamentals_table, calculate_composite_scores_batch
+
+# Fundamentals shown in main.py that can be screened on
+SCREENER_INFO_FIELDS = [
+    'currentPrice', 'marketCap', 'enterpriseValue', 'volume', 'beta',
+    'trailingPE', 'forwardPE', 'pegRatio', 'priceToBook',
+    'enterpriseToEbitda', 'enterpriseToRevenue',
+    'revenueGrowth', 'earningsGrowth', 'profitMargins', 'operatingMargins', 'grossMargins',
+    'returnOnEquity', 'returnOnAssets', 'dividendRate', 'dividendYield',
+    'currentRatio', 'quickRatio', 'debtToEquity', 'totalCash', 'totalDebt', 'totalRevenue',
+    'trailingEps', 'forwardEps', 'bookValue', 'fiftyTwoWeekLow', 'fiftyTwoWeekHigh'
+]
+SCREENER_TEXT_FIELDS = ['longName', 'sector', 'industry']
+
+SCREENER_ROW_CACHE_TTL = 3600.0
+# Symbols whose company info failed to load are retried after this long
+SCREENER_INFO_RETRY = timedelta(minutes=15)
+
+SCORE_COLUMNS = {
+    'Valuation': 'score_valuation',
+    'Growth': 'score_growth',
+    'Profitability': 'score_profitability',
+    'Financial Health': 'score_financial_health'
+}
+
+# Filters are clauses "column op value" joined by and/or (and binds tighter);
+# values are numbers or quoted strings. Nothing else is evaluated.
+_FILTER_TOKEN = re.compile(r"""\s*(?:(?P<number>[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?)(?![\w.])"""
+                           r"""|(?P<string>'[^'\\]*'|"[^"\\]*")"""
+                           r"""|(?P<op><=|>=|==|!=|<|>)"""
+                           r"""|(?P<name>[A-Za-z_][A-Za-z0-9_]*))""")
+_FILTER_OPS = {
+    '<': operator.lt, '<=': operator.le, '>': operator.gt,
+    '>=': operator.ge, '==': operator.eq, '!=': operator.ne
+}
+
+class ScreenFilterError(ValueError):
+    """A screener filter that is not a list of whitelisted clauses"""
+
+def _tokenize_filter(expr: str) -> List[Tuple[str, str]]:
+    tokens, pos = [], 0
+    expr = expr.rstrip()
+    while pos < len(expr):
+        match = _FILTER_TOKEN.match(expr, pos)
+        if match is None or match.end() == pos:
+            raise ScreenFilterError(f"Unexpected text in filter at: {expr[pos:].strip()[:20]!r}")
+        kind = match.lastgroup
+        tokens.append((kind, match.group(kind)))
+        pos = match.end()
+    return tokens
+
+def filter_mask(table: pd.DataFrame, expr: str) -> pd.Series:
+    """
+    Boolean row mask for a filter such as
+    "trailingPE < 20 and rsi < 30 and ichimoku_cloud == 'above'".
+    Raises ScreenFilterError for anything that is not a whitelisted clause.
+    """
+    tokens = _tokenize_filter(expr)
+    if not tokens:
+        raise ScreenFilterError('Empty filter')
+    any_of, all_of = [], None
+    i = 0
+    while True:
+        if i + 3 > len(tokens):
+            raise ScreenFilterError('Each clause must look like: column < value')
+        (kind, column), (op_kind, op), (value_kind, value) = tokens[i:i + 3]
+        if kind != 'name' or column in ('and', 'or'):
+            raise ScreenFilterError(f"Expected a column name, got {column!r}")
+        if column not in table.columns:
+            raise ScreenFilterError(f"Unknown column {column!r}")
+        if op_kind != 'op':
+            raise ScreenFilterError(f"Expected a comparison after {column!r}, got {op!r}")
+        if value_kind == 'number':
+            values = pd.to_numeric(table[column], errors='coerce')
+            clause = _FILTER_OPS[op](values, float(value))
+        elif value_kind == 'string':
+            if op not in ('==', '!='):
+                raise ScreenFilterError(f"Text values only support == and !=, got {op!r}")
+            clause = _FILTER_OPS[op](table[column].astype(object), value[1:-1])
+        else:
+            raise ScreenFilterError(f"Expected a number or quoted text after {column} {op}, got {value!r}")
+        clause = clause.fillna(False).astype(bool)
+        all_of = clause if all_of is None else all_of & clause
+        i += 3
+        if i == len(tokens):
+            any_of.append(all_of)
+            break
+        kind, joiner = tokens[i]
+        if kind != 'name' or joiner not in ('and', 'or'):
+            raise ScreenFilterError(f"Expected 'and' or 'or', got {joiner!r}")
+        if joiner == 'or':
+            any_of.append(all_of)
+            all_of = None
+        i += 1
+    mask = any_of[0]
+    for clause in any_of[1:]:
+        mask = mask | clause
+    return mask
+
+class Screener:
+    """
+    Columnar table with one row of latest metrics per ticker (fundamentals,
+    composite scores, indicator state and risk metrics). Rows are only
+    recomputed when a ticker's data version changes.
+
+    Filters are "column op value" clauses over the column names joined by
+    and/or, e.g. "trailingPE < 20 and rsi < 30 and ichimoku_cloud == 'above'".
+
+    Company info missing for new symbols is bulk-loaded with info_loader
+    in a background thread (or inline when background is False); rows are
+    updated once it arrives, and failed symbols are retried later.
+    """
+    def __init__(self, info_loader: Optional[Callable[[List[str]], Tuple[Dict[str, dict], Dict[str, str]]]]
+                 = fetch_company_info_many, background: bool = True):
+        self.info_loader = info_loader
+        self.background = background
+        self.table = pd.DataFrame()
+        self._versions: Dict[str, str] = {}
+        self._infos: Dict[str, dict] = {}
+        self._info_failures: Dict[str, datetime] = {}
+        self._info_thread: Optional[threading.Thread] = None
+        self._lock = threading.RLock()
+        self._risk = RiskAnalyzer()
+        self._last_refresh: Optional[datetime] = None
+
+    def _price_rows(self, frames: Dict[str, pd.DataFrame]) -> pd.DataFrame:
+        """
+        Price-derived columns for many symbols. Rows another process already
+        computed for the same data version come from the shared cache; the
+        rest are computed column-wise on tail-aligned bars x symbols matrices.
+        """
+        cache = get_shared_cache()
+        keys = {symbol: f'{symbol}:{get_data_version(df)}' for symbol, df in frames.items()}
+        cached = {symbol: cache.get('screener_rows', key) for symbol, key in keys.items()}
+        cached = {symbol: row for symbol, row in cached.items() if row is not None}
+        count('screener_rows.shared_hit', len(cached))
+        missing = {symbol: df for symbol, df in frames.items() if symbol not in cached}
+        rows = self._compute_price_rows(missing) if missing else pd.DataFrame()
+        for symbol, row in rows.iterrows():
+            cache.set('screener_rows', keys[symbol], row, ttl=SCREENER_ROW_CACHE_TTL)
+        if cached:
+            rows = pd.concat([rows, pd.DataFrame.from_dict(cached, orient='index')]) if len(rows) else \
+                pd.DataFrame.from_dict(cached, orient='index')
+        return rows.reindex(list(frames)).infer_objects()
+
+    def _compute_price_rows(self, frames: Dict[str, pd.DataFrame]) -> pd.DataFrame:
+        symbols = list(frames)
+        length = max(len(df) for df in frames.values())
+        matrices = {name: np.full((length, len(symbols)), np.nan) for name in ('Close', 'High', 'Low')}
+        for j, symbol in enumerate(symbols):
+            df = frames[symbol]
+            for name, matrix in matrices.items():
+                matrix[length - len(df):, j] = df[name].to_numpy(dtype=np.float64)
+        close, high, low = (pd.DataFrame(matrices[name], columns=symbols) for name in ('Close', 'High', 'Low'))
+
+        first_close = close.bfill().iloc[0]
+        rows = pd.DataFrame({
+            'last_close': close.iloc[-1],
+            'last_bar': pd.Series({symbol: df.index[-1] for symbol, df in frames.items()}),
+            'bars': pd.Series({symbol: len(df) for symbol, df in frames.items()}),
+            'change_1d': (close.iloc[-1] / close.iloc[-2] - 1) * 100,
+            'change_period': (close.iloc[-1] / first_close - 1) * 100,
+        })
+        return rows.join(indicator_state_frame(close, high, low))\
+            .join(self._risk.calculate_risk_metrics_frame(close))
+
+    @property
+    def pending_infos(self) -> bool:
+        """
+        True while company info is being loaded in the background
+        """
+        return self._info_thread is not None and self._info_thread.is_alive()
+
+    def _load_infos(self, symbols: List[str]):
+        try:
+            infos, errors = self.info_loader(symbols)
+        except Exception as e:
+            infos, errors = {}, {symbol: str(e) for symbol in symbols}
+        now = datetime.utcnow()
+        with self._lock:
+            for symbol in symbols:
+                if symbol in errors or not infos.get(symbol):
+                    self._info_failures[symbol] = now
+                    infos.pop(symbol, None)
+            if infos:
+                self.update({}, infos)
+
+    def _request_infos(self):
+        """
+        Load info for rows that have none, skipping recent failures
+        """
+        with self._lock:
+            if self.info_loader is None or self.pending_infos:
+                return
+            cutoff = datetime.utcnow() - SCREENER_INFO_RETRY
+            symbols = [symbol for symbol in self._versions
+                       if symbol not in self._infos and self._info_failures.get(symbol, cutoff) <= cutoff]
+            if not symbols:
+                return
+            if not self.background:
+                self._load_infos(symbols)
+                return
+            self._info_thread = threading.Thread(target=self._load_infos, args=(symbols,),
+                                                 name='screener-info', daemon=True)
+            self._info_thread.start()
+
+    @traced()
+    def update(self, prices: Dict[str, pd.DataFrame], infos: Optional[Dict[str, dict]] = None) -> int:
+        """
+        Recompute rows for symbols whose price data or info changed; returns
+        the number of rows rewritten
+        """
+        with self._lock:
+            rewritten = self._update(prices, infos or {})
+        self._request_infos()
+        return rewritten
+
+    def _update(self, prices: Dict[str, pd.DataFrame], infos: Dict[str, dict]) -> int:
+        changed = {}
+        for symbol, df in prices.items():
+            if df is None or len(df) < 2:
+                continue
+            version = get_data_version(df)
+            if self._versions.get(symbol) == version and symbol not in infos:
+                continue
+            changed[symbol] = (df, version)
+        for symbol in infos:
+            if symbol in self._versions and symbol not in changed:
+                changed[symbol] = (None, self._versions[symbol])
+
+        if not changed:
+            return 0
+
+        with span('screener.fundamentals', symbols=len(changed)):
+            for symbol in changed:
+                if symbol in infos:
+                    self._infos[symbol] = infos[symbol]
+                    self._info_failures.pop(symbol, None)
+            changed_infos = {symbol: self._infos.get(symbol, {}) for symbol in changed}
+            fundamentals = build_fundamentals_table(changed_infos)
+            scores = calculate_composite_scores_batch(fundamentals).rename(columns=SCORE_COLUMNS)
+            scores['score_composite'] = scores[list(SCORE_COLUMNS.values())].mean(axis=1)
+
+            info_table = pd.DataFrame.from_dict(
+                {symbol: {field: info.get(field) for field in SCREENER_INFO_FIELDS + SCREENER_TEXT_FIELDS}
+                 for symbol, info in changed_infos.items()},
+                orient='index', columns=SCREENER_INFO_FIELDS + SCREENER_TEXT_FIELDS
+            )
+            info_table[SCREENER_INFO_FIELDS] = info_table[SCREENER_INFO_FIELDS]\
+                .apply(pd.to_numeric, errors='coerce').astype(np.float64)
+
+        with span('screener.prices', symbols=len(changed)):
+            fresh = {symbol: df for symbol, (df, _) in changed.items() if df is not None}
+            price_table = self._price_rows(fresh) if fresh else pd.DataFrame()
+            # Info-only changes keep their existing price columns
+            kept = [symbol for symbol, (df, _) in changed.items() if df is None]
+            if kept:
+                price_table = pd.concat([price_table, self.table.loc[kept, [c for c in self.table.columns
+                                                                              if c not in info_table.columns
+                                                                              and c not in scores.columns]]])
+
+        rows = pd.concat([info_table, scores, price_table], axis=1)
+        rows.index.name = 'symbol'
+        if self.table.empty:
+            self.table = rows
+        else:
+            self.table = pd.concat([self.table.drop(index=rows.index, errors='ignore'), rows])
+        for symbol, (_, version) in changed.items():
+            self._versions[symbol] = version
+        return len(rows)
+
+    def refresh_from_store(self, symbols: Optional[List[str]] = None) -> int:
+        """
+        Pull bars from the local price cache; after the first call only
+        symbols that received new rows are read
+        """
+        started = datetime.utcnow()
+        prices = load_cached_prices(symbols, updated_since=self._last_refresh)
+        self._last_refresh = started
+        return self.update(prices)
+
+    @traced()
+    def screen(self, expr: Optional[str] = None, sort_by: Optional[str] = None,
+               ascending: bool = False, limit: Optional[int] = None,
+               columns: Optional[List[str]] = None) -> pd.DataFrame:
+        """
+        Filter (see filter_mask), then sort and trim; raises
+        ScreenFilterError for an invalid filter
+        """
+        result = self.table
+        if result.empty:
+            return result
+        if expr:
+            result = result[filter_mask(result, expr)]
+        if sort_by:
+            result = result.sort_values(sort_by, ascending=ascending, na_position='last')
+        if limit:
+            result = result.head(limit)
+        if columns:
+            result = result[columns]
+        return result
+
+    def __len__(self) -> int:
+        return len(self.table)
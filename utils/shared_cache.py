@@ -0,0 +1,527 @@
+from abc import ABC, abstractmethod
+import hashlib
+import os
+import pickle
+import socket
+import sqlite3
+import stat
+import struct
+import tempfile
+import threading
+import time
+import uuid
+import zlib
+from typing import Any, Callable, Dict, Optional
+from urllib.parse import urlsplit
+
+from .tracing import count, span
+
+# memory:// (default, this process only), shm:///dev/shm/stocksentry,
+# sqlite:////path/to/cache.db or redis://host:port/db
+SHARED_CACHE_URL_ENV = 'STOCKSENTRY_CACHE_URL'
+DEFAULT_SHARED_CACHE_URL = 'memory://'
+
+SHARED_CACHE_TTL = 900.0  # seconds
+SHARED_CACHE_LOCK_TTL = 60.0  # a computing process holds the key at most this long
+SHARED_CACHE_WAIT = 30.0  # how long other processes wait for it before computing themselves
+SHARED_CACHE_COMPRESS_BYTES = 16 * 1024
+SHM_PURGE_EVERY = 256
+MEMORY_CACHE_MAX_ENTRIES = 1024
+
+_RAW, _ZLIB = b'\x00', b'\x01'
+
+def encode_value(value: Any) -> bytes:
+    """
+    Pickle a value, compressing large payloads. Only point several
+    processes at a cache they all trust: values are unpickled on read.
+    """
+    payload = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+    if len(payload) >= SHARED_CACHE_COMPRESS_BYTES:
+        return _ZLIB + zlib.compress(payload, 1)
+    return _RAW + payload
+
+def decode_value(data: bytes) -> Any:
+    """
+    Inverse of encode_value; raises ValueError for a truncated or corrupt entry
+    """
+    kind, payload = data[:1], data[1:]
+    if kind not in (_RAW, _ZLIB):
+        raise ValueError(f"Unknown shared cache entry type: {kind!r}")
+    try:
+        if kind == _ZLIB:
+            payload = zlib.decompress(payload)
+        return pickle.loads(payload)
+    except Exception as e:
+        raise ValueError(f"Failed to decode shared cache entry: {str(e)}") from e
+
+class CacheBackend(ABC):
+    """
+    Byte store with expiry plus an expiring lease per key. get() must not
+    take locks shared with writers; acquire() must be atomic across every
+    process using the backend.
+    """
+    @abstractmethod
+    def get(self, key: str) -> Optional[bytes]:
+        pass
+
+    @abstractmethod
+    def set(self, key: str, value: bytes, ttl: float):
+        pass
+
+    @abstractmethod
+    def delete(self, key: str):
+        pass
+
+    @abstractmethod
+    def acquire(self, key: str, token: str, ttl: float) -> bool:
+        """
+        Take the lease on key unless another live holder has it
+        """
+
+    @abstractmethod
+    def release(self, key: str, token: str):
+        pass
+
+class MemoryBackend(CacheBackend):
+    """
+    In-process dict; reads are plain dict lookups. Past max_entries,
+    expired entries and then the oldest ones are dropped.
+    """
+    def __init__(self, max_entries: int = MEMORY_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries: Dict[str, tuple] = {}
+        self._leases: Dict[str, tuple] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[bytes]:
+        entry = self._entries.get(key)
+        if entry is None or entry[1] < time.time():
+            return None
+        return entry[0]
+
+    def set(self, key: str, value: bytes, ttl: float):
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = (value, time.time() + ttl)
+            if len(self._entries) > self.max_entries:
+                now = time.time()
+                for stale in [k for k, (_, expires) in self._entries.items() if expires < now]:
+                    del self._entries[stale]
+                while len(self._entries) > self.max_entries:
+                    del self._entries[next(iter(self._entries))]
+
+    def delete(self, key: str):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def acquire(self, key: str, token: str, ttl: float) -> bool:
+        now = time.time()
+        with self._lock:
+            lease = self._leases.get(key)
+            if lease is not None and lease[1] >= now:
+                return False
+            self._leases[key] = (token, now + ttl)
+            return True
+
+    def release(self, key: str, token: str):
+        with self._lock:
+            if self._leases.get(key, (None,))[0] == token:
+                del self._leases[key]
+
+class ShmFileBackend(CacheBackend):
+    """
+    One file per key in a shared-memory directory (/dev/shm when present).
+    Writers publish with an atomic rename, so readers just read the file;
+    leases are published with link(), which fails if one exists.
+    """
+    _HEADER = struct.Struct('>d')
+
+    def __init__(self, directory: Optional[str] = None):
+        if not directory:
+            base = '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir()
+            directory = os.path.join(base, 'stocksentry-cache')
+        self.directory = directory
+        # Entries are unpickled on read, so nobody else may write here
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+        self._check_directory()
+        self._sets = 0
+
+    def _check_directory(self):
+        st = os.lstat(self.directory)
+        if not stat.S_ISDIR(st.st_mode):
+            raise PermissionError(f"Shared cache path is not a directory: {self.directory}")
+        if hasattr(os, 'getuid'):
+            if st.st_uid != os.getuid():
+                raise PermissionError(f"Shared cache directory {self.directory} is owned by another user")
+            if st.st_mode & 0o077:
+                os.chmod(self.directory, 0o700)
+
+    def _path(self, key: str, suffix: str = '') -> str:
+        return os.path.join(self.directory, hashlib.sha1(key.encode()).hexdigest() + suffix)
+
+    def _write(self, path: str, data: bytes):
+        tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def get(self, key: str) -> Optional[bytes]:
+        try:
+            with open(self._path(key), 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            return None
+        if len(data) < self._HEADER.size or self._HEADER.unpack_from(data)[0] < time.time():
+            return None
+        return data[self._HEADER.size:]
+
+    def set(self, key: str, value: bytes, ttl: float):
+        self._write(self._path(key), self._HEADER.pack(time.time() + ttl) + value)
+        self._sets += 1
+        if self._sets % SHM_PURGE_EVERY == 0:
+            self.purge()
+
+    def delete(self, key: str):
+        try:
+            os.unlink(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def _read_lease(self, path: str) -> Optional[tuple]:
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            return None
+        if len(data) < self._HEADER.size:
+            return ('', 0.0)
+        return data[self._HEADER.size:].decode(), self._HEADER.unpack_from(data)[0]
+
+    def acquire(self, key: str, token: str, ttl: float) -> bool:
+        path = self._path(key, '.lease')
+        data = self._HEADER.pack(time.time() + ttl) + token.encode()
+        tmp_path = f'{path}.{token}.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        try:
+            # link() fails if the lease exists, and never exposes a half-written one
+            os.link(tmp_path, path)
+            return True
+        except FileExistsError:
+            lease = self._read_lease(path)
+            if lease is not None and lease[1] >= time.time():
+                return False
+            # Expired holder: take over, then check that our token won the race
+            os.replace(tmp_path, path)
+            return (self._read_lease(path) or ('',))[0] == token
+        finally:
+            try:
+                os.unlink(tmp_path)
+            except FileNotFoundError:
+                pass
+
+    def release(self, key: str, token: str):
+        path = self._path(key, '.lease')
+        if (self._read_lease(path) or ('',))[0] == token:
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+
+    def purge(self):
+        """
+        Remove expired entries and leftover temporary files
+        """
+        now = time.time()
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            try:
+                if name.endswith('.tmp'):
+                    if now - os.path.getmtime(path) > SHARED_CACHE_LOCK_TTL:
+                        os.unlink(path)
+                    continue
+                with open(path, 'rb') as f:
+                    header = f.read(self._HEADER.size)
+                if len(header) == self._HEADER.size and self._HEADER.unpack(header)[0] < now:
+                    os.unlink(path)
+            except OSError:
+                continue
+
+class SQLiteBackend(CacheBackend):
+    """
+    Entries and leases in a WAL-mode SQLite file, separate from the price
+    database; WAL readers never wait for writers
+    """
+    def __init__(self, path: str):
+        self.path = path
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._local = threading.local()
+        conn = self._conn()
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, value BLOB NOT NULL, expires_at REAL NOT NULL)')
+        conn.execute('CREATE TABLE IF NOT EXISTS leases (key TEXT PRIMARY KEY, token TEXT NOT NULL, expires_at REAL NOT NULL)')
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            # Autocommit; each statement is its own transaction
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str) -> Optional[bytes]:
+        row = self._conn().execute('SELECT value FROM entries WHERE key = ? AND expires_at >= ?',
+                                   (key, time.time())).fetchone()
+        return row[0] if row else None
+
+    def set(self, key: str, value: bytes, ttl: float):
+        self._conn().execute('INSERT OR REPLACE INTO entries (key, value, expires_at) VALUES (?, ?, ?)',
+                             (key, sqlite3.Binary(value), time.time() + ttl))
+
+    def delete(self, key: str):
+        self._conn().execute('DELETE FROM entries WHERE key = ?', (key,))
+
+    def acquire(self, key: str, token: str, ttl: float) -> bool:
+        now = time.time()
+        cursor = self._conn().execute(
+            'INSERT INTO leases (key, token, expires_at) VALUES (?, ?, ?) '
+            'ON CONFLICT(key) DO UPDATE SET token = excluded.token, expires_at = excluded.expires_at '
+            'WHERE leases.expires_at < ?',
+            (key, token, now + ttl, now))
+        return cursor.rowcount == 1
+
+    def release(self, key: str, token: str):
+        self._conn().execute('DELETE FROM leases WHERE key = ? AND token = ?', (key, token))
+
+    def purge(self):
+        now = time.time()
+        conn = self._conn()
+        conn.execute('DELETE FROM entries WHERE expires_at < ?', (now,))
+        conn.execute('DELETE FROM leases WHERE expires_at < ?', (now,))
+
+class RespError(Exception):
+    pass
+
+class RespBackend(CacheBackend):
+    """
+    Redis-protocol (RESP2) client using only GET, SET ... PX [NX] and DEL,
+    so Redis or a small stand-in can serve it. One connection per thread.
+    """
+    def __init__(self, host: str = '127.0.0.1', port: int = 6379, db: int = 0, timeout: float = 5.0):
+        self.host, self.port, self.db, self.timeout = host, port, db, timeout
+        self._local = threading.local()
+
+    def _connect(self):
+        sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._local.sock = sock
+        self._local.reader = sock.makefile('rb')
+        if self.db:
+            self._command('SELECT', str(self.db))
+
+    def _read_reply(self):
+        line = self._local.reader.readline()
+        if not line:
+            raise ConnectionError('Connection closed by cache server')
+        kind, rest = line[:1], line[1:-2]
+        if kind == b'+':
+            return rest.decode()
+        if kind == b'-':
+            raise RespError(rest.decode())
+        if kind == b':':
+            return int(rest)
+        if kind == b'$':
+            length = int(rest)
+            if length < 0:
+                return None
+            data = self._local.reader.read(length + 2)
+            return data[:-2]
+        if kind == b'*':
+            length = int(rest)
+            return None if length < 0 else [self._read_reply() for _ in range(length)]
+        raise RespError(f'Unexpected reply: {line!r}')
+
+    def _command(self, *args):
+        parts = [b'*%d\r\n' % len(args)]
+        for arg in args:
+            data = arg if isinstance(arg, bytes) else str(arg).encode()
+            parts.append(b'$%d\r\n%s\r\n' % (len(data), data))
+        self._local.sock.sendall(b''.join(parts))
+        return self._read_reply()
+
+    def execute(self, *args):
+        """
+        Send one command, reconnecting once if the connection dropped
+        """
+        for attempt in range(2):
+            if getattr(self._local, 'sock', None) is None:
+                self._connect()
+            try:
+                return self._command(*args)
+            except (ConnectionError, OSError):
+                self._local.sock.close()
+                self._local.sock = None
+                if attempt:
+                    raise
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self.execute('GET', key)
+
+    def set(self, key: str, value: bytes, ttl: float):
+        self.execute('SET', key, value, 'PX', int(ttl * 1000))
+
+    def delete(self, key: str):
+        self.execute('DEL', key)
+
+    def acquire(self, key: str, token: str, ttl: float) -> bool:
+        return self.execute('SET', f'lease:{key}', token, 'PX', int(ttl * 1000), 'NX') == 'OK'
+
+    def release(self, key: str, token: str):
+        # Not atomic without scripting; a lease taken over in between is
+        # only ever released early, never leaked
+        if self.execute('GET', f'lease:{key}') == token.encode():
+            self.execute('DEL', f'lease:{key}')
+
+def create_backend(url: Optional[str] = None) -> CacheBackend:
+    """
+    Backend for a cache URL (see SHARED_CACHE_URL_ENV)
+    """
+    url = url or os.environ.get(SHARED_CACHE_URL_ENV, DEFAULT_SHARED_CACHE_URL)
+    parts = urlsplit(url)
+    if parts.scheme == 'memory':
+        return MemoryBackend()
+    if parts.scheme == 'shm':
+        return ShmFileBackend(parts.path or None)
+    if parts.scheme == 'sqlite':
+        # sqlite:///relative.db or sqlite:////absolute/path.db, as in SQLAlchemy URLs
+        return SQLiteBackend(parts.path[1:] if parts.path.startswith('/') else parts.path)
+    if parts.scheme == 'redis':
+        db = int(parts.path.strip('/') or 0)
+        return RespBackend(parts.hostname or '127.0.0.1', parts.port or 6379, db)
+    raise ValueError(f"Unsupported shared cache URL: {url}")
+
+class SharedCache:
+    """
+    Cache tier shared by every process pointed at the same backend.
+
+    Reads go straight to the backend. On a miss, get_or_compute() takes a
+    short lease on the key so that one process computes (e.g. fetches from
+    Yahoo) while the others poll for its result, which keeps N workers
+    from multiplying upstream requests by N. If the holder fails or takes
+    longer than the wait, waiters compute for themselves.
+    """
+    def __init__(self, backend: Optional[CacheBackend] = None, prefix: str = 'stocksentry',
+                 lock_ttl: float = SHARED_CACHE_LOCK_TTL, wait: float = SHARED_CACHE_WAIT):
+        self.backend = backend or create_backend()
+        self.prefix = prefix
+        self.lock_ttl = lock_ttl
+        self.wait = wait
+
+    def _key(self, namespace: str, key: Any) -> str:
+        return f'{self.prefix}:{namespace}:{key}'
+
+    def _read(self, full_key: str):
+        try:
+            data = self.backend.get(full_key)
+        except Exception as e:
+            print(f"Shared cache read failed: {str(e)}")
+            return False, None
+        if data is None:
+            return False, None
+        try:
+            return True, decode_value(data)
+        except ValueError as e:
+            # A corrupt entry is a miss; drop it so the next fill replaces it
+            print(f"Shared cache read failed: {str(e)}")
+            try:
+                self.backend.delete(full_key)
+            except Exception:
+                pass
+            return False, None
+
+    def _write(self, full_key: str, value: Any, ttl: float):
+        try:
+            self.backend.set(full_key, encode_value(value), ttl)
+        except Exception as e:
+            print(f"Shared cache write failed: {str(e)}")
+
+    def get(self, namespace: str, key: Any, default: Any = None) -> Any:
+        found, value = self._read(self._key(namespace, key))
+        return value if found else default
+
+    def set(self, namespace: str, key: Any, value: Any, ttl: float = SHARED_CACHE_TTL):
+        self._write(self._key(namespace, key), value, ttl)
+
+    def delete(self, namespace: str, key: Any):
+        self.backend.delete(self._key(namespace, key))
+
+    def get_or_compute(self, namespace: str, key: Any, compute: Callable[[], Any],
+                       ttl: float = SHARED_CACHE_TTL) -> Any:
+        """
+        Cached value for (namespace, key), computing it at most once across
+        processes while it is missing
+        """
+        full_key = self._key(namespace, key)
+        found, value = self._read(full_key)
+        if found:
+            count(f'shared_cache.{namespace}.hit')
+            return value
+
+        token = uuid.uuid4().hex
+        deadline = time.monotonic() + self.wait
+        delay = 0.005
+        with span('shared_cache.fill', namespace=namespace):
+            while True:
+                try:
+                    leader = self.backend.acquire(full_key, token, self.lock_ttl)
+                except Exception as e:
+                    print(f"Shared cache lease failed: {str(e)}")
+                    leader = True
+                    token = None
+                if leader:
+                    try:
+                        # Another process may have finished between our read and the lease
+                        found, value = self._read(full_key)
+                        if found:
+                            count(f'shared_cache.{namespace}.hit')
+                            return value
+                        count(f'shared_cache.{namespace}.miss')
+                        value = compute()
+                        self._write(full_key, value, ttl)
+                        return value
+                    finally:
+                        if token is not None:
+                            try:
+                                self.backend.release(full_key, token)
+                            except Exception:
+                                pass
+
+                time.sleep(delay)
+                delay = min(delay * 2, 0.25)
+                found, value = self._read(full_key)
+                if found:
+                    count(f'shared_cache.{namespace}.wait')
+                    return value
+                if time.monotonic() > deadline:
+                    count(f'shared_cache.{namespace}.timeout')
+                    return compute()
+
+_shared_cache = None
+_shared_cache_lock = threading.Lock()
+
+def get_shared_cache() -> SharedCache:
+    """
+    Process-wide SharedCache on the backend named by STOCKSENTRY_CACHE_URL
+    """
+    global _shared_cache
+    with _shared_cache_lock:
+        if _shared_cache is None:
+            _shared_cache = SharedCache()
+        return _shared_cache
+
+def set_shared_cache(cache: SharedCache):
+    global _shared_cache
+    with _shared_cache_lock:
+        _shared_cache = cache
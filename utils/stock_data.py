@@ -1,7 +1,26 @@
-import yfinance as yf
 import pandas as pd
+import atexit
+import threading
 from datetime import datetime, timedelta
-from .database import get_session, StockData, UserPreference
+from typing import Dict, List, Tuple
+from sqlalchemy import func, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from .database import engine, get_session, StockData, UserPreference, LegacyUserPreference
+from .providers import get_provider
+from .shared_cache import get_shared_cache
+from .tracing import traced, span, count
+
+# Preference writes are buffered in memory and flushed from a timer thread
+PREFERENCE_FLUSH_INTERVAL = 5.0  # seconds
+PREFERENCE_BATCH_SIZE = 50
+PREFERENCE_RETENTION_DAYS = 180
+PREFERENCE_MAX_ROWS = 5000
+PREFERENCE_MAINTENANCE_INTERVAL = timedelta(hours=6)
+
+_pending_preferences: Dict[Tuple[str, str], List] = {}
+_preference_lock = threading.Lock()
+_preference_timer = None
+_last_preference_maintenance = None
 
 def format_number(value, symbol: str, is_currency: bool = True) -> str:
     """
@@ -35,25 +54,36 @@ def format_number(value, symbol: str, is_currency: bool = True) -> str:
     except:
         return str(value)
 
+def get_data_version(df: pd.DataFrame) -> str:
+    """
+    Cheap identifier for a price frame: last bar timestamp and bar count
+    """
+    if df is None or df.empty:
+        return 'empty'
+    return f"{pd.Timestamp(df.index[-1]).isoformat()}/{len(df)}"
+
+@traced()
 def get_stock_data(symbol: str, period: str) -> pd.DataFrame:
     """
     Fetch stock data from database cache or Yahoo Finance
     """
+    session = get_session()
     try:
-        session = get_session()
-
         # Check cache first
-        latest_data = session.query(StockData)\
-            .filter(StockData.symbol == symbol)\
-            .order_by(StockData.date.desc())\
-            .first()
+        with span('sqlite.latest'):
+            latest_data = session.query(StockData)\
+                .filter(StockData.symbol == symbol)\
+                .order_by(StockData.date.desc())\
+                .first()
 
         if latest_data and (datetime.utcnow() - latest_data.created_at) < timedelta(hours=1):
+            count('price_cache.hit')
             # Return cached data if less than 1 hour old
-            data = session.query(StockData)\
-                .filter(StockData.symbol == symbol)\
-                .order_by(StockData.date.asc())\
-                .all()
+            with span('sqlite.read'):
+                data = session.query(StockData)\
+                    .filter(StockData.symbol == symbol)\
+                    .order_by(StockData.date.asc())\
+                    .all()
 
             df = pd.DataFrame([{
                 'Open': d.open_price,
@@ -66,47 +96,308 @@ def get_stock_data(symbol: str, period: str) -> pd.DataFrame:
             df.set_index('Date', inplace=True)
             return df
 
-        # Fetch new data from Yahoo Finance
-        stock = yf.Ticker(symbol)
-        df = stock.history(period=period)
+        count('price_cache.miss')
 
-        # Cache the data
-        for index, row in df.iterrows():
-            stock_data = StockData(
-                symbol=symbol,
-                date=index,
-                open_price=row['Open'],
-                high_price=row['High'],
-                low_price=row['Low'],
-                close_price=row['Close'],
-                volume=row['Volume']
-            )
-            session.add(stock_data)
+        def fetch_and_store():
+            # Fetch new data from Yahoo Finance
+            with span('provider.history', symbol=symbol, period=period):
+                df = get_provider().history(symbol, period=period)
 
-        session.commit()
-        return df
+            # Cache the data
+            with span('sqlite.write', rows=len(df)):
+                for index, row in df.iterrows():
+                    stock_data = StockData(
+                        symbol=symbol,
+                        date=index,
+                        open_price=row['Open'],
+                        high_price=row['High'],
+                        low_price=row['Low'],
+                        close_price=row['Close'],
+                        volume=row['Volume']
+                    )
+                    session.add(stock_data)
+
+                session.commit()
+            return df
+
+        # Processes missing the same symbol at once share one fetch and write
+        return get_shared_cache().get_or_compute('history', f'{symbol}:{period}', fetch_and_store,
+                                                 ttl=CACHE_TTL.total_seconds())
+
+    except Exception as e:
+        raise Exception(f"Failed to fetch stock data: {str(e)}")
+    finally:
+        session.close()
+
+# Cached rows may start a few days after the requested start (weekends/holidays)
+RANGE_COVERAGE_TOLERANCE = timedelta(days=4)
+# Cached bars needed per weekday in the range to count as gap-free (holidays)
+RANGE_MIN_BAR_RATIO = 0.9
+CACHE_TTL = timedelta(hours=1)
+INFO_CACHE_TTL = timedelta(minutes=15)
+
+@traced()
+def get_stock_data_range(symbol: str, start_date, end_date) -> pd.DataFrame:
+    """
+    Fetch daily bars for a date range, served from the database cache when
+    fresh cached rows already cover it
+    """
+    start = pd.Timestamp(start_date).to_pydatetime()
+    end = pd.Timestamp(end_date).to_pydatetime()
+    session = get_session()
+    try:
+        latest = session.query(func.max(StockData.created_at), func.min(StockData.date), func.max(StockData.date))\
+            .filter(StockData.symbol == symbol)\
+            .one()
+        covered_end = min(end, datetime.utcnow())
+        if latest[0] and datetime.utcnow() - latest[0] < CACHE_TTL \
+                and latest[1] <= start + RANGE_COVERAGE_TOLERANCE \
+                and latest[2] >= covered_end - RANGE_COVERAGE_TOLERANCE:
+            with span('sqlite.read'):
+                rows = session.query(StockData)\
+                    .filter(StockData.symbol == symbol, StockData.date >= start, StockData.date < end)\
+                    .order_by(StockData.date.asc())\
+                    .all()
+            df = pd.DataFrame([{
+                'Open': d.open_price,
+                'High': d.high_price,
+                'Low': d.low_price,
+                'Close': d.close_price,
+                'Volume': d.volume,
+                'Date': d.date
+            } for d in rows])
+            # Both ends being cached does not rule out a gap in between
+            expected = len(pd.bdate_range(start, covered_end, inclusive='left'))
+            if not df.empty and df['Date'].nunique() >= RANGE_MIN_BAR_RATIO * expected:
+                count('price_cache.hit')
+                return df.drop_duplicates('Date', keep='last').set_index('Date')
 
+        count('price_cache.miss')
+        with span('provider.history', symbol=symbol):
+            df = get_provider().history(symbol, start=start_date, end=end_date)
+
+        with span('sqlite.write', rows=len(df)):
+            if not df.empty:
+                dates = [ts.to_pydatetime().replace(tzinfo=None) for ts in df.index]
+                # Replace rather than duplicate rows already cached for this span
+                session.query(StockData)\
+                    .filter(StockData.symbol == symbol, StockData.date >= min(dates), StockData.date <= max(dates))\
+                    .delete(synchronize_session=False)
+                session.bulk_insert_mappings(StockData, [{
+                    'symbol': symbol,
+                    'date': date,
+                    'open_price': row.Open,
+                    'high_price': row.High,
+                    'low_price': row.Low,
+                    'close_price': row.Close,
+                    'volume': int(row.Volume),
+                    'created_at': datetime.utcnow()
+                } for date, row in zip(dates, df.itertuples())])
+                session.commit()
+                # Same shape as a cache hit: OHLCV columns on naive exchange-local dates
+                df = df[['Open', 'High', 'Low', 'Close', 'Volume']].set_axis(pd.DatetimeIndex(dates, name='Date'))
+        return df
     except Exception as e:
+        session.rollback()
         raise Exception(f"Failed to fetch stock data: {str(e)}")
+    finally:
+        session.close()
 
+@traced()
+def load_cached_prices(symbols: List[str] = None, updated_since: datetime = None) -> Dict[str, pd.DataFrame]:
+    """
+    Read cached daily bars for many symbols in a single query. With
+    updated_since, only symbols that received rows after that time are read.
+    """
+    query = select(
+        StockData.symbol, StockData.date,
+        StockData.open_price.label('Open'), StockData.high_price.label('High'),
+        StockData.low_price.label('Low'), StockData.close_price.label('Close'),
+        StockData.volume.label('Volume'), StockData.created_at
+    )
+    if symbols is not None:
+        query = query.where(StockData.symbol.in_(list(symbols)))
+    if updated_since is not None:
+        updated = select(StockData.symbol).where(StockData.created_at > updated_since).distinct()
+        query = query.where(StockData.symbol.in_(updated))
+
+    with span('sqlite.read_many'):
+        rows = pd.read_sql_query(query, engine, parse_dates=['date', 'created_at'])
+    if rows.empty:
+        return {}
+
+    # The cache can hold the same bar more than once; keep the newest copy
+    rows = rows.sort_values(['symbol', 'date', 'created_at'])\
+        .drop_duplicates(['symbol', 'date'], keep='last')\
+        .rename(columns={'date': 'Date'})
+    columns = ['Open', 'High', 'Low', 'Close', 'Volume']
+    return {symbol: frame.set_index('Date')[columns] for symbol, frame in rows.groupby('symbol', sort=False)}
+
+@traced()
 def get_company_info(symbol: str) -> dict:
     """
-    Fetch company information from Yahoo Finance
+    Fetch company information from Yahoo Finance, through the shared cache
     """
     try:
-        stock = yf.Ticker(symbol)
-        return stock.info
+        return get_shared_cache().get_or_compute('info', symbol, lambda: get_provider().info(symbol),
+                                                 ttl=INFO_CACHE_TTL.total_seconds())
     except Exception as e:
         raise Exception(f"Failed to fetch company information: {str(e)}")
 
 def save_user_preference(symbol: str, period: str):
     """
-    Save user's stock symbol and period preference
+    Record a view of (symbol, period); the write is deferred to a background flush
     """
+    global _preference_timer
+    key = (symbol.upper(), period)
+    with _preference_lock:
+        entry = _pending_preferences.setdefault(key, [0, None])
+        entry[0] += 1
+        entry[1] = datetime.utcnow()
+
+        delay = 0 if len(_pending_preferences) >= PREFERENCE_BATCH_SIZE else PREFERENCE_FLUSH_INTERVAL
+        if _preference_timer is None or delay == 0:
+            if _preference_timer is not None:
+                _preference_timer.cancel()
+            _preference_timer = threading.Timer(delay, flush_user_preferences)
+            _preference_timer.daemon = True
+            _preference_timer.start()
+
+def flush_user_preferences():
+    """
+    Upsert all buffered preference hits in a single transaction
+    """
+    global _preference_timer
+    with _preference_lock:
+        pending = dict(_pending_preferences)
+        _pending_preferences.clear()
+        _preference_timer = None
+
+    if not pending:
+        return
+
+    session = get_session()
     try:
-        session = get_session()
-        pref = UserPreference(symbol=symbol, period=period)
-        session.add(pref)
+        for (symbol, period), (hits, last_seen) in pending.items():
+            stmt = sqlite_insert(UserPreference).values(
+                symbol=symbol,
+                period=period,
+                hit_count=hits,
+                first_seen=last_seen,
+                last_seen=last_seen
+            )
+            stmt = stmt.on_conflict_do_update(
+                index_elements=['symbol', 'period'],
+                set_={
+                    'hit_count': UserPreference.hit_count + stmt.excluded.hit_count,
+                    'last_seen': stmt.excluded.last_seen
+                }
+            )
+            session.execute(stmt)
         session.commit()
     except Exception as e:
-        print(f"Failed to save preference: {str(e)}")
\ No newline at end of file
+        session.rollback()
+        print(f"Failed to save preference: {str(e)}")
+    finally:
+        session.close()
+
+    _maybe_compact_user_preferences()
+
+def _maybe_compact_user_preferences():
+    global _last_preference_maintenance
+    now = datetime.utcnow()
+    if _last_preference_maintenance and now - _last_preference_maintenance < PREFERENCE_MAINTENANCE_INTERVAL:
+        return
+    _last_preference_maintenance = now
+    compact_user_preferences()
+
+def compact_user_preferences(retention_days: int = PREFERENCE_RETENTION_DAYS,
+                             max_rows: int = PREFERENCE_MAX_ROWS):
+    """
+    Roll up the legacy append-only preference log and apply retention limits
+    """
+    session = get_session()
+    try:
+        # Fold legacy rows into the counter table
+        legacy = session.query(
+            LegacyUserPreference.symbol,
+            LegacyUserPreference.period,
+            func.count(LegacyUserPreference.id),
+            func.min(LegacyUserPreference.created_at),
+            func.max(LegacyUserPreference.created_at)
+        ).group_by(LegacyUserPreference.symbol, LegacyUserPreference.period).all()
+
+        for symbol, period, hits, first_seen, last_seen in legacy:
+            stmt = sqlite_insert(UserPreference).values(
+                symbol=symbol.upper(),
+                period=period or '1mo',
+                hit_count=hits,
+                first_seen=first_seen,
+                last_seen=last_seen
+            )
+            stmt = stmt.on_conflict_do_update(
+                index_elements=['symbol', 'period'],
+                set_={
+                    'hit_count': UserPreference.hit_count + stmt.excluded.hit_count,
+                    'first_seen': func.min(UserPreference.first_seen, stmt.excluded.first_seen),
+                    'last_seen': func.max(UserPreference.last_seen, stmt.excluded.last_seen)
+                }
+            )
+            session.execute(stmt)
+        if legacy:
+            session.query(LegacyUserPreference).delete(synchronize_session=False)
+
+        # Drop entries not seen within the retention window
+        cutoff = datetime.utcnow() - timedelta(days=retention_days)
+        session.query(UserPreference)\
+            .filter(UserPreference.last_seen < cutoff)\
+            .delete(synchronize_session=False)
+
+        # Keep only the most recently used rows
+        stale = session.query(UserPreference.id)\
+            .order_by(UserPreference.last_seen.desc())\
+            .offset(max_rows)\
+            .all()
+        if stale:
+            session.query(UserPreference)\
+                .filter(UserPreference.id.in_([row.id for row in stale]))\
+                .delete(synchronize_session=False)
+
+        session.commit()
+    except Exception as e:
+        session.rollback()
+        print(f"Failed to compact preferences: {str(e)}")
+    finally:
+        session.close()
+
+def get_popular_symbols(limit: int = 10) -> List[str]:
+    """
+    Most frequently viewed symbols across all periods
+    """
+    session = get_session()
+    try:
+        rows = session.query(UserPreference.symbol, func.sum(UserPreference.hit_count).label('hits'))\
+            .group_by(UserPreference.symbol)\
+            .order_by(func.sum(UserPreference.hit_count).desc())\
+            .limit(limit)\
+            .all()
+        return [row.symbol for row in rows]
+    finally:
+        session.close()
+
+def get_recent_symbols(limit: int = 10) -> List[str]:
+    """
+    Most recently viewed symbols
+    """
+    session = get_session()
+    try:
+        rows = session.query(UserPreference.symbol, func.max(UserPreference.last_seen).label('seen'))\
+            .group_by(UserPreference.symbol)\
+            .order_by(func.max(UserPreference.last_seen).desc())\
+            .limit(limit)\
+            .all()
+        return [row.symbol for row in rows]
+    finally:
+        session.close()
+
+atexit.register(flush_user_preferences)
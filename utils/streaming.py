@@ -0,0 +1,347 @@
+import os
+import threading
+from abc import ABC, abstractmethod
+import time
+from typing import Callable, Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from .analysis import RiskAnalyzer
+from .tracing import count
+
+# 'yahoo' (default) for the Yahoo Finance websocket, or 'simulated' for a
+# local random-walk feed when testing without network access
+QUOTE_SOURCE_ENV = 'STOCKSENTRY_QUOTE_SOURCE'
+
+TICK_BUFFER_SIZE = 65536
+BAR_BUFFER_SIZE = 2048
+BAR_INTERVALS = (60, 300)
+TRADING_SECONDS_PER_YEAR = 252 * 390 * 60
+
+NS_PER_SECOND = 1_000_000_000
+
+class TickRingBuffer:
+    """
+    Fixed-size ring of (timestamp ns, price, size) ticks; once full the
+    oldest ticks are overwritten
+    """
+    def __init__(self, capacity: int = TICK_BUFFER_SIZE):
+        self.capacity = capacity
+        self.ts = np.zeros(capacity, dtype=np.int64)
+        self.price = np.zeros(capacity, dtype=np.float64)
+        self.size = np.zeros(capacity, dtype=np.float64)
+        self._next = 0
+        self._count = 0
+
+    def __len__(self) -> int:
+        return self._count
+
+    def extend(self, ts: np.ndarray, price: np.ndarray, size: np.ndarray):
+        n = len(ts)
+        if n >= self.capacity:
+            ts, price, size = ts[-self.capacity:], price[-self.capacity:], size[-self.capacity:]
+            n = self.capacity
+        positions = (self._next + np.arange(n)) % self.capacity
+        self.ts[positions] = ts
+        self.price[positions] = price
+        self.size[positions] = size
+        self._next = (self._next + n) % self.capacity
+        self._count = min(self.capacity, self._count + n)
+
+    def _order(self) -> np.ndarray:
+        start = (self._next - self._count) % self.capacity
+        return (start + np.arange(self._count)) % self.capacity
+
+    def arrays(self):
+        """
+        (ts, price, size) copies in arrival order
+        """
+        order = self._order()
+        return self.ts[order], self.price[order], self.size[order]
+
+    def last(self) -> Optional[tuple]:
+        if not self._count:
+            return None
+        i = (self._next - 1) % self.capacity
+        return int(self.ts[i]), float(self.price[i]), float(self.size[i])
+
+class BarAggregator:
+    """
+    Incremental OHLCV bars of a fixed interval in a ring of bar slots.
+
+    A batch of ticks is bucketed by bar start and reduced per bucket with
+    np.*.reduceat; only the newest bar is ever updated in place. Ticks
+    older than the newest bar are counted and dropped.
+    """
+    def __init__(self, interval: int, capacity: int = BAR_BUFFER_SIZE):
+        self.interval = interval
+        self.interval_ns = interval * NS_PER_SECOND
+        self.capacity = capacity
+        self.start = np.zeros(capacity, dtype=np.int64)
+        self.ohlcv = np.zeros((capacity, 5), dtype=np.float64)
+        self._next = 0
+        self._count = 0
+        self.late_ticks = 0
+
+    def __len__(self) -> int:
+        return self._count
+
+    def _current(self) -> Optional[int]:
+        return (self._next - 1) % self.capacity if self._count else None
+
+    def _append(self, start: int, bar: np.ndarray):
+        self.start[self._next] = start
+        self.ohlcv[self._next] = bar
+        self._next = (self._next + 1) % self.capacity
+        self._count = min(self.capacity, self._count + 1)
+
+    def update(self, ts: np.ndarray, price: np.ndarray, size: np.ndarray):
+        current = self._current()
+        if current is not None:
+            late = ts < self.start[current]
+            if late.any():
+                self.late_ticks += int(late.sum())
+                ts, price, size = ts[~late], price[~late], size[~late]
+        if not len(ts):
+            return
+
+        order = np.argsort(ts, kind='stable')
+        ts, price, size = ts[order], price[order], size[order]
+        buckets = ts - ts % self.interval_ns
+        edges = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+        bars = np.column_stack([
+            price[edges],
+            np.maximum.reduceat(price, edges),
+            np.minimum.reduceat(price, edges),
+            price[np.r_[edges[1:] - 1, len(price) - 1]],
+            np.add.reduceat(size, edges),
+        ])
+
+        first = 0
+        if current is not None and buckets[edges[0]] == self.start[current]:
+            # Merge into the open bar
+            bar = self.ohlcv[current]
+            bar[1] = max(bar[1], bars[0, 1])
+            bar[2] = min(bar[2], bars[0, 2])
+            bar[3] = bars[0, 3]
+            bar[4] += bars[0, 4]
+            first = 1
+        for i in range(first, len(edges)):
+            self._append(int(buckets[edges[i]]), bars[i])
+
+    def frame(self, tz: Optional[str] = None) -> pd.DataFrame:
+        """
+        Bars in time order with the same columns as get_stock_data
+        """
+        start = (self._next - self._count) % self.capacity
+        order = (start + np.arange(self._count)) % self.capacity
+        index = pd.to_datetime(self.start[order], utc=True)
+        if tz:
+            index = index.tz_convert(tz)
+        df = pd.DataFrame(self.ohlcv[order], index=index, columns=['Open', 'High', 'Low', 'Close', 'Volume'])
+        df.index.name = 'Datetime'
+        return df
+
+class SymbolStream:
+    """
+    Tick buffer plus one BarAggregator per interval for a symbol
+    """
+    def __init__(self, intervals: Iterable[int] = BAR_INTERVALS, tick_capacity: int = TICK_BUFFER_SIZE,
+                 bar_capacity: int = BAR_BUFFER_SIZE):
+        self.ticks = TickRingBuffer(tick_capacity)
+        self.bars = {interval: BarAggregator(interval, bar_capacity) for interval in intervals}
+        self.lock = threading.Lock()
+
+    def push(self, ts: np.ndarray, price: np.ndarray, size: np.ndarray):
+        with self.lock:
+            self.ticks.extend(ts, price, size)
+            for aggregator in self.bars.values():
+                aggregator.update(ts, price, size)
+
+class QuoteStream:
+    """
+    In-memory live quotes for many symbols, fed by a QuoteSource.
+    Readers get bar frames and risk metrics straight from the buffers.
+    """
+    def __init__(self, intervals: Iterable[int] = BAR_INTERVALS, tick_capacity: int = TICK_BUFFER_SIZE,
+                 bar_capacity: int = BAR_BUFFER_SIZE):
+        self.intervals = tuple(intervals)
+        self.tick_capacity = tick_capacity
+        self.bar_capacity = bar_capacity
+        self._streams: Dict[str, SymbolStream] = {}
+        self._lock = threading.Lock()
+
+    def _stream(self, symbol: str) -> SymbolStream:
+        stream = self._streams.get(symbol)
+        if stream is None:
+            with self._lock:
+                stream = self._streams.setdefault(
+                    symbol, SymbolStream(self.intervals, self.tick_capacity, self.bar_capacity))
+        return stream
+
+    def on_ticks(self, symbol: str, ts, price, size=None):
+        """
+        Ingest one tick or arrays of ticks (timestamps in ns since epoch)
+        """
+        ts = np.atleast_1d(np.asarray(ts, dtype=np.int64))
+        price = np.atleast_1d(np.asarray(price, dtype=np.float64))
+        size = np.zeros(len(ts)) if size is None else np.atleast_1d(np.asarray(size, dtype=np.float64))
+        self._stream(symbol.upper()).push(ts, price, size)
+        count('stream.ticks', len(ts))
+
+    @property
+    def symbols(self) -> List[str]:
+        return list(self._streams)
+
+    def last_price(self, symbol: str) -> Optional[float]:
+        stream = self._streams.get(symbol.upper())
+        if stream is None:
+            return None
+        with stream.lock:
+            last = stream.ticks.last()
+        return last[1] if last else None
+
+    def bars(self, symbol: str, interval: int = 60) -> pd.DataFrame:
+        stream = self._streams.get(symbol.upper())
+        if stream is None:
+            return pd.DataFrame(columns=['Open', 'High', 'Low', 'Close', 'Volume'])
+        with stream.lock:
+            return stream.bars[interval].frame()
+
+    def risk_metrics(self, symbol: str, interval: int = 60) -> Dict:
+        """
+        RiskAnalyzer metrics over the buffered bars, annualized for the bar interval
+        """
+        bars = self.bars(symbol, interval)
+        if len(bars) < 3:
+            return {}
+        metrics = RiskAnalyzer().calculate_risk_metrics_frame(
+            bars[['Close']], periods_per_year=TRADING_SECONDS_PER_YEAR / interval)
+        return metrics.iloc[0].to_dict()
+
+class QuoteSource(ABC):
+    """
+    Pushes ticks into a QuoteStream until stopped
+    """
+    simulated = False
+
+    def __init__(self, stream: QuoteStream):
+        self.stream = stream
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    @abstractmethod
+    def subscribe(self, symbols: List[str], prices: Optional[Dict[str, float]] = None):
+        pass
+
+    @abstractmethod
+    def _run(self):
+        pass
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name=type(self).__name__, daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+class SimulatedQuoteSource(QuoteSource):
+    """
+    Local random-walk feed for testing and demos: ticks_per_second ticks
+    per symbol with seeded, symbol-specific paths
+    """
+    simulated = True
+
+    def __init__(self, stream: QuoteStream, ticks_per_second: float = 20.0, volatility: float = 0.00002,
+                 seed: int = 0, clock: Callable[[], int] = time.time_ns):
+        super().__init__(stream)
+        self.ticks_per_second = ticks_per_second
+        self.volatility = volatility
+        self.clock = clock
+        self._rng = np.random.default_rng(seed)
+        self._prices: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, symbols: List[str], prices: Optional[Dict[str, float]] = None):
+        prices = prices or {}
+        with self._lock:
+            for symbol in symbols:
+                self._prices.setdefault(symbol.upper(), float(prices.get(symbol, 100.0)))
+
+    def emit(self, seconds: float, end_ns: Optional[int] = None):
+        """
+        Generate `seconds` worth of ticks ending at end_ns for every symbol
+        """
+        end_ns = self.clock() if end_ns is None else end_ns
+        n = max(1, int(seconds * self.ticks_per_second))
+        with self._lock:
+            symbols = list(self._prices)
+            steps = self._rng.normal(0.0, self.volatility, (len(symbols), n))
+            sizes = self._rng.integers(1, 500, (len(symbols), n)).astype(np.float64)
+            offsets = np.sort(self._rng.uniform(0, seconds * NS_PER_SECOND, n)).astype(np.int64)
+            ts = end_ns - int(seconds * NS_PER_SECOND) + offsets
+            for i, symbol in enumerate(symbols):
+                path = self._prices[symbol] * np.exp(np.cumsum(steps[i]))
+                self._prices[symbol] = float(path[-1])
+                self.stream.on_ticks(symbol, ts, path, sizes[i])
+
+    def _run(self):
+        interval = 0.25
+        while not self._stop.wait(interval):
+            self.emit(interval)
+
+class YahooQuoteSource(QuoteSource):
+    """
+    Live ticks from the Yahoo Finance streaming websocket
+    """
+    def __init__(self, stream: QuoteStream):
+        super().__init__(stream)
+        self._symbols: List[str] = []
+        self._socket = None
+
+    def subscribe(self, symbols: List[str], prices: Optional[Dict[str, float]] = None):
+        new = [s.upper() for s in symbols if s.upper() not in self._symbols]
+        self._symbols.extend(new)
+        if self._socket is not None and new:
+            self._socket.subscribe(new)
+
+    def _handle(self, message: dict):
+        try:
+            ts = int(message['time']) * 1_000_000
+            self.stream.on_ticks(message['id'], ts, float(message['price']), float(message.get('last_size') or 0))
+        except (KeyError, TypeError, ValueError):
+            count('stream.bad_message')
+
+    def _run(self):
+        import yfinance as yf
+        while not self._stop.is_set():
+            try:
+                with yf.WebSocket(verbose=False) as socket:
+                    self._socket = socket
+                    socket.subscribe(self._symbols)
+                    socket.listen(self._handle)
+            except Exception as e:
+                print(f"Quote stream disconnected: {str(e)}")
+                self._stop.wait(5)
+            finally:
+                self._socket = None
+
+    def stop(self):
+        self._stop.set()
+        if self._socket is not None:
+            self._socket.close()
+        super().stop()
+
+def create_quote_source(stream: QuoteStream, kind: Optional[str] = None) -> QuoteSource:
+    kind = kind or os.environ.get(QUOTE_SOURCE_ENV, 'yahoo')
+    if kind == 'yahoo':
+        return YahooQuoteSource(stream)
+    if kind == 'simulated':
+        return SimulatedQuoteSource(stream)
+    raise ValueError(f"Unknown quote source: {kind}")
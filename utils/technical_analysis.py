@@ -1,6 +1,8 @@
 import pandas as pd
 import ta
+from .tracing import traced
 
+@traced()
 def calculate_advanced_indicators(df):
     '''Calculate 25+ technical indicators'''
     # Implementation of 25+ technical indicators
@@ -10,9 +12,60 @@ def calculate_advanced_indicators(df):
     df['ichimoku_conv'], df['ichimoku_base'], df['ichimoku_span_a'], df['ichimoku_span_b'] = calculate_ichimoku_cloud(df)
     return df
 
-def calculate_ichimoku_cloud(df):
-    conversion = (df['High'].rolling(9).max() + df['Low'].rolling(9).min()) / 2
-    base = (df['High'].rolling(26).max() + df['Low'].rolling(26).min()) / 2
+@traced()
+def calculate_ichimoku_cloud(df, conversion_window=9, base_window=26, span_b_window=52):
+    conversion = (df['High'].rolling(conversion_window).max() + df['Low'].rolling(conversion_window).min()) / 2
+    base = (df['High'].rolling(base_window).max() + df['Low'].rolling(base_window).min()) / 2
     span_a = (conversion + base) / 2
-    span_b = (df['High'].rolling(52).max() + df['Low'].rolling(52).min()) / 2
+    span_b = (df['High'].rolling(span_b_window).max() + df['Low'].rolling(span_b_window).min()) / 2
     return conversion, base, span_a, span_b
+
+def ema_frame(close, window):
+    '''EMA of every column, as ta.trend.ema_indicator'''
+    return close.ewm(span=window, min_periods=window, adjust=False).mean()
+
+def rsi_frame(close, window=14):
+    '''RSI of every column with Wilder smoothing, as ta.momentum.rsi'''
+    valid = close.notna()
+    diff = close.diff()
+    up = diff.where(diff > 0, 0.0).where(valid)
+    down = (-diff).where(diff < 0, 0.0).where(valid)
+    ema_up = up.ewm(alpha=1 / window, min_periods=window, adjust=False).mean()
+    ema_down = down.ewm(alpha=1 / window, min_periods=window, adjust=False).mean()
+    rsi = 100 - 100 / (1 + ema_up / ema_down)
+    return rsi.where(ema_down != 0, 100.0).where(ema_down.notna())
+
+def macd_frame(close, fast=12, slow=26, signal=9):
+    '''MACD line and signal line of every column, as ta.trend.MACD'''
+    macd = ema_frame(close, fast) - ema_frame(close, slow)
+    return macd, macd.ewm(span=signal, min_periods=signal, adjust=False).mean()
+
+def indicator_state_frame(close, high, low):
+    '''Latest RSI(14), MACD(12, 26, 9) and Ichimoku readings for many symbols at once.
+
+    Inputs are bars x symbols frames; shorter histories are padded with
+    leading NaN. Formulas match the ta library used by the technical chart.'''
+    rsi = rsi_frame(close, 14)
+    macd, signal = macd_frame(close, 12, 26, 9)
+
+    # Ichimoku
+    # calculate_ichimoku_cloud only indexes 'High'/'Low', so wide frames work as-is
+    conversion, base, span_a, span_b = calculate_ichimoku_cloud({'High': high, 'Low': low})
+
+    last_close = close.iloc[-1]
+    cloud_top = pd.concat([span_a.iloc[-1], span_b.iloc[-1]], axis=1).max(axis=1, skipna=False)
+    cloud_bottom = pd.concat([span_a.iloc[-1], span_b.iloc[-1]], axis=1).min(axis=1, skipna=False)
+    cloud = pd.Series('inside', index=close.columns, dtype=object)
+    cloud[last_close > cloud_top] = 'above'
+    cloud[last_close < cloud_bottom] = 'below'
+    cloud[cloud_top.isna()] = 'n/a'
+
+    return pd.DataFrame({
+        'rsi': rsi.iloc[-1],
+        'macd': macd.iloc[-1],
+        'macd_signal': signal.iloc[-1],
+        'macd_hist': (macd - signal).iloc[-1],
+        'ichimoku_conversion': conversion.iloc[-1],
+        'ichimoku_base': base.iloc[-1],
+        'ichimoku_cloud': cloud,
+    })
@@ -0,0 +1,146 @@
+import contextvars
+import functools
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+# Append every finished trace to this JSON lines file when set
+TRACE_FILE_ENV = 'STOCKSENTRY_TRACE_FILE'
+
+_current_trace = contextvars.ContextVar('stocksentry_trace', default=None)
+# Nesting depth of the innermost open span; per context, so spans opened by
+# worker threads running in a copied context nest under their caller
+_span_depth = contextvars.ContextVar('stocksentry_span_depth', default=0)
+
+class Span:
+    __slots__ = ('name', 'start_ns', 'end_ns', 'depth', 'attrs')
+
+    def __init__(self, name: str, start_ns: int, depth: int, attrs: dict):
+        self.name = name
+        self.start_ns = start_ns
+        self.end_ns = None
+        self.depth = depth
+        self.attrs = attrs
+
+    @property
+    def duration_ns(self) -> int:
+        return (self.end_ns or time.perf_counter_ns()) - self.start_ns
+
+class Trace:
+    """
+    Spans and counters collected during one unit of work (e.g. a Streamlit rerun)
+    """
+    def __init__(self, name: str = 'rerun'):
+        self.id = uuid.uuid4().hex
+        self.name = name
+        self.wall_time = time.time()
+        self.start_ns = time.perf_counter_ns()
+        self.end_ns = None
+        self.spans: List[Span] = []
+        self.counters: Dict[str, int] = {}
+        self._counter_lock = threading.Lock()
+
+    @property
+    def duration_ns(self) -> int:
+        return (self.end_ns or time.perf_counter_ns()) - self.start_ns
+
+    def to_records(self) -> List[dict]:
+        """
+        One flat dict per span, offsets relative to the trace start
+        """
+        return [{
+            'trace_id': self.id,
+            'trace': self.name,
+            'wall_time': self.wall_time,
+            'span': s.name,
+            'depth': s.depth,
+            'offset_ns': s.start_ns - self.start_ns,
+            'duration_ns': s.duration_ns,
+            'attrs': s.attrs,
+        } for s in self.spans]
+
+def start_trace(name: str = 'rerun') -> Trace:
+    trace = Trace(name)
+    _current_trace.set(trace)
+    return trace
+
+def end_trace() -> Optional[Trace]:
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.end_ns = time.perf_counter_ns()
+        _current_trace.set(None)
+        path = os.environ.get(TRACE_FILE_ENV)
+        if path:
+            export_jsonl(trace, path)
+    return trace
+
+def current_trace() -> Optional[Trace]:
+    return _current_trace.get()
+
+@contextmanager
+def span(name: str, **attrs):
+    """
+    Time a block; a no-op unless a trace is active in this context
+    """
+    trace = _current_trace.get()
+    if trace is None:
+        yield None
+        return
+    depth = _span_depth.get()
+    s = Span(name, time.perf_counter_ns(), depth, attrs)
+    trace.spans.append(s)
+    token = _span_depth.set(depth + 1)
+    try:
+        yield s
+    finally:
+        _span_depth.reset(token)
+        s.end_ns = time.perf_counter_ns()
+
+def traced(name: Optional[str] = None):
+    """
+    Decorator form of span(); defaults to module.qualname
+    """
+    def decorator(func):
+        span_name = name or f"{func.__module__.rsplit('.', 1)[-1]}.{func.__qualname__}"
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _current_trace.get() is None:
+                return func(*args, **kwargs)
+            with span(span_name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def count(name: str, n: int = 1):
+    """
+    Increment a counter (e.g. cache hits/misses) on the active trace
+    """
+    trace = _current_trace.get()
+    if trace is not None:
+        with trace._counter_lock:
+            trace.counters[name] = trace.counters.get(name, 0) + n
+
+def export_jsonl(trace: Trace, path: str):
+    """
+    Append a trace to a JSON lines file: one line per span plus a summary line
+    """
+    with open(path, 'a') as f:
+        for record in trace.to_records():
+            f.write(json.dumps(record, default=str) + '\n')
+        f.write(json.dumps({
+            'trace_id': trace.id,
+            'trace': trace.name,
+            'wall_time': trace.wall_time,
+            'span': None,
+            'duration_ns': trace.duration_ns,
+            'counters': trace.counters,
+        }) + '\n')
+
+def trace_to_jsonl(trace: Trace) -> str:
+    lines = [json.dumps(record, default=str) for record in trace.to_records()]
+    return '\n'.join(lines) + '\n'
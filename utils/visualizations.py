@@ -1,10 +1,13 @@
+import itertools
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 import pandas as pd
 import numpy as np
 from typing import Dict, List, Tuple
 import ta
+from .tracing import traced
 
+@traced()
 def create_price_chart(df: pd.DataFrame, symbol: str) -> go.Figure:
     """
     Create an interactive price chart with candlesticks and moving averages
@@ -42,6 +45,7 @@ def create_price_chart(df: pd.DataFrame, symbol: str) -> go.Figure:
     
     return fig
 
+@traced()
 def create_volume_chart(df: pd.DataFrame) -> go.Figure:
     """
     Create volume chart
@@ -65,6 +69,7 @@ def create_volume_chart(df: pd.DataFrame) -> go.Figure:
     
     return fig
 
+@traced()
 def create_metrics_chart(info: dict) -> go.Figure:
     """
     Create a chart for financial metrics
@@ -92,20 +97,24 @@ def create_metrics_chart(info: dict) -> go.Figure:
     
     return fig
 
-def create_technical_chart(df: pd.DataFrame, symbol: str) -> go.Figure:
+EMA_COLORS = ['orange', 'blue', 'red', 'green', 'purple']
+
+@traced()
+def create_technical_chart(df: pd.DataFrame, symbol: str, ema_windows: tuple = (20, 50, 200),
+                           rsi_window: int = 14, macd_fast: int = 12, macd_slow: int = 26,
+                           macd_signal: int = 9) -> go.Figure:
     """
     Create an advanced technical analysis chart with multiple indicators
     """
     # Calculate technical indicators using ta library
-    df['EMA20'] = ta.trend.ema_indicator(df['Close'], window=20)
-    df['EMA50'] = ta.trend.ema_indicator(df['Close'], window=50)
-    df['EMA200'] = ta.trend.ema_indicator(df['Close'], window=200)
+    for window in ema_windows:
+        df[f'EMA{window}'] = ta.trend.ema_indicator(df['Close'], window=window)
     
     # RSI
-    df['RSI'] = ta.momentum.rsi(df['Close'], window=14)
+    df['RSI'] = ta.momentum.rsi(df['Close'], window=rsi_window)
     
     # MACD
-    macd = ta.trend.MACD(df['Close'])
+    macd = ta.trend.MACD(df['Close'], window_slow=macd_slow, window_fast=macd_fast, window_sign=macd_signal)
     df['MACD'] = macd.macd()
     df['MACD_Signal'] = macd.macd_signal()
     df['MACD_Hist'] = macd.macd_diff()
@@ -138,18 +147,12 @@ def create_technical_chart(df: pd.DataFrame, symbol: str) -> go.Figure:
     )
     
     # Add EMAs
-    fig.add_trace(
-        go.Scatter(x=df.index, y=df['EMA20'], name='EMA20', line=dict(color='orange')),
-        row=1, col=1
-    )
-    fig.add_trace(
-        go.Scatter(x=df.index, y=df['EMA50'], name='EMA50', line=dict(color='blue')),
-        row=1, col=1
-    )
-    fig.add_trace(
-        go.Scatter(x=df.index, y=df['EMA200'], name='EMA200', line=dict(color='red')),
-        row=1, col=1
-    )
+    # Colors repeat past the palette rather than dropping the extra windows
+    for window, color in zip(ema_windows, itertools.cycle(EMA_COLORS)):
+        fig.add_trace(
+            go.Scatter(x=df.index, y=df[f'EMA{window}'], name=f'EMA{window}', line=dict(color=color)),
+            row=1, col=1
+        )
     
     # Add Bollinger Bands
     fig.add_trace(
@@ -217,6 +220,7 @@ def create_technical_chart(df: pd.DataFrame, symbol: str) -> go.Figure:
     
     return fig
 
+@traced()
 def create_advanced_metrics_chart(info: dict) -> go.Figure:
     """
     Create advanced metrics visualization with scoring system
@@ -250,67 +254,98 @@ def create_advanced_metrics_chart(info: dict) -> go.Figure:
     
     return fig
 
-def calculate_composite_scores(info: dict) -> Dict[str, float]:
+# (info field, multiplier, min, max, inverse) per score category
+COMPOSITE_SCORE_METRICS = {
+    'Valuation': [
+        ('trailingPE', 1, 0, 50, True),
+        ('forwardPE', 1, 0, 30, True),
+        ('pegRatio', 1, 0, 3, True),
+        ('priceToBook', 1, 0, 5, True)
+    ],
+    'Growth': [
+        ('revenueGrowth', 100, -20, 50, False),
+        ('earningsGrowth', 100, -30, 100, False)
+    ],
+    'Profitability': [
+        ('operatingMargins', 100, 0, 40, False),
+        ('profitMargins', 100, 0, 30, False),
+        ('returnOnEquity', 100, 0, 25, False),
+        ('returnOnAssets', 100, 0, 15, False)
+    ],
+    'Financial Health': [
+        ('currentRatio', 1, 0.5, 3, False),
+        ('quickRatio', 1, 0.5, 2, False),
+        ('debtToEquity', 1, 0, 200, True)
+    ]
+}
+
+# Categories where missing or non-positive values are left out of the mean;
+# elsewhere a missing value counts as 0
+POSITIVE_ONLY_CATEGORIES = {'Valuation', 'Financial Health'}
+
+COMPOSITE_SCORE_FIELDS = [field for metrics in COMPOSITE_SCORE_METRICS.values() for field, *_ in metrics]
+
+def _composite_scores_from_columns(columns: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
     """
-    Calculate composite scores for different aspects of the company
+    Score float64 columns (one entry per company, NaN = missing) per category
     """
     scores = {}
-    
-    # Valuation Score
-    valuation_metrics = {
-        'P/E Ratio': (info.get('trailingPE', 0), 0, 50, True),
-        'Forward P/E': (info.get('forwardPE', 0), 0, 30, True),
-        'PEG Ratio': (info.get('pegRatio', 0), 0, 3, True),
-        'Price/Book': (info.get('priceToBook', 0), 0, 5, True)
-    }
-    
-    scores['Valuation'] = np.mean([
-        score_metric(val, min_val, max_val, inverse)
-        for (val, min_val, max_val, inverse) in valuation_metrics.values()
-        if val is not None and val > 0
-    ])
-    
-    # Growth Score
-    growth_metrics = {
-        'Revenue Growth': (info.get('revenueGrowth', 0) * 100, -20, 50, False),
-        'Earnings Growth': (info.get('earningsGrowth', 0) * 100, -30, 100, False)
-    }
-    
-    scores['Growth'] = np.mean([
-        score_metric(val, min_val, max_val, inverse)
-        for (val, min_val, max_val, inverse) in growth_metrics.values()
-        if val is not None
-    ])
-    
-    # Profitability Score
-    profitability_metrics = {
-        'Operating Margin': (info.get('operatingMargins', 0) * 100, 0, 40, False),
-        'Profit Margin': (info.get('profitMargins', 0) * 100, 0, 30, False),
-        'ROE': (info.get('returnOnEquity', 0) * 100, 0, 25, False),
-        'ROA': (info.get('returnOnAssets', 0) * 100, 0, 15, False)
-    }
-    
-    scores['Profitability'] = np.mean([
-        score_metric(val, min_val, max_val, inverse)
-        for (val, min_val, max_val, inverse) in profitability_metrics.values()
-        if val is not None
-    ])
-    
-    # Financial Health Score
-    health_metrics = {
-        'Current Ratio': (info.get('currentRatio', 0), 0.5, 3, False),
-        'Quick Ratio': (info.get('quickRatio', 0), 0.5, 2, False),
-        'Debt/Equity': (info.get('debtToEquity', 0), 0, 200, True)
-    }
-    
-    scores['Financial Health'] = np.mean([
-        score_metric(val, min_val, max_val, inverse)
-        for (val, min_val, max_val, inverse) in health_metrics.values()
-        if val is not None and val > 0
-    ])
-    
+    with np.errstate(invalid='ignore', divide='ignore'):
+        for category, metrics in COMPOSITE_SCORE_METRICS.items():
+            total = None
+            valid_count = None
+            for field, multiplier, min_val, max_val, inverse in metrics:
+                raw = columns[field]
+                if category in POSITIVE_ONLY_CATEGORIES:
+                    valid = raw > 0
+                else:
+                    raw = np.where(np.isnan(raw), 0.0, raw)
+                    valid = np.ones(raw.shape, dtype=bool)
+                value = np.clip(raw * multiplier, min_val, max_val)
+                score = ((value - min_val) / (max_val - min_val)) * 100
+                if inverse:
+                    score = 100 - score
+                score = np.where(valid, score, 0.0)
+                total = score if total is None else total + score
+                valid_count = valid.astype(np.int64) if valid_count is None else valid_count + valid
+            scores[category] = np.where(valid_count > 0, total / valid_count, np.nan)
     return scores
 
+def build_fundamentals_table(infos: Dict[str, dict]) -> pd.DataFrame:
+    """
+    Companies x metrics table of the fields used for composite scoring
+    """
+    table = pd.DataFrame.from_dict(
+        {symbol: {field: info.get(field) for field in COMPOSITE_SCORE_FIELDS} for symbol, info in infos.items()},
+        orient='index', columns=COMPOSITE_SCORE_FIELDS
+    )
+    return table.apply(pd.to_numeric, errors='coerce').astype(np.float64)
+
+@traced()
+def calculate_composite_scores_batch(fundamentals: pd.DataFrame) -> pd.DataFrame:
+    """
+    Composite scores for many companies at once; fundamentals has one row
+    per company and the info field names as columns
+    """
+    columns = {}
+    for field in COMPOSITE_SCORE_FIELDS:
+        if field in fundamentals:
+            columns[field] = pd.to_numeric(fundamentals[field], errors='coerce').to_numpy(dtype=np.float64)
+        else:
+            columns[field] = np.full(len(fundamentals), np.nan)
+    return pd.DataFrame(_composite_scores_from_columns(columns), index=fundamentals.index)
+
+@traced()
+def calculate_composite_scores(info: dict) -> Dict[str, float]:
+    """
+    Calculate composite scores for different aspects of the company
+    """
+    columns = {}
+    for field in COMPOSITE_SCORE_FIELDS:
+        value = info.get(field)
+        columns[field] = np.array([value if isinstance(value, (int, float)) else np.nan], dtype=np.float64)
+    return {category: values[0] for category, values in _composite_scores_from_columns(columns).items()}
+
 def score_metric(value: float, min_val: float, max_val: float, inverse: bool = False) -> float:
     """
     Convert a metric to a score between 0 and 100
@@ -330,6 +365,55 @@ def score_metric(value: float, min_val: float, max_val: float, inverse: bool = F
         
     return score
 
+def downsample_series(series: pd.Series, max_points: int = 120) -> pd.Series:
+    """
+    Reduce a series to about max_points by keeping each bucket's min and max,
+    so peaks and troughs survive downsampling
+    """
+    series = series.dropna()
+    n = len(series)
+    if n <= max_points:
+        return series
+    
+    buckets = max(1, max_points // 2)
+    bucket_size = int(np.ceil(n / buckets))
+    values = series.to_numpy(dtype=np.float64)
+    padded = np.pad(values, (0, buckets * bucket_size - n), mode='edge').reshape(buckets, bucket_size)
+    
+    offsets = np.arange(buckets) * bucket_size
+    keep = np.concatenate([offsets + padded.argmin(axis=1), offsets + padded.argmax(axis=1), [0, n - 1]])
+    keep = np.unique(np.minimum(keep, n - 1))
+    return series.iloc[keep]
+
+def create_sparkline(series: pd.Series) -> go.Figure:
+    """
+    Minimal line chart for metric cards
+    """
+    rising = len(series) < 2 or series.iloc[-1] >= series.iloc[0]
+    color = 'rgba(75, 192, 75, 0.9)' if rising else 'rgba(255, 75, 75, 0.9)'
+    
+    fig = go.Figure(
+        go.Scatter(
+            x=series.index,
+            y=series.values,
+            mode='lines',
+            line=dict(color=color, width=2),
+            hoverinfo='skip'
+        )
+    )
+    
+    fig.update_layout(
+        template='plotly_dark',
+        height=80,
+        margin=dict(l=0, r=0, t=0, b=0),
+        xaxis=dict(visible=False),
+        yaxis=dict(visible=False),
+        showlegend=False
+    )
+    
+    return fig
+
+@traced()
 def create_peer_comparison_chart(peers_data: Dict[str, dict], metric: str, is_percentage: bool = False) -> go.Figure:
     """
     Create an advanced peer comparison chart with statistical analysis
@@ -385,3 +469,63 @@ def create_peer_comparison_chart(peers_data: Dict[str, dict], metric: str, is_pe
     )
     
     return fig
+
+def create_trace_waterfall(trace) -> go.Figure:
+    """
+    Waterfall of the spans recorded in a tracing.Trace
+    """
+    records = trace.to_records()
+    # Numbered so repeated spans (e.g. one per symbol) keep their own rows
+    labels = [f"{i + 1:>3}. {'  ' * r['depth']}{r['span']}" for i, r in enumerate(records)]
+    
+    fig = go.Figure(
+        go.Bar(
+            y=labels,
+            x=[r['duration_ns'] / 1e6 for r in records],
+            base=[r['offset_ns'] / 1e6 for r in records],
+            orientation='h',
+            marker_color=['rgba(255, 75, 75, 0.7)' if r['depth'] == 0 else 'rgba(75, 192, 192, 0.7)'
+                          for r in records],
+            hovertemplate='%{y}: %{x:.2f} ms<extra></extra>'
+        )
+    )
+    
+    fig.update_layout(
+        title=f'Rerun timings ({trace.duration_ns / 1e6:.1f} ms total)',
+        xaxis_title='Time since rerun start (ms)',
+        yaxis=dict(autorange='reversed'),
+        template='plotly_dark',
+        height=max(300, 22 * len(records)),
+        showlegend=False
+    )
+    
+    return fig
+
+@traced()
+def create_correlation_heatmap(corr: pd.DataFrame, title: str = 'Return Correlation') -> go.Figure:
+    """
+    Annotated heatmap of a correlation matrix
+    """
+    fig = go.Figure(
+        go.Heatmap(
+            z=corr.values,
+            x=list(corr.columns),
+            y=list(corr.index),
+            zmin=-1,
+            zmax=1,
+            colorscale='RdBu',
+            reversescale=True,
+            text=np.round(corr.values, 2),
+            texttemplate='%{text}',
+            hovertemplate='%{y} / %{x}: %{z:.3f}<extra></extra>'
+        )
+    )
+    
+    fig.update_layout(
+        title=title,
+        template='plotly_dark',
+        height=max(300, 60 * len(corr)),
+        yaxis=dict(autorange='reversed')
+    )
+    
+    return fig